@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Upsert assíncrono de cnae_classifications via PostgREST
+
+Mantém até N lotes em voo (httpx; streams multiplexados quando o servidor fala
+HTTP/2, uma conexão por lote em HTTP/1.1), em vez de esperar cada lote de 100
+registros terminar antes de enviar o próximo.
+O tamanho do lote se adapta à latência observada e às respostas 413/429,
+e as novas tentativas usam backoff exponencial com jitter.
+
+Uso:
+    python scripts/populate_all_cnae_data.py --input-file cnae_data_complete.txt --insert --engine async --concurrency 8
+
+    # Contra um PostgREST local/fake (qualquer URL compatível com /rest/v1)
+    SUPABASE_URL=http://localhost:3000 SUPABASE_SERVICE_ROLE_KEY=dev python scripts/cnae_async_upsert.py cnae_data_complete.txt
+
+Requisitos:
+    - httpx com HTTP/2: pip install 'httpx[http2]'
+    - Variáveis de ambiente: SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from itertools import islice
+from typing import Iterable, Optional, Sequence
+
+from cnae_metrics import METRICS
+from cnae_stream import CnaeRecord, read_cnae_file
+
+TABLE = 'cnae_classifications'
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class AdaptiveBatchSize:
+    """
+    Tamanho de lote AIMD: cresce aditivamente enquanto a latência fica abaixo
+    do alvo e cai pela metade em 413/429 ou quando a latência estoura o alvo.
+    """
+
+    def __init__(self, initial: int = 100, minimum: int = 10, maximum: int = 1000,
+                 target_latency: float = 1.0, step: int = 50):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.step = step
+
+    def on_success(self, latency: float):
+        if latency > self.target_latency:
+            self.size = max(self.minimum, int(self.size * 0.75))
+        else:
+            self.size = min(self.maximum, self.size + self.step)
+
+    def on_pressure(self):
+        self.size = max(self.minimum, self.size // 2)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0,
+                  retry_after: Optional[str] = None) -> float:
+    """Backoff exponencial com jitter completo (respeita Retry-After se vier)"""
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AsyncUpserter:
+    """Envia lotes concorrentes para o endpoint PostgREST de cnae_classifications"""
+
+    def __init__(self, client, sizer: AdaptiveBatchSize, max_retries: int = 5):
+        self.client = client
+        self.sizer = sizer
+        self.max_retries = max_retries
+        self.total_rows = 0
+        self.total_inserted = 0
+        self.total_errors = 0
+        self.retries = 0
+
+    async def send(self, batch: Sequence[CnaeRecord], batch_num: int) -> int:
+        with METRICS.stage('serialize', rows=len(batch)):
+            records = [
+                {"cnae_code": cnae, "setor_industria": setor, "categoria": categoria}
+                for cnae, setor, categoria in batch
+            ]
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = await self.client.post(
+                    f"/rest/v1/{TABLE}",
+                    params={"on_conflict": "cnae_code"},
+                    json=records,
+                )
+            except Exception:  # erro de rede: tentar de novo
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                METRICS.retry('network')
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            latency = time.perf_counter() - start
+            if response.status_code < 300:
+                self.sizer.on_success(latency)
+                METRICS.observe('network', latency, rows=len(records), bytes=len(response.request.content))
+                return len(records)
+            METRICS.observe('network', latency)
+
+            if response.status_code == 413 and len(batch) > 1:
+                # Payload grande demais: reduzir e dividir o lote ao meio
+                self.sizer.on_pressure()
+                middle = len(batch) // 2
+                first = await self.send(batch[:middle], batch_num)
+                second = await self.send(batch[middle:], batch_num)
+                return first + second
+
+            if response.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                if response.status_code == 429:
+                    self.sizer.on_pressure()
+                self.retries += 1
+                METRICS.retry('network')
+                await asyncio.sleep(backoff_delay(attempt, retry_after=response.headers.get("retry-after")))
+                continue
+
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+        raise RuntimeError("número máximo de tentativas excedido")
+
+    async def run_batch(self, batch: Sequence[CnaeRecord], batch_num: int, limiter: asyncio.Semaphore):
+        try:
+            inserted = await self.send(batch, batch_num)
+            self.total_inserted += inserted
+            print(f"✅ Lote {batch_num}: {inserted} registros (Total: {self.total_inserted})", file=sys.stderr)
+        except Exception as e:
+            self.total_errors += len(batch)
+            print(f"❌ Erro no lote {batch_num}: {e}", file=sys.stderr)
+        finally:
+            limiter.release()
+
+
+def create_client(supabase_url: str, supabase_key: str, concurrency: int):
+    """
+    Cria o cliente httpx com HTTP/2 quando disponível. O pool comporta um lote
+    em voo por conexão: servidores só HTTP/1.1 (ex: PostgREST local em http://)
+    não multiplexam, e um pool de uma conexão serializaria os lotes.
+    """
+    try:
+        import httpx
+    except ImportError:
+        print("❌ Erro: httpx não instalado. Execute: pip install 'httpx[http2]'", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    return httpx.AsyncClient(
+        base_url=supabase_url.rstrip('/'),
+        http2=http2,
+        headers={
+            "apikey": supabase_key,
+            "Authorization": f"Bearer {supabase_key}",
+            "Content-Type": "application/json",
+            "Prefer": "resolution=merge-duplicates,return=minimal",
+        },
+        limits=httpx.Limits(max_connections=concurrency),
+        timeout=httpx.Timeout(60.0),
+    )
+
+
+async def upsert_async(data: Iterable[CnaeRecord], supabase_url: str, supabase_key: str,
+                       concurrency: int = 8, initial_batch_size: int = 100) -> AsyncUpserter:
+    """
+    Faz o upsert de todos os registros com até `concurrency` lotes em voo.
+    `data` é consumido sob demanda: só os lotes em voo ficam em memória.
+    """
+    sizer = AdaptiveBatchSize(initial=initial_batch_size)
+    limiter = asyncio.Semaphore(concurrency)
+    tasks = set()
+    records = iter(data)
+
+    async with create_client(supabase_url, supabase_key, concurrency) as client:
+        upserter = AsyncUpserter(client, sizer)
+        batch_num = 0
+        while True:
+            await limiter.acquire()
+            batch = list(islice(records, sizer.size))
+            if not batch:
+                limiter.release()
+                break
+            upserter.total_rows += len(batch)
+            batch_num += 1
+            task = asyncio.create_task(upserter.run_batch(batch, batch_num, limiter))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    return upserter
+
+
+def insert_async(data: Iterable[CnaeRecord], concurrency: int = 8):
+    """Insere dados no Supabase com o pipeline assíncrono (mesmo resumo do modo sequencial)"""
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+    if not supabase_url or not supabase_key:
+        print("❌ Erro: SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY devem estar configurados", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"📊 Inserindo registros no Supabase ({concurrency} lotes em paralelo)...", file=sys.stderr)
+
+    start = time.perf_counter()
+    with METRICS.stage('network'):
+        upserter = asyncio.run(upsert_async(data, supabase_url, supabase_key, concurrency))
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Concluído! Total inserido: {upserter.total_inserted}", file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({upserter.total_rows / elapsed if elapsed > 0 else 0:.0f} registros/s)", file=sys.stderr)
+    if upserter.retries:
+        print(f"   🔁 Novas tentativas: {upserter.retries}", file=sys.stderr)
+    if upserter.total_errors:
+        print(f"   ⚠️ Erros: {upserter.total_errors}", file=sys.stderr)
+    return upserter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upsert assíncrono de cnae_classifications via PostgREST')
+    parser.add_argument('input_file', help="Arquivo com dados CNAE ('-' para stdin, aceita .gz)")
+    parser.add_argument('--concurrency', type=int, default=8, help='Lotes em voo ao mesmo tempo (padrão: 8)')
+
+    args = parser.parse_args()
+
+    insert_async(read_cnae_file(args.input_file), args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Benchmark das ferramentas CNAE com dados sintéticos em grande escala
+
+Gera arquivos TSV sintéticos (semente fixa, de 1k a 10M linhas) com aspas,
+separadores misturados (tab / espaços duplos), formatos de código variados
+('6203-1/00', '62.03-1/00', '6203-1-00') e linhas malformadas, e mede cada
+etapa isoladamente:
+
+    - parse:         read_cnae_file (streaming do arquivo)
+    - parse_text:    process_cnae_data.parse_cnae_data (texto em memória)
+    - generate_sql:  process_cnae_data.generate_sql (string em memória)
+    - write_sql:     populate_all_cnae_data.generate_sql_complete (arquivo)
+    - upsert_async:  cnae_async_upsert.upsert_async contra um PostgREST
+                     local de mentira (HTTP/1.1 em thread, sem latência,
+                     então o número mede o overhead do cliente, não a rede;
+                     o paralelismo dos lotes é coberto em
+                     tests/test_cnae_async_upsert.py)
+    - copy:          cnae_copy_loader.copy_merge_classifications (só com
+                     --db-url; use um banco descartável, a tabela é alterada)
+    - records_tuple, records_slots, records_columns: monta o arquivo inteiro
+                     em memória como lista de tuplas, lista de
+                     CnaeClassification (__slots__) ou CnaeColumns (arrays),
+                     ver cnae_records.py; além do tempo, mede a memória que
+                     fica alocada (tracemalloc) e reporta MB por milhão
+
+Cada etapa roda em um processo novo, então o pico de RSS é o da etapa (mais
+o interpretador). Com --trace-alloc, também registra o pico de memória
+rastreada e os blocos alocados via tracemalloc (mais lento).
+
+O resultado vai para um JSON (commit, versão do Python, linhas/s, RSS...).
+Com --baseline, compara com um JSON anterior e aponta regressões.
+
+Uso:
+    python scripts/cnae_benchmark.py --rows 1000 100000 1000000 --output bench.json
+    python scripts/cnae_benchmark.py --rows 10000000 --stages parse write_sql
+    python scripts/cnae_benchmark.py --baseline bench_main.json --output bench_branch.json
+
+    # Só gerar um arquivo sintético
+    python scripts/cnae_benchmark.py --generate-only 1000000 --data-dir /tmp/cnae_bench
+
+Requisitos:
+    - Para upsert_async: httpx (pip install 'httpx[http2]')
+    - Para copy: psycopg2 (pip install psycopg2-binary) e --db-url
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import importlib
+import platform
+import tempfile
+import threading
+import contextlib
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import multiprocessing
+
+from cnae_stream import read_cnae_file
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMAT_VERSION = 1
+RECORD_STAGES = ['records_tuple', 'records_slots', 'records_columns']
+STAGES = ['parse', 'parse_text', 'generate_sql', 'write_sql', 'upsert_async', 'copy'] + RECORD_STAGES
+DEFAULT_STAGES = ['parse', 'parse_text', 'generate_sql', 'write_sql', 'upsert_async'] + RECORD_STAGES
+# Módulos importados antes da medição (o custo de import não entra no tempo da etapa)
+STAGE_MODULES = {
+    'parse_text': ['process_cnae_data'],
+    'generate_sql': ['process_cnae_data'],
+    'write_sql': ['populate_all_cnae_data'],
+    'upsert_async': ['cnae_async_upsert', 'httpx'],
+    'copy': ['cnae_copy_loader', 'psycopg2'],
+    'records_slots': ['cnae_records'],
+    'records_columns': ['cnae_records'],
+}
+
+# Resto de (5*d1 + 4*d2 + 3*d3 + 2*d4) % 11 -> dígito verificador da classe
+CLASS_CHECK_DIGITS = [1, 1, 0, 9, 8, 7, 6, 5, 4, 3, 2]
+
+SETORES = [
+    'Agricultura', 'Tecnologia da Informação', 'Indústria Alimentícia',
+    "Comércio d'Água e Gás", 'Serviços "Especializados"', 'Construção Civil',
+    'Saúde', 'Educação', 'Transporte e Logística', 'Energia',
+]
+CATEGORIAS = [
+    'Produtor', 'Serviços', 'Fabricante', "Distribuidor O'Neill",
+    'Varejo "Premium"', 'Atacado', 'Prestador de Serviços', 'Consultoria',
+]
+MALFORMED = [
+    'linha sem separador nenhum',
+    '6203100\tSem traço no código\tServiços',
+    '6203-1/00\tSó dois campos',
+    '\t\t',
+]
+
+
+def synthetic_code(rng: random.Random) -> str:
+    """Código com dígito verificador válido em um dos formatos vistos nas fontes"""
+    class4 = rng.randrange(10000)
+    digits = f"{class4:04d}"
+    check = CLASS_CHECK_DIGITS[(5 * int(digits[0]) + 4 * int(digits[1]) + 3 * int(digits[2]) + 2 * int(digits[3])) % 11]
+    tail = f"{rng.randrange(100):02d}"
+    style = rng.random()
+    if style < 0.7:
+        return f"{digits}-{check}/{tail}"
+    if style < 0.9:
+        return f"{digits[:2]}.{digits[2:]}-{check}/{tail}"
+    return f"{digits}-{check}-{tail}"
+
+
+def write_synthetic_file(path: str, rows: int, seed: int = 42, malformed_rate: float = 0.01) -> int:
+    """Grava `rows` linhas sintéticas (mais o cabeçalho); retorna quantas são malformadas"""
+    rng = random.Random(seed)
+    malformed = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('CNAE\tSetor\tCategoria\n')
+        lines = []
+        for _ in range(rows):
+            if rng.random() < malformed_rate:
+                malformed += 1
+                lines.append(rng.choice(MALFORMED))
+            else:
+                separator = '\t' if rng.random() < 0.8 else '  '
+                lines.append(separator.join((synthetic_code(rng), rng.choice(SETORES), rng.choice(CATEGORIAS))))
+            if len(lines) >= 10000:
+                f.write('\n'.join(lines))
+                f.write('\n')
+                lines = []
+        if lines:
+            f.write('\n'.join(lines))
+            f.write('\n')
+    return malformed
+
+
+class _StandInPostgrest:
+    """PostgREST de mentira: aceita POST /rest/v1/<tabela> e só conta as linhas"""
+
+    def __init__(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        stand_in = self
+        self.rows = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stand_in._lock:
+                    stand_in.rows += len(json.loads(body))
+                self.send_response(201)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> '_StandInPostgrest':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _peak_rss_kb() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS reporta bytes
+
+
+def _prepare_stage(stage: str, data_file: str, options: dict, resources: contextlib.ExitStack):
+    """Carrega a entrada e sobe os recursos da etapa (fora da medição de tempo)"""
+    for module in STAGE_MODULES.get(stage, []):
+        importlib.import_module(module)
+    if stage == 'upsert_async':
+        options['postgrest_url'] = resources.enter_context(_StandInPostgrest()).url
+    if stage == 'parse' or stage in RECORD_STAGES:
+        return data_file
+    if stage == 'parse_text':
+        with open(data_file, 'r', encoding='utf-8') as f:
+            return f.read()
+    return list(read_cnae_file(data_file))
+
+
+def _build_records(stage: str, data_file: str):
+    """Monta o arquivo inteiro na representação da etapa records_*"""
+    if stage == 'records_tuple':
+        return list(read_cnae_file(data_file))
+    from cnae_records import read_cnae_columns, to_classifications
+    if stage == 'records_slots':
+        return to_classifications(read_cnae_file(data_file))
+    return read_cnae_columns(data_file)
+
+
+def _retained_memory(stage: str, data_file: str) -> dict:
+    """Bytes que continuam alocados com os registros montados (segunda passada, sob tracemalloc)"""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    records = _build_records(stage, data_file)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = len(records)
+    return {
+        'retained_bytes': retained,
+        'bytes_per_record': round(retained / rows, 1) if rows else None,
+        'mb_per_million': round(retained / rows, 1) if rows else None,  # bytes/registro = MB/milhão
+    }
+
+
+def _stage_body(stage: str, data, work_dir: str, options: dict):
+    """Executa a etapa e retorna (linhas processadas, métricas extras)"""
+    if stage == 'parse':
+        return sum(1 for _ in read_cnae_file(data)), {}
+
+    if stage in RECORD_STAGES:
+        return len(_build_records(stage, data)), {}
+
+    if stage == 'parse_text':
+        from process_cnae_data import parse_cnae_data
+        return len(parse_cnae_data(data)), {}
+
+    if stage == 'generate_sql':
+        from process_cnae_data import generate_sql
+        sql = generate_sql(data)
+        return len(data), {'output_bytes': len(sql.encode('utf-8'))}
+
+    if stage == 'write_sql':
+        from populate_all_cnae_data import generate_sql_complete
+        output_file = os.path.join(work_dir, 'cnae_benchmark.sql')
+        generate_sql_complete(data, output_file)
+        return len(data), {'output_bytes': os.path.getsize(output_file)}
+
+    if stage == 'upsert_async':
+        from cnae_async_upsert import upsert_async
+        upserter = asyncio.run(upsert_async(data, options['postgrest_url'], 'benchmark', options['concurrency']))
+        return upserter.total_inserted, {'errors': upserter.total_errors}
+
+    if stage == 'copy':
+        from cnae_copy_loader import copy_merge_classifications
+        result = copy_merge_classifications(data, options['db_url'])
+        return result.total, {'inserted': result.inserted, 'updated': result.updated, 'rejects': len(result.rejects)}
+
+    raise ValueError(f"Etapa desconhecida: {stage}")
+
+
+def run_stage(stage: str, data_file: str, work_dir: str, options: dict) -> dict:
+    """Executa uma etapa medindo tempo, RSS e (opcionalmente) alocações; roda no processo filho"""
+    import gc
+    import tracemalloc
+
+    trace = options.get('trace_alloc', False)
+    with contextlib.ExitStack() as resources:
+        data = _prepare_stage(stage, data_file, options, resources)
+        gc.collect()
+        blocks_before = sys.getallocatedblocks()
+        if trace:
+            tracemalloc.start()
+
+        # As etapas imprimem progresso por lote em stderr; silenciar durante a medição
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull), contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            rows, extra = _stage_body(stage, data, work_dir, options)
+            elapsed = time.perf_counter() - start
+
+    result = {
+        'stage': stage,
+        'rows': rows,
+        'elapsed_s': round(elapsed, 4),
+        'rows_per_second': round(rows / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_kb': _peak_rss_kb(),
+        'allocated_blocks': sys.getallocatedblocks() - blocks_before,
+    }
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        result['traced_peak_bytes'] = peak
+        tracemalloc.stop()
+    result.update(extra)
+    if stage in RECORD_STAGES:
+        result.update(_retained_memory(stage, data_file))
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_with_baseline(results: List[dict], baseline_file: str, threshold: float) -> int:
+    """Imprime a variação de linhas/s contra um JSON anterior; retorna o número de regressões"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous: Dict[tuple, dict] = {(r['size'], r['stage']): r for r in baseline.get('results', [])}
+
+    regressions = 0
+    print(f"\n📊 Comparação com {baseline_file} (commit {baseline.get('git_commit')}):", file=sys.stderr)
+    for result in results:
+        old = previous.get((result['size'], result['stage']))
+        if not old or not old.get('rows_per_second') or not result.get('rows_per_second'):
+            continue
+        change = result['rows_per_second'] / old['rows_per_second'] - 1
+        marker = '⚠️ ' if change < -threshold else '  '
+        if change < -threshold:
+            regressions += 1
+        print(f"{marker} {result['stage']:<13} {result['size']:>10}: {change:+.1%} linhas/s, "
+              f"RSS {old.get('peak_rss_kb')} -> {result.get('peak_rss_kb')} KB", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das ferramentas CNAE com dados sintéticos')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Tamanhos dos arquivos sintéticos (padrão: 1000 10000 100000)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=DEFAULT_STAGES, help='Etapas a medir')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do gerador (padrão: 42)')
+    parser.add_argument('--malformed-rate', type=float, default=0.01, help='Fração de linhas malformadas (padrão: 0.01)')
+    parser.add_argument('--loader-max-rows', type=int, default=100000,
+                        help='Maior tamanho usado nas etapas de carga (padrão: 100000)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Lotes em voo no upsert_async (padrão: 8)')
+    parser.add_argument('--db-url', help='Postgres DESCARTÁVEL para a etapa copy (padrão: DATABASE_URL)')
+    parser.add_argument('--trace-alloc', action='store_true', help='Medir alocações com tracemalloc (mais lento)')
+    parser.add_argument('--data-dir', help='Diretório para os arquivos sintéticos (padrão: temporário, removido no final)')
+    parser.add_argument('--output', default='cnae_benchmark.json', help='Arquivo JSON de resultados')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--regression-threshold', type=float, default=0.1,
+                        help='Queda de linhas/s considerada regressão (padrão: 0.1 = 10%%)')
+    parser.add_argument('--generate-only', type=int, metavar='N', help='Só gerar um arquivo sintético com N linhas')
+
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='cnae_bench_')
+    os.makedirs(data_dir, exist_ok=True)
+
+    if args.generate_only:
+        path = os.path.join(data_dir, f"cnae_synthetic_{args.generate_only}.txt")
+        malformed = write_synthetic_file(path, args.generate_only, args.seed, args.malformed_rate)
+        print(f"✅ {args.generate_only} linhas ({malformed} malformadas) em: {path}", file=sys.stderr)
+        return
+
+    if 'copy' in args.stages:
+        from cnae_copy_loader import resolve_db_url
+        args.db_url = resolve_db_url(args.db_url)
+
+    options = {'concurrency': args.concurrency, 'db_url': args.db_url, 'trace_alloc': args.trace_alloc}
+    loader_stages = {'upsert_async', 'copy'}
+    results = []
+    # spawn: cada etapa começa de um interpretador limpo, então o RSS não herda a etapa anterior
+    context = multiprocessing.get_context('spawn')
+
+    try:
+        for size in args.rows:
+            data_file = os.path.join(data_dir, f"cnae_synthetic_{size}.txt")
+            start = time.perf_counter()
+            malformed = write_synthetic_file(data_file, size, args.seed, args.malformed_rate)
+            print(f"📊 {size} linhas sintéticas ({malformed} malformadas) em {time.perf_counter() - start:.2f}s",
+                  file=sys.stderr)
+
+            for stage in args.stages:
+                if stage in loader_stages and size > args.loader_max_rows:
+                    print(f"   ⏭️  {stage}: ignorado (> --loader-max-rows {args.loader_max_rows})", file=sys.stderr)
+                    continue
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(run_stage, stage, data_file, data_dir, options).result()
+                result['size'] = size
+                results.append(result)
+                memory = f", {result['mb_per_million']} MB/milhão" if result.get('mb_per_million') else ''
+                print(f"   ⏱️ {stage:<15} {result['elapsed_s']:.2f}s "
+                      f"({result['rows_per_second'] or 0:.0f} registros/s, pico RSS {result['peak_rss_kb']} KB{memory})",
+                      file=sys.stderr)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'format_version': FORMAT_VERSION,
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'malformed_rate': args.malformed_rate,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Resultados salvos em: {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.regression_threshold)
+        if regressions:
+            print(f"⚠️  {regressions} regressões acima de {args.regression_threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tabela CNAE binária (largura fixa, ordenada) para lookups via mmap
+
+Formato (little-endian):
+    cabeçalho  : magic 'CNAB', versão (u16), reservado (u16), total de
+                 registros (u32), offset da tabela de setores (u32), offset da
+                 tabela de categorias (u32)
+    registros  : `total` x 8 bytes, ordenados pela chave -> chave de 7 dígitos
+                 (u32), id do setor (u16), id da categoria (u16)
+    strings    : para cada tabela -> quantidade (u32), offsets (u32 x n+1) e
+                 os bytes UTF-8 concatenados
+
+O leitor mapeia o arquivo com mmap e faz busca binária direto nos bytes, sem
+criar objetos por registro. Vários processos compartilham o mesmo arquivo pelo
+page cache e a abertura só decodifica as tabelas de strings (algumas centenas).
+
+Uso:
+    python scripts/process_cnae_complete_file.py --binary cnae_classifications.bin
+
+    from cnae_binary import CnaeBinaryTable
+    with CnaeBinaryTable('cnae_classifications.bin') as table:
+        table.lookup('62.03-1/00')  # -> ('Tecnologia da Informação', 'Serviços')
+"""
+
+import mmap
+import sys
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cnae_codes import cnae_key
+from cnae_stream import CnaeRecord
+
+MAGIC = b'CNAB'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIII')
+RECORD = struct.Struct('<IHH')
+U32 = struct.Struct('<I')
+
+
+def _pack_strings(values: List[str]) -> bytes:
+    blobs = [value.encode('utf-8') for value in values]
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return U32.pack(len(values)) + struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(blobs)
+
+
+def _unpack_strings(buffer, offset: int) -> List[str]:
+    (count,) = U32.unpack_from(buffer, offset)
+    offsets = struct.unpack_from(f'<{count + 1}I', buffer, offset + U32.size)
+    base = offset + U32.size * (count + 2)
+    return [bytes(buffer[base + offsets[i]:base + offsets[i + 1]]).decode('utf-8') for i in range(count)]
+
+
+def write_cnae_table(records: Iterable[CnaeRecord], output_file: str) -> int:
+    """Grava a tabela binária ordenada; retorna o número de registros gravados"""
+    by_key: Dict[int, Tuple[str, str]] = {}
+    for cnae, setor, categoria in records:
+        key = cnae_key(cnae)
+        if key is not None:
+            by_key[key] = (setor, categoria)
+
+    setores: Dict[str, int] = {}
+    categorias: Dict[str, int] = {}
+    body = bytearray()
+    for key in sorted(by_key):
+        setor, categoria = by_key[key]
+        body += RECORD.pack(key, setores.setdefault(setor, len(setores)),
+                            categorias.setdefault(categoria, len(categorias)))
+
+    setor_blob = _pack_strings(list(setores))
+    categoria_blob = _pack_strings(list(categorias))
+    setor_offset = HEADER.size + len(body)
+    categoria_offset = setor_offset + len(setor_blob)
+
+    with open(output_file, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(by_key), setor_offset, categoria_offset))
+        f.write(body)
+        f.write(setor_blob)
+        f.write(categoria_blob)
+
+    return len(by_key)
+
+
+class CnaeBinaryTable:
+    """Leitor mmap da tabela binária com busca binária sem alocação por registro"""
+
+    def __init__(self, path: str):
+        if sys.byteorder != 'little':
+            raise RuntimeError("CnaeBinaryTable requer plataforma little-endian")
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.total, setor_offset, categoria_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Arquivo não é uma tabela CNAE binária v{FORMAT_VERSION}: {path}")
+        # Registros como palavras u32: [chave, setor | categoria << 16, ...]
+        self._words = memoryview(self._mmap)[HEADER.size:HEADER.size + self.total * RECORD.size].cast('I')
+        self.setores = _unpack_strings(self._mmap, setor_offset)
+        self.categorias = _unpack_strings(self._mmap, categoria_offset)
+
+    def __enter__(self) -> 'CnaeBinaryTable':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.total
+
+    def close(self):
+        if getattr(self, '_words', None) is not None:
+            self._words.release()
+            self._words = None
+        self._mmap.close()
+        self._file.close()
+
+    def find(self, key: int) -> int:
+        """Posição da chave na tabela ou -1"""
+        words = self._words
+        lo, hi = 0, self.total
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if words[mid << 1] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.total and words[lo << 1] == key:
+            return lo
+        return -1
+
+    def lookup_key(self, key: int) -> Optional[Tuple[str, str]]:
+        """(setor, categoria) para a chave de 7 dígitos, ou None"""
+        position = self.find(key)
+        if position < 0:
+            return None
+        ids = self._words[(position << 1) + 1]
+        return self.setores[ids & 0xFFFF], self.categorias[ids >> 16]
+
+    def lookup(self, code: Optional[str]) -> Optional[Tuple[str, str]]:
+        """(setor, categoria) para um código CNAE em qualquer formato, ou None"""
+        key = cnae_key(code)
+        if key is None:
+            return None
+        return self.lookup_key(key)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Normalização de códigos CNAE
+
+Porta para Python da função SQL normalize_cnae_code()
+(20260125000002_apply_sector_from_cnae_classifications.sql) e conversão do
+código para uma chave inteira de 7 dígitos (subclasse IBGE), usada pelos
+artefatos de lookup.
+
+Exemplos:
+    normalize_cnae_code(' 62.03-1/00 ')  -> '6203-1/00'
+    cnae_key('62.03-1/00')               -> 6203100
+    format_cnae_key(6203100)             -> '6203-1/00'
+"""
+
+from typing import Optional
+
+SUBCLASS_DIGITS = 7
+
+
+def normalize_cnae_code(code: Optional[str]) -> Optional[str]:
+    """Igual a normalize_cnae_code() no banco: remove pontos/espaços e usa maiúsculas"""
+    if code is None or code == '':
+        return None
+    # TRIM do Postgres remove apenas espaços
+    return code.strip(' ').replace('.', '').replace(' ', '').upper()
+
+
+def cnae_digits(code: Optional[str]) -> str:
+    """Apenas os dígitos do código (ex: '6203-1/00' -> '6203100')"""
+    if not code:
+        return ''
+    # Caminho rápido para os formatos usuais (6203-1/00, 62.03-1/00, 6203-1-00)
+    digits = code.replace('-', '').replace('/', '').replace('.', '')
+    if digits.isascii() and digits.isdigit():
+        return digits
+    return ''.join(ch for ch in code if '0' <= ch <= '9')
+
+
+def cnae_key(code: Optional[str]) -> Optional[int]:
+    """Chave inteira da subclasse (7 dígitos) ou None se o código não tiver 7 dígitos"""
+    digits = cnae_digits(code)
+    if len(digits) != SUBCLASS_DIGITS:
+        return None
+    return int(digits)
+
+
+def format_cnae_key(key: int) -> str:
+    """Formata a chave inteira no formato do banco (DDDD-D/DD)"""
+    digits = f"{key:07d}"
+    return f"{digits[:4]}-{digits[4]}/{digits[5:]}"
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Conversão em streaming de planilhas de empresas para Parquet/Arrow classificado
+
+Os uploads (cnpj,razao_social,nome_fantasia,domain, como
+scripts/test-10-companies.csv) são reparseados como texto em vários pontos
+do pipeline. Este conversor lê o CSV em lotes, uma vez, e grava um dataset
+colunar particionado que os jobs seguintes (cnae_fit_score.py, dedup) leem
+por coluna, com memory map no formato Arrow:
+
+    - cnpj: normalizado e validado por cnpj_vectorized (nulo quando
+      inválido; o motivo fica em cnpj_invalido e o texto recebido em
+      cnpj_original)
+    - domain: hostname em minúsculas, sem protocolo, www., porta ou caminho
+      (mesmo resultado de extractDomain nas Edge Functions)
+    - cnae_code, uf: da resposta da Receita no store local (--store,
+      cnpj_store.py) ou das próprias colunas do CSV (cnae_fiscal,
+      cnae_principal, raw_data, uf), com a precedência de
+      extract_cnae_from_raw_data
+    - setor_industria, categoria: join do cnae_code com cnae_classifications
+
+cnae_code, setor_industria, categoria, uf e cnpj_invalido são gravadas como
+dictionary<int, string> com dicionários fixos por execução (a tabela de
+classificação, as 27 UFs e os motivos), então os ids são os mesmos em todos
+os arquivos e lotes. As demais colunas do CSV seguem como string.
+
+Saída: diretório com partições hive (ex: setor_industria=Tecnologia.../),
+uma pasta por valor de --partition-by, em Parquet (zstd) ou Arrow IPC (sem
+compressão, para leitura por memory map).
+
+Uso:
+    python scripts/cnpj_store.py prefetch empresas.csv --fetch
+    python scripts/cnae_company_columnar.py empresas.csv --store .cnpj_store.sqlite --output empresas_parquet/
+    python scripts/cnae_company_columnar.py empresas.csv --format arrow --partition-by uf --output empresas_arrow/
+
+    from cnae_company_columnar import open_companies
+    dataset = open_companies('empresas_arrow/')
+    dataset.to_table(columns=['cnpj', 'setor_industria'], filter=pc.field('uf') == 'SC')
+
+Requisitos:
+    - pandas, numpy e pyarrow: pip install pandas numpy pyarrow
+"""
+
+import os
+import sys
+import time
+import argparse
+from typing import Iterator, NamedTuple, Optional
+
+try:
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    print("❌ Erro: pandas/numpy/pyarrow não instalados. Execute: pip install pandas numpy pyarrow", file=sys.stderr)
+    sys.exit(1)
+
+from cnae_codes import format_cnae_key
+from cnae_company_sector import DEFAULT_CLASSIFICATIONS, _raw_data_from_csv_row
+from cnae_fit_score import ClassificationIndex, cnae_keys
+from cnae_raw_data import extract_cnae_from_raw_data
+from cnae_records import CATEGORIAS, SETORES
+from cnpj_vectorized import CNPJ_LEN, REASON_CODES, normalize_cnpj_array
+
+DEFAULT_BATCH_SIZE = 100000
+FORMATS = {'parquet': 'parquet', 'arrow': 'ipc'}
+PARTITION_COLUMNS = ['setor_industria', 'categoria', 'uf', 'none']
+
+UFS = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+       'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
+_UF_DICTIONARY = pd.Index(UFS)
+
+# Colunas planas do CSV com o CNAE, na precedência de CNAE_PATHS (cnae_raw_data)
+CNAE_COLUMNS = ['cnae_fiscal', 'cnae_principal']
+# Colunas calculadas aqui; se vierem no CSV, são substituídas
+DERIVED_COLUMNS = ['cnpj_original', 'cnpj_invalido', 'cnae_code', 'setor_industria', 'categoria', 'uf']
+
+_DOMAIN_SCHEME = r'^[a-z][a-z0-9+.-]*://'
+
+
+class Dictionaries(NamedTuple):
+    """Dicionários fixos da execução: mesmos ids em todos os lotes e arquivos"""
+    cnae_code: 'pa.Array'
+    setor_industria: 'pa.Array'
+    categoria: 'pa.Array'
+    uf: 'pa.Array'
+    cnpj_invalido: 'pa.Array'
+
+
+def build_dictionaries(index: ClassificationIndex) -> Dictionaries:
+    return Dictionaries(
+        cnae_code=pa.array([format_cnae_key(int(key)) for key in index.keys], pa.string()),
+        setor_industria=pa.array(SETORES.values, pa.string()),
+        categoria=pa.array(CATEGORIAS.values, pa.string()),
+        uf=pa.array(UFS, pa.string()),
+        cnpj_invalido=pa.array(REASON_CODES[1:], pa.string()),
+    )
+
+
+def _dictionary_column(ids: 'np.ndarray', dictionary: 'pa.Array', index_type) -> 'pa.DictionaryArray':
+    """Ids -> DictionaryArray (id negativo = nulo)"""
+    missing = ids < 0
+    indices = pa.array(np.where(missing, 0, ids).astype(index_type.to_pandas_dtype()),
+                       type=index_type, mask=missing if missing.any() else None)
+    return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+
+def normalize_domains(values) -> 'pd.Series':
+    """Hostname como extractDomain (URL().hostname, sem www.); nulo quando vazio"""
+    domains = pd.Series(values, dtype='string').str.strip().str.lower()
+    domains = domains.str.replace(_DOMAIN_SCHEME, '', regex=True)
+    domains = domains.str.replace(r'[/?#].*$', '', regex=True)   # caminho, query, fragmento
+    domains = domains.str.replace(r'^.*@', '', regex=True)        # usuário:senha@
+    domains = domains.str.replace(r':\d*$', '', regex=True)       # porta
+    domains = domains.str.replace(r'^www\.', '', regex=True).str.rstrip('.')
+    return domains.mask(domains == '')
+
+
+def _enrichment_from_csv(chunk) -> 'pd.DataFrame':
+    """cnae_code/uf das próprias colunas do CSV (raw_data com JSON ou cnae_fiscal/cnae_principal)"""
+    enrichment = pd.DataFrame(index=range(len(chunk)), columns=['cnae_code', 'uf'], dtype=object)
+    if 'raw_data' in chunk.columns:
+        enrichment['cnae_code'] = [extract_cnae_from_raw_data(_raw_data_from_csv_row(row))
+                                   for row in chunk.to_dict('records')]
+    else:
+        # Sem JSON, a precedência se reduz ao primeiro não vazio (NULLIF(..., ''))
+        codes = np.full(len(chunk), None, dtype=object)
+        for column in reversed(CNAE_COLUMNS):
+            if column in chunk.columns:
+                values = chunk[column].to_numpy(dtype=object)
+                codes = np.where(values != '', values, codes)
+        enrichment['cnae_code'] = codes
+    if 'uf' in chunk.columns:
+        enrichment['uf'] = chunk['uf'].to_numpy(dtype=object)
+    return enrichment
+
+
+def _enrichment_from_store(store, cnpjs: 'np.ndarray', include_stale: bool) -> 'pd.DataFrame':
+    """cnae_code/uf da resposta da Receita guardada no store (faltas e 404 ficam nulos)"""
+    found = store.get_many([cnpj for cnpj in cnpjs if cnpj], include_stale)
+    codes = np.empty(len(cnpjs), dtype=object)
+    ufs = np.empty(len(cnpjs), dtype=object)
+    for i, cnpj in enumerate(cnpjs):
+        entry = found.get(cnpj) if cnpj else None
+        if entry is not None and entry.payload is not None:
+            codes[i] = extract_cnae_from_raw_data(entry.payload)
+            ufs[i] = entry.payload.get('uf')
+    return pd.DataFrame({'cnae_code': codes, 'uf': ufs})
+
+
+class ConvertStats:
+    def __init__(self):
+        self.rows = 0
+        self.invalid_cnpj = 0
+        self.enriched = 0
+        self.classified = 0
+
+
+def convert_batch(chunk, index: ClassificationIndex, dictionaries: Dictionaries,
+                  store=None, include_stale: bool = False,
+                  stats: Optional[ConvertStats] = None) -> 'pa.RecordBatch':
+    """Um lote do CSV (DataFrame de strings) -> RecordBatch normalizado e classificado"""
+    raw = chunk['cnpj'].to_numpy(dtype=object) if 'cnpj' in chunk else np.full(len(chunk), '', dtype=object)
+    cnpj = normalize_cnpj_array(raw)
+    normalized = np.where(cnpj.valid, cnpj.normalized, b'').astype(f'S{CNPJ_LEN}')
+    cnpj_array = pa.array(normalized, pa.binary(CNPJ_LEN), mask=~cnpj.valid).cast(pa.string())
+
+    if store is not None:
+        enrichment = _enrichment_from_store(store, cnpj_array.to_numpy(zero_copy_only=False), include_stale)
+    else:
+        enrichment = _enrichment_from_csv(chunk)
+
+    codes = enrichment['cnae_code'].to_numpy()
+    has_code = pd.notna(codes) & (codes != '')
+    keys = np.full(len(chunk), -1, dtype=np.int64)
+    if has_code.any():
+        keys[has_code] = cnae_keys(codes[has_code])
+    position = index.positions_for(keys)
+    found = position >= 0
+    setor_ids = np.where(found, index.setor_ids[position], -1)
+    categoria_ids = np.where(found, index.categoria_ids[position], -1)
+    uf_ids = _UF_DICTIONARY.get_indexer(pd.Series(enrichment['uf'].to_numpy(), dtype='string').str.upper())
+
+    arrays = {}
+    for column in chunk.columns:
+        if column not in DERIVED_COLUMNS:
+            arrays[column] = pa.array(chunk[column], pa.string())
+    arrays['cnpj'] = cnpj_array
+    arrays['cnpj_original'] = pa.array(np.where(cnpj.valid, None, raw), pa.string())
+    if 'domain' in chunk.columns:
+        arrays['domain'] = pa.array(normalize_domains(chunk['domain']), pa.string())
+    arrays['cnpj_invalido'] = _dictionary_column(cnpj.reason.astype(np.int64) - 1,
+                                                 dictionaries.cnpj_invalido, pa.int8())
+    arrays['cnae_code'] = _dictionary_column(position, dictionaries.cnae_code, pa.int16())
+    arrays['setor_industria'] = _dictionary_column(setor_ids, dictionaries.setor_industria, pa.int16())
+    arrays['categoria'] = _dictionary_column(categoria_ids, dictionaries.categoria, pa.int16())
+    arrays['uf'] = _dictionary_column(uf_ids, dictionaries.uf, pa.int8())
+
+    if stats is not None:
+        stats.rows += len(chunk)
+        stats.invalid_cnpj += int((~cnpj.valid).sum())
+        stats.enriched += int(has_code.sum())
+        stats.classified += int(found.sum())
+    return pa.RecordBatch.from_pydict(arrays)
+
+
+def iter_csv_chunks(input_file: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator:
+    source = sys.stdin if input_file == '-' else input_file
+    yield from pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=batch_size)
+
+
+def convert_csv(input_file: str, output_dir: str, index: ClassificationIndex,
+                output_format: str = 'parquet', partition_by: Optional[str] = 'setor_industria',
+                store=None, include_stale: bool = False, batch_size: int = DEFAULT_BATCH_SIZE,
+                overwrite: bool = False) -> ConvertStats:
+    """Converte o CSV em lotes e grava o dataset particionado"""
+    if not overwrite and os.path.isdir(output_dir) and os.listdir(output_dir):
+        raise ValueError(f"{output_dir} já existe e não está vazio (use --overwrite)")
+    dictionaries = build_dictionaries(index)
+    stats = ConvertStats()
+    chunks = iter_csv_chunks(input_file, batch_size)
+    try:
+        first = next(chunks)
+    except StopIteration:
+        raise ValueError(f"{input_file} está vazio")
+
+    first_batch = convert_batch(first, index, dictionaries, store, include_stale, stats)
+    schema = first_batch.schema
+
+    def batches():
+        yield first_batch
+        for chunk in chunks:
+            batch = convert_batch(chunk, index, dictionaries, store, include_stale, stats)
+            if batch.schema != schema:
+                raise ValueError(f"colunas mudaram no meio do arquivo: {batch.schema.names}")
+            yield batch
+
+    file_format = FORMATS[output_format]
+    if file_format == 'parquet':
+        file_options = ds.ParquetFileFormat().make_write_options(compression='zstd')
+    else:
+        # Sem compressão: os arquivos são lidos por memory map sem cópia
+        file_options = ds.IpcFileFormat().make_write_options()
+    partitioning = None
+    if partition_by and partition_by != 'none':
+        partitioning = ds.partitioning(pa.schema([schema.field(partition_by)]), flavor='hive')
+
+    ds.write_dataset(
+        batches(), output_dir, schema=schema, format=file_format, file_options=file_options,
+        partitioning=partitioning,
+        basename_template='part-{i}.' + ('parquet' if file_format == 'parquet' else 'arrow'),
+        min_rows_per_group=min(batch_size, 65536), max_rows_per_group=1 << 20,
+        existing_data_behavior='delete_matching' if overwrite else 'error',
+    )
+    return stats
+
+
+def _partition_name(path: str) -> Optional[str]:
+    """Coluna da partição hive, pelo nome das pastas (coluna=valor); None sem partições"""
+    for entry in os.scandir(path):
+        if entry.is_dir() and '=' in entry.name:
+            return entry.name.split('=', 1)[0]
+    return None
+
+
+def open_companies(path: str):
+    """Dataset gravado por este script (formato detectado pela extensão dos arquivos)"""
+    # A coluna da partição volta como string, com o tipo explícito: inferido, um
+    # dataset só com __HIVE_DEFAULT_PARTITION__ (tudo nulo) não tem tipo, e como
+    # dictionary cada pasta teria um dicionário próprio
+    partitioning = None
+    name = _partition_name(path)
+    if name:
+        partitioning = ds.partitioning(pa.schema([(name, pa.string())]), flavor='hive')
+    for _, _, files in os.walk(path):
+        if any(name.endswith('.arrow') for name in files):
+            return ds.dataset(path, format='ipc', partitioning=partitioning)
+        if any(name.endswith('.parquet') for name in files):
+            return ds.dataset(path, format='parquet', partitioning=partitioning)
+    raise ValueError(f"nenhum arquivo .parquet/.arrow em {path}")
+
+
+def _dataset_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def _partition_count(path: str) -> int:
+    return sum(1 for _, _, files in os.walk(path) if files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSV de empresas -> Parquet/Arrow particionado e classificado por CNAE')
+    parser.add_argument('input_file', help="CSV de empresas (cnpj,razao_social,nome_fantasia,domain; '-' para stdin)")
+    parser.add_argument('--output', required=True, help='Diretório do dataset de saída')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet',
+                        help='parquet (zstd) ou arrow (IPC, memory map); padrão: parquet')
+    parser.add_argument('--partition-by', choices=PARTITION_COLUMNS, default='setor_industria',
+                        help='Coluna das partições hive (padrão: setor_industria)')
+    parser.add_argument('--store', help='Store da Receita (cnpj_store.py) para cnae_code/uf; sem ele, as colunas do CSV')
+    parser.add_argument('--include-stale', action='store_true', help='Usar também respostas vencidas do store')
+    parser.add_argument('--classifications', default=DEFAULT_CLASSIFICATIONS,
+                        help='Arquivo TSV com as classificações CNAE (padrão: cnae_data_complete.txt)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Linhas por lote (padrão: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--overwrite', action='store_true', help='Substituir as partições já existentes na saída')
+
+    args = parser.parse_args()
+
+    index = ClassificationIndex(args.classifications)
+    print(f"📊 {len(index)} classificações CNAE carregadas", file=sys.stderr)
+
+    store = None
+    if args.store:
+        from cnpj_store import CnpjStore
+        store = CnpjStore(args.store)
+
+    start = time.perf_counter()
+    try:
+        stats = convert_csv(args.input_file, args.output, index, args.format, args.partition_by,
+                            store, args.include_stale, args.batch_size, args.overwrite)
+    except (ValueError, pa.ArrowException) as e:
+        print(f"❌ Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if store is not None:
+            store.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {stats.rows} empresas -> {args.output} ({args.format}, "
+          f"{_partition_count(args.output)} partições, {_dataset_bytes(args.output) / 1024:.0f} KB)", file=sys.stderr)
+    print(f"   CNPJs inválidos: {stats.invalid_cnpj}", file=sys.stderr)
+    print(f"   Com CNAE: {stats.enriched}, classificadas: {stats.classified}", file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({stats.rows / elapsed if elapsed > 0 else 0:.0f} empresas/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
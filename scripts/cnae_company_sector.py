@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Classificação offline de empresas (CNPJ) por CNAE -> sector_name em massa
+
+Faz fora do banco o que o trigger trigger_update_company_sector_from_cnae
+(20260125000011_auto_update_companies_sector_from_cnae.sql) faz linha a linha:
+extrai o CNAE principal com a mesma precedência de extract_cnae_from_raw_data,
+junta em memória com cnae_classifications (join vetorizado por lote) e monta
+sector_name no formato "Setor - Categoria".
+
+Entradas aceitas (lidas em lotes, sem carregar tudo em memória):
+    - CSV (ex: scripts/test-10-companies.csv). Uma coluna raw_data com JSON é
+      usada como payload; senão as próprias colunas (cnae_fiscal,
+      cnae_principal, ...) fazem o papel de raw_data.
+    - Dump JSON da Receita/BrasilAPI: NDJSON (um objeto por linha, .ndjson /
+      .jsonl) ou array JSON (.json).
+
+Saída: CSV com cnpj, cnae_code e sector_name. Com --apply, grava sector_name
+em public.companies via COPY + UPDATE em lote. Como o valor já vem no formato
+"Setor - Categoria", o trigger não refaz a extração/lookup (a condição dele
+só dispara para sector_name vazio ou sem '-'), então importações em massa
+podem preencher sector_name antes do INSERT e dispensar o trabalho por linha.
+
+Uso:
+    python scripts/cnae_company_sector.py empresas_receita.csv --output setores.csv
+    python scripts/cnae_company_sector.py receita_dump.ndjson --output setores.csv --apply
+
+Requisitos:
+    - pandas: pip install pandas
+    - Para --apply: psycopg2 (pip install psycopg2-binary) e DATABASE_URL
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Iterator, Optional
+
+from cnae_codes import normalize_cnae_code
+from cnae_raw_data import extract_cnae_from_raw_data
+from cnae_stream import read_cnae_file
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CLASSIFICATIONS = os.path.join(PROJECT_ROOT, 'cnae_data_complete.txt')
+
+OUTPUT_COLUMNS = ['cnpj', 'cnae_code', 'sector_name']
+
+
+def _require_pandas():
+    try:
+        import pandas as pd
+    except ImportError:
+        print("❌ Erro: pandas não instalado. Execute: pip install pandas", file=sys.stderr)
+        sys.exit(1)
+    return pd
+
+
+def load_classifications(path: str = DEFAULT_CLASSIFICATIONS):
+    """Tabela de classificação indexada pelo cnae_code normalizado, com sector_name pronto"""
+    pd = _require_pandas()
+    # Direto do stream para o dicionário: só um valor por código fica em
+    # memória (vale a última ocorrência, como no upsert)
+    # categoria é NOT NULL na tabela, então o formato é sempre "Setor - Categoria"
+    sectors = {normalize_cnae_code(cnae): f"{setor} - {categoria}" for cnae, setor, categoria in read_cnae_file(path)}
+    return pd.Series(sectors).rename_axis('cnae_code')
+
+
+def _raw_data_from_csv_row(row: dict) -> Optional[dict]:
+    raw = row.get('raw_data')
+    if isinstance(raw, str) and raw.strip():
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+    return row
+
+
+def iter_company_batches(input_file: str, batch_size: int = 10000) -> Iterator:
+    """Gera DataFrames (cnpj, cnae_code) lote a lote a partir de CSV ou dump JSON"""
+    pd = _require_pandas()
+    lower = input_file.lower()
+
+    if lower.endswith(('.ndjson', '.jsonl', '.json')):
+        def json_objects():
+            with open(input_file, 'r', encoding='utf-8') as f:
+                if lower.endswith('.json'):
+                    yield from json.load(f)
+                    return
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+
+        batch = []
+        for payload in json_objects():
+            batch.append((str(payload.get('cnpj') or ''), extract_cnae_from_raw_data(payload)))
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=['cnpj', 'cnae_code'])
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=['cnpj', 'cnae_code'])
+        return
+
+    for chunk in pd.read_csv(input_file, dtype=str, keep_default_na=False, chunksize=batch_size):
+        records = chunk.to_dict('records')
+        yield pd.DataFrame({
+            'cnpj': chunk['cnpj'].values if 'cnpj' in chunk else [''] * len(chunk),
+            'cnae_code': [extract_cnae_from_raw_data(_raw_data_from_csv_row(r)) for r in records],
+        })
+
+
+def classify_batch(batch, sectors):
+    """Join vetorizado do lote com a tabela de classificação (cnae_code -> sector_name)"""
+    batch['sector_name'] = batch['cnae_code'].map(sectors)
+    return batch
+
+
+def connect(db_url: str):
+    """Abre a conexão usada para gravar os lotes em public.companies"""
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ Erro: psycopg2 não instalado. Execute: pip install psycopg2-binary", file=sys.stderr)
+        sys.exit(1)
+
+    conn = psycopg2.connect(db_url)
+    conn.set_client_encoding('UTF8')
+    return conn
+
+
+def apply_to_companies(batch, conn) -> int:
+    """Grava sector_name em public.companies para os CNPJs classificados do lote (uma transação)"""
+    rows = batch.dropna(subset=['sector_name'])
+    rows = rows[rows['cnpj'] != '']
+    if rows.empty:
+        return 0
+
+    buffer = io.StringIO()
+    rows[['cnpj', 'sector_name']].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE companies_sector_staging (cnpj TEXT, sector_name TEXT) ON COMMIT DROP")
+            cur.copy_expert("COPY companies_sector_staging FROM STDIN WITH (FORMAT csv)", buffer)
+            cur.execute("""
+                UPDATE public.companies c
+                SET sector_name = s.sector_name
+                FROM companies_sector_staging s
+                WHERE c.cnpj = s.cnpj
+                  AND c.sector_name IS DISTINCT FROM s.sector_name
+            """)
+            return cur.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Classificar empresas por CNAE (sector_name) em massa')
+    parser.add_argument('input_file', help='CSV de empresas ou dump JSON/NDJSON da Receita')
+    parser.add_argument('--output', help='CSV de saída (cnpj, cnae_code, sector_name); padrão: stdout')
+    parser.add_argument('--classifications', default=DEFAULT_CLASSIFICATIONS,
+                        help='Arquivo TSV com as classificações CNAE (padrão: cnae_data_complete.txt)')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Linhas por lote (padrão: 10000)')
+    parser.add_argument('--apply', action='store_true', help='Gravar sector_name em public.companies')
+    parser.add_argument('--db-url', help='Connection string do Postgres para --apply (padrão: DATABASE_URL)')
+
+    args = parser.parse_args()
+
+    conn = None
+    if args.apply:
+        from cnae_copy_loader import resolve_db_url
+        conn = connect(resolve_db_url(args.db_url))
+
+    sectors = load_classifications(args.classifications)
+    print(f"📊 {len(sectors)} classificações CNAE carregadas", file=sys.stderr)
+
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    total = classified = updated = 0
+    start = time.perf_counter()
+    try:
+        for i, batch in enumerate(iter_company_batches(args.input_file, args.batch_size)):
+            batch = classify_batch(batch, sectors)
+            batch[OUTPUT_COLUMNS].to_csv(output, index=False, header=(i == 0))
+            total += len(batch)
+            classified += int(batch['sector_name'].notna().sum())
+            if conn is not None:
+                updated += apply_to_companies(batch, conn)
+            print(f"✅ Lote {i + 1}: {len(batch)} empresas (Total: {total})", file=sys.stderr)
+    finally:
+        if args.output:
+            output.close()
+        if conn is not None:
+            conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Concluído! {classified}/{total} empresas classificadas", file=sys.stderr)
+    if args.apply:
+        print(f"   Empresas atualizadas em companies: {updated}", file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({total / elapsed if elapsed > 0 else 0:.0f} empresas/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
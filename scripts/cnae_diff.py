@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Sincronização incremental (diff) de cnae_classifications
+
+Baixa a tabela atual uma única vez como snapshot compacto (cnae_code -> hash
+de setor/categoria), opcionalmente salvo em arquivo de cache, e compara com os
+dados de entrada. Só os registros novos, alterados e (opcionalmente) removidos
+são escritos, seja como migration SQL mínima ou como upserts direcionados.
+
+Uso:
+    # Migration SQL só com o que mudou
+    python scripts/process_cnae_data.py --input-file cnae_data_complete.txt --generate-sql --diff --snapshot .cnae_snapshot.json
+
+    # Upserts direcionados no Supabase
+    python scripts/populate_cnae_classifications_complete.py --input-file cnae_data_complete.txt --diff --snapshot .cnae_snapshot.json
+
+    # Apenas mostrar o diff
+    python scripts/cnae_diff.py cnae_data_complete.txt --snapshot .cnae_snapshot.json
+
+Requisitos:
+    - supabase-py: pip install supabase (só quando o snapshot precisa ser baixado)
+    - Variáveis de ambiente: SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from cnae_stream import CnaeRecord, read_cnae_file
+
+TABLE = 'cnae_classifications'
+PAGE_SIZE = 1000
+SNAPSHOT_VERSION = 1
+
+
+def row_hash(setor: str, categoria: str) -> str:
+    """Hash curto do conteúdo de uma classificação"""
+    return hashlib.blake2b(f"{setor}\x1f{categoria}".encode('utf-8'), digest_size=8).hexdigest()
+
+
+def snapshot_from_records(records: Iterable[CnaeRecord]) -> Dict[str, str]:
+    """Monta o snapshot compacto (cnae_code -> hash) a partir de tuplas"""
+    return {cnae: row_hash(setor, categoria) for cnae, setor, categoria in records}
+
+
+def content_hash(snapshot: Dict[str, str]) -> str:
+    """Hash do snapshot inteiro (independe da ordem)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for cnae in sorted(snapshot):
+        digest.update(f"{cnae}\x1f{snapshot[cnae]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_supabase_client():
+    """Cria o client Supabase a partir das variáveis de ambiente"""
+    try:
+        from supabase import create_client
+    except ImportError:
+        print("❌ Erro: supabase-py não instalado. Execute: pip install supabase", file=sys.stderr)
+        sys.exit(1)
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+    if not supabase_url or not supabase_key:
+        print("❌ Erro: SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY devem estar configurados", file=sys.stderr)
+        sys.exit(1)
+
+    return create_client(supabase_url, supabase_key)
+
+
+def fetch_snapshot(supabase) -> Dict[str, str]:
+    """Baixa cnae_classifications paginado (uma passada) e devolve o snapshot"""
+    snapshot = {}
+    offset = 0
+    while True:
+        result = supabase.table(TABLE).select("cnae_code,setor_industria,categoria") \
+            .order("cnae_code").range(offset, offset + PAGE_SIZE - 1).execute()
+        rows = result.data or []
+        for row in rows:
+            snapshot[row["cnae_code"]] = row_hash(row["setor_industria"], row["categoria"])
+        if len(rows) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return snapshot
+
+
+def load_snapshot(path: str) -> Optional[Dict[str, str]]:
+    """Lê o snapshot do arquivo de cache (None se não existir ou for de outra versão)"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    if payload.get('version') != SNAPSHOT_VERSION:
+        return None
+    return payload['rows']
+
+
+def save_snapshot(path: str, snapshot: Dict[str, str]):
+    """Grava o snapshot no arquivo de cache"""
+    payload = {
+        'version': SNAPSHOT_VERSION,
+        'saved_at': datetime.now(timezone.utc).isoformat(),
+        'content_hash': content_hash(snapshot),
+        'rows': snapshot,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(',', ':'), sort_keys=True)
+
+
+def get_snapshot(path: Optional[str] = None, refresh: bool = False,
+                 include_deletes: bool = False) -> Dict[str, str]:
+    """
+    Usa o snapshot em cache ou baixa da tabela (e salva no cache, se informado).
+
+    Com `include_deletes` o cache não é usado: a lista de remoção tem de sair
+    da tabela como está agora, não de um snapshot possivelmente antigo.
+    """
+    if include_deletes and not refresh:
+        if path and os.path.exists(path):
+            print("🔄 --delete: ignorando o snapshot em cache e baixando da tabela", file=sys.stderr)
+        refresh = True
+    snapshot = None if refresh else load_snapshot(path)
+    if snapshot is not None:
+        print(f"📦 Snapshot em cache: {path} ({len(snapshot)} registros)", file=sys.stderr)
+        return snapshot
+
+    snapshot = fetch_snapshot(get_supabase_client())
+    print(f"📥 Snapshot baixado: {len(snapshot)} registros", file=sys.stderr)
+    if path:
+        save_snapshot(path, snapshot)
+    return snapshot
+
+
+class CnaeDiff:
+    """Diferença entre os dados de entrada e o snapshot da tabela"""
+
+    def __init__(self):
+        self.inserts: List[CnaeRecord] = []
+        self.updates: List[CnaeRecord] = []
+        self.deletes: List[str] = []
+        self.unchanged = 0
+        self.duplicates = 0
+
+    @property
+    def changes(self) -> List[CnaeRecord]:
+        return self.inserts + self.updates
+
+    def is_empty(self) -> bool:
+        return not (self.inserts or self.updates or self.deletes)
+
+    def apply_to(self, snapshot: Dict[str, str]) -> Dict[str, str]:
+        """Snapshot resultante depois de aplicar este diff"""
+        result = dict(snapshot)
+        for cnae, setor, categoria in self.changes:
+            result[cnae] = row_hash(setor, categoria)
+        for cnae in self.deletes:
+            result.pop(cnae, None)
+        return result
+
+
+def diff_records(records: Iterable[CnaeRecord], snapshot: Dict[str, str],
+                 include_deletes: bool = False) -> CnaeDiff:
+    """
+    Compara os registros de entrada com o snapshot por hash. Códigos repetidos
+    na entrada valem pela última ocorrência (como no upsert), e cada código
+    entra no diff uma vez só: o mesmo código duas vezes no mesmo
+    INSERT ... ON CONFLICT falha com "cannot affect row a second time".
+    """
+    diff = CnaeDiff()
+    latest: Dict[str, CnaeRecord] = {}
+    for record in records:
+        if record[0] in latest:
+            diff.duplicates += 1
+        latest[record[0]] = record
+    for cnae, setor, categoria in latest.values():
+        current = snapshot.get(cnae)
+        if current is None:
+            diff.inserts.append((cnae, setor, categoria))
+        elif current != row_hash(setor, categoria):
+            diff.updates.append((cnae, setor, categoria))
+        else:
+            diff.unchanged += 1
+    if include_deletes:
+        diff.deletes = sorted(code for code in snapshot if code not in latest)
+    return diff
+
+
+def print_diff_summary(diff: CnaeDiff):
+    print(f"🔍 Diff: {len(diff.inserts)} novos, {len(diff.updates)} alterados, "
+          f"{len(diff.deletes)} removidos, {diff.unchanged} sem alteração", file=sys.stderr)
+    if diff.duplicates:
+        print(f"⚠️ {diff.duplicates} códigos repetidos na entrada (vale a última ocorrência)", file=sys.stderr)
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def generate_diff_sql(diff: CnaeDiff) -> str:
+    """Gera migration SQL mínima com apenas as mudanças do diff"""
+    sql = f"""-- ============================================================================
+-- MIGRATION: Sincronização incremental de cnae_classifications
+-- ============================================================================
+-- Novos: {len(diff.inserts)} | Alterados: {len(diff.updates)} | Removidos: {len(diff.deletes)}
+-- ============================================================================
+"""
+    if diff.changes:
+        values = ',\n'.join(
+            f"({_quote(cnae)}, {_quote(setor)}, {_quote(categoria)})"
+            for cnae, setor, categoria in diff.changes
+        )
+        sql += f"""
+INSERT INTO public.cnae_classifications (cnae_code, setor_industria, categoria) VALUES
+{values}
+ON CONFLICT (cnae_code) DO UPDATE SET
+  setor_industria = EXCLUDED.setor_industria,
+  categoria = EXCLUDED.categoria,
+  updated_at = NOW();
+"""
+    if diff.deletes:
+        codes = ', '.join(_quote(cnae) for cnae in diff.deletes)
+        sql += f"""
+DELETE FROM public.cnae_classifications WHERE cnae_code IN ({codes});
+"""
+    return sql
+
+
+def apply_diff(supabase, diff: CnaeDiff, batch_size: int = 100) -> int:
+    """Aplica o diff com upserts/deletes direcionados; retorna registros escritos"""
+    written = 0
+    changes = diff.changes
+    for i in range(0, len(changes), batch_size):
+        records = [
+            {"cnae_code": cnae, "setor_industria": setor, "categoria": categoria}
+            for cnae, setor, categoria in changes[i:i + batch_size]
+        ]
+        supabase.table(TABLE).upsert(records, on_conflict="cnae_code").execute()
+        written += len(records)
+        print(f"✅ Lote {i//batch_size + 1}: {len(records)} registros (Total: {written})", file=sys.stderr)
+    for i in range(0, len(diff.deletes), batch_size):
+        codes = diff.deletes[i:i + batch_size]
+        supabase.table(TABLE).delete().in_("cnae_code", codes).execute()
+        written += len(codes)
+        print(f"🗑️  Removidos {len(codes)} registros", file=sys.stderr)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff entre dados CNAE e a tabela cnae_classifications')
+    parser.add_argument('input_file', help="Arquivo com dados CNAE ('-' para stdin, aceita .gz)")
+    parser.add_argument('--snapshot', help='Arquivo de cache do snapshot da tabela')
+    parser.add_argument('--refresh', action='store_true', help='Ignorar cache e baixar snapshot novamente')
+    parser.add_argument('--delete', action='store_true', help='Incluir remoção de CNAEs ausentes da entrada (sempre baixa o snapshot da tabela)')
+    parser.add_argument('--output', help='Gravar migration SQL do diff neste arquivo')
+
+    args = parser.parse_args()
+
+    snapshot = get_snapshot(args.snapshot, args.refresh, args.delete)
+    diff = diff_records(read_cnae_file(args.input_file), snapshot, args.delete)
+    print_diff_summary(diff)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(generate_diff_sql(diff))
+        print(f"✅ SQL gerado em: {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
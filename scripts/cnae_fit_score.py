@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Fit score de prospects contra o ICP em massa (offline, vetorizado)
+
+Faz fora da Edge Function o que qualify-prospects-bulk calcula prospect a
+prospect (calculateFitScore -> calculateProductSimilarity/SectorFit/
+CapitalFit/GeoFit), com os mesmos pesos e faixas:
+
+    fit = produto * 0.30 + setor * 0.25 + capital * 0.20 + geo * 0.15 + maturidade * 0.10
+    fit = min(100, fit + website_fit_score)
+    grade: A+ (>= 95), A (>= 85), B (>= 70), C (>= 60), D
+
+A diferença é o setor: em vez do mapa de 9 entradas pelo primeiro dígito do
+CNAE (enrichProspect), o CNAE principal é juntado em memória com
+cnae_classifications (cnae_data_complete.txt, busca binária pela chave de 7
+dígitos) e setor_industria é comparado com setores_alvo. cnaes_alvo é
+comparado pela chave de 7 dígitos, então '6203-1/00', '62.03-1/00' e 6203100
+são o mesmo código. Maturidade continua fixa em 70, como na função.
+
+Cada lote do CSV vira colunas NumPy; os sub-scores são operações sobre as
+colunas inteiras (np.select/np.isin/busca binária), sem laço por prospect.
+
+Entrada: CSV com as colunas de scripts/test-10-companies.csv (cnpj,
+razao_social, nome_fantasia, domain) mais os campos da Receita/BrasilAPI
+usados pela função; colunas ausentes valem como vazias:
+    - cnae_fiscal (ou cnae_principal), uf (ou estado), municipio (ou cidade)
+    - capital_social, produtos_count, website_fit_score
+
+ICP: JSON com uma linha da tabela icp (setores_alvo, cnaes_alvo,
+estados_alvo, capital_min, capital_max). Sem --icp vale o score neutro da
+função (50 em tudo, grade C).
+
+Saída (colunas de qualified_prospects): .parquet (um row group por lote,
+requer pyarrow) ou CSV (arquivo ou stdout), pronto para COPY.
+
+Uso:
+    python scripts/cnae_fit_score.py prospects.csv --icp icp.json --output scores.csv
+    python scripts/cnae_fit_score.py prospects.csv --icp icp.json --output scores.parquet --batch-size 500000
+    python scripts/cnae_fit_score.py --benchmark 5000000 --icp icp.json
+
+Requisitos:
+    - pandas e numpy: pip install pandas numpy
+    - Para .parquet: pyarrow (pip install pyarrow)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Iterator, List, NamedTuple, Optional
+
+from cnae_records import SETORES, read_cnae_columns
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    print("❌ Erro: pandas/numpy não instalados. Execute: pip install pandas numpy", file=sys.stderr)
+    sys.exit(1)
+
+from cnae_vectorized import normalize_cnae_array
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CLASSIFICATIONS = os.path.join(PROJECT_ROOT, 'cnae_data_complete.txt')
+DEFAULT_BATCH_SIZE = 200000
+
+# Pesos de calculateFitScore (qualify-prospects-bulk/index.ts)
+PRODUCT_WEIGHT = 0.30
+SECTOR_WEIGHT = 0.25
+CAPITAL_WEIGHT = 0.20
+GEO_WEIGHT = 0.15
+MATURITY_WEIGHT = 0.10
+MATURITY_SCORE = 70  # fixo em 70, como na função
+NEUTRAL_SCORE = 50
+
+GRADE_THRESHOLDS = [(95, 'A+'), (85, 'A'), (70, 'B'), (60, 'C')]
+
+# Coluna lógica -> nomes aceitos no CSV (o primeiro presente vence)
+INPUT_COLUMNS = {
+    'cnpj': ['cnpj'],
+    'razao_social': ['razao_social'],
+    'nome_fantasia': ['nome_fantasia'],
+    'cnae': ['cnae_fiscal', 'cnae_principal'],
+    'estado': ['uf', 'estado'],
+    'cidade': ['municipio', 'cidade'],
+    'capital_social': ['capital_social'],
+    'produtos_count': ['produtos_count'],
+    'website_fit_score': ['website_fit_score'],
+}
+
+OUTPUT_COLUMNS = [
+    'cnpj', 'razao_social', 'nome_fantasia', 'cidade', 'estado', 'setor', 'capital_social',
+    'cnae_principal', 'produtos_count', 'website_fit_score', 'fit_score', 'grade',
+    'product_similarity_score', 'sector_fit_score', 'capital_fit_score', 'geo_fit_score',
+    'maturity_score', 'fit_reasons',
+]
+
+
+class Icp(NamedTuple):
+    """Campos do ICP usados no fit score"""
+    setores_alvo: List[str]
+    cnaes_alvo: List[str]
+    estados_alvo: List[str]
+    capital_min: float
+    capital_max: float
+
+
+def load_icp(path: str) -> Icp:
+    """Lê uma linha da tabela icp em JSON (objeto, ou lista com o ICP mais recente primeiro)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = data[0] if data else {}
+    # Mesma leitura da função: `|| 0` e `|| Infinity`
+    return Icp(
+        setores_alvo=[str(s) for s in data.get('setores_alvo') or []],
+        cnaes_alvo=[str(c) for c in data.get('cnaes_alvo') or []],
+        estados_alvo=[str(e) for e in data.get('estados_alvo') or []],
+        capital_min=float(data.get('capital_min') or 0),
+        capital_max=float(data.get('capital_max') or np.inf),
+    )
+
+
+class ClassificationIndex:
+    """cnae_classifications em memória: chaves ordenadas e id do setor, para join por busca binária"""
+
+    def __init__(self, path: str = DEFAULT_CLASSIFICATIONS):
+        columns = read_cnae_columns(path)
+        columns.sort()
+        self.keys = np.frombuffer(columns.keys, dtype=np.uint32).astype(np.int64)
+        self.setor_ids = np.frombuffer(columns.setor_ids, dtype=np.uint16).astype(np.int32)
+        self.categoria_ids = np.frombuffer(columns.categoria_ids, dtype=np.uint16).astype(np.int32)
+        # Último id = setor desconhecido (CNAE fora da tabela)
+        self.setores = np.array(SETORES.values + [''], dtype=object)
+        self.unknown = len(SETORES)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def positions_for(self, keys) -> 'np.ndarray':
+        """Posição de cada chave na tabela (-1 quando a chave não está nela)"""
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        index = np.searchsorted(self.keys, keys)
+        index[index == len(self.keys)] = 0
+        return np.where(self.keys[index] == keys, index, -1)
+
+    def setor_ids_for(self, keys) -> 'np.ndarray':
+        """Id do setor de cada chave (self.unknown quando a chave não está na tabela)"""
+        index = self.positions_for(keys)
+        return np.where(index >= 0, self.setor_ids[index], self.unknown)
+
+    def setor_mask(self, setores: List[str]) -> 'np.ndarray':
+        """Máscara por id de setor (inclui o id desconhecido, sempre False)"""
+        return np.isin(self.setores, list(setores)) & (np.arange(len(self.setores)) != self.unknown)
+
+
+def cnae_keys(values) -> 'np.ndarray':
+    """
+    Chave de 7 dígitos de cada CNAE (-1 quando inválido). Numéricos (cnae_fiscal
+    da Receita, ex: 111301) são usados direto, com o zero à esquerda implícito;
+    o resto passa por normalize_cnae_array
+    """
+    values = pd.Series(values, dtype=object)
+    numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+    is_key = (numeric >= 0) & (numeric < 10_000_000) & (numeric == np.floor(numeric))
+    keys = np.full(len(values), -1, dtype=np.int64)
+    keys[is_key] = numeric[is_key].astype(np.int64)
+    rest = np.flatnonzero(~is_key)
+    if len(rest):
+        keys[rest] = normalize_cnae_array(values.to_numpy()[rest]).keys
+    return keys
+
+
+def _numeric_column(batch, name: str) -> 'np.ndarray':
+    """Coluna numérica (vazio/inválido = 0, como parseFloat(x || '0') na função)"""
+    values = batch[name].to_numpy(dtype=object, copy=True)
+    values[values == ''] = '0'
+    try:
+        # Caminho rápido (coluna toda numérica): ~2x mais rápido que pd.to_numeric
+        numbers = values.astype(np.float64)
+    except (TypeError, ValueError):
+        numbers = pd.to_numeric(batch[name], errors='coerce').to_numpy(dtype=np.float64)
+    return np.nan_to_num(numbers, nan=0.0, posinf=np.inf, neginf=-np.inf)
+
+
+def _reason_table() -> List[str]:
+    """
+    fit_reasons por combinação de sub-scores acima de 80 (como na função).
+    Índice: produto (1) + capital (2) + geo (4) + setor 90/95 (8/16)
+    """
+    table = []
+    for sector in (None, 90, 95):
+        for code in range(8):
+            reasons = []
+            if code & 1:
+                reasons.append('Produtos altamente compatíveis (85%)')
+            if sector:
+                reasons.append(f'Setor ideal ({sector}%)')
+            if code & 2:
+                reasons.append('Capital social adequado (95%)')
+            if code & 4:
+                reasons.append('Região estratégica (90%)')
+            table.append(json.dumps(reasons, ensure_ascii=False))
+    return table
+
+
+REASONS = np.array(_reason_table(), dtype=object)
+NEUTRAL_REASONS = json.dumps(['ICP não configurado - score padrão aplicado'], ensure_ascii=False)
+
+
+def score_batch(batch, index: ClassificationIndex, icp: Optional[Icp]):
+    """Calcula setor, sub-scores, fit_score e grade de um lote (DataFrame com as colunas lógicas)"""
+    n = len(batch)
+    keys = cnae_keys(batch['cnae'].to_numpy())
+    setor_ids = index.setor_ids_for(keys)
+    capital = _numeric_column(batch, 'capital_social')
+    produtos = _numeric_column(batch, 'produtos_count')
+    website = _numeric_column(batch, 'website_fit_score')
+
+    out = pd.DataFrame({
+        'cnpj': batch['cnpj'].to_numpy(),
+        'razao_social': batch['razao_social'].to_numpy(),
+        'nome_fantasia': batch['nome_fantasia'].to_numpy(),
+        'cidade': batch['cidade'].to_numpy(),
+        'estado': batch['estado'].to_numpy(),
+        'setor': index.setores[setor_ids],
+        'capital_social': capital,
+        'cnae_principal': batch['cnae'].to_numpy(),
+        'produtos_count': produtos.astype(np.int64),
+        'website_fit_score': website,
+    })
+
+    if icp is None:
+        # Sem ICP a função devolve 50 + website fit (sem teto) e grade C
+        neutral = np.full(n, float(NEUTRAL_SCORE))
+        out['fit_score'] = np.round(neutral + website, 2)
+        out['grade'] = 'C'
+        for column in ('product_similarity_score', 'sector_fit_score', 'capital_fit_score',
+                       'geo_fit_score', 'maturity_score'):
+            out[column] = neutral
+        out['fit_reasons'] = NEUTRAL_REASONS
+        return out
+
+    # calculateProductSimilarity: pela quantidade de produtos
+    product = np.select([produtos <= 0, produtos < 5, produtos < 20], [30.0, 50.0, 70.0], 85.0)
+    # calculateSectorFit: setor alvo (90) antes de CNAE alvo (95)
+    setor_hit = index.setor_mask(icp.setores_alvo)[setor_ids]
+    target_keys = cnae_keys(icp.cnaes_alvo)
+    cnae_hit = np.isin(keys, target_keys[target_keys >= 0])
+    sector = np.where(setor_hit, 90.0, np.where(cnae_hit, 95.0, 50.0))
+    # calculateCapitalFit
+    capital_fit = np.select(
+        [(capital >= icp.capital_min) & (capital <= icp.capital_max),
+         (capital >= icp.capital_min * 0.5) & (capital <= icp.capital_max * 1.5)],
+        [95.0, 70.0], 40.0)
+    # calculateGeoFit
+    geo = np.where(np.isin(batch['estado'].to_numpy(), icp.estados_alvo), 90.0, 60.0)
+    maturity = np.full(n, float(MATURITY_SCORE))
+
+    # Mesma ordem de soma da função (mesmo arredondamento em float64)
+    base = (product * PRODUCT_WEIGHT + sector * SECTOR_WEIGHT + capital_fit * CAPITAL_WEIGHT
+            + geo * GEO_WEIGHT + maturity * MATURITY_WEIGHT)
+    fit = np.minimum(100.0, base + website)
+
+    grades = np.full(n, 'D', dtype=object)
+    for threshold, grade in reversed(GRADE_THRESHOLDS):
+        grades[fit >= threshold] = grade
+
+    reason = ((product > 80) * 1 + (capital_fit > 80) * 2 + (geo > 80) * 4
+              + (sector == 90) * 8 + (sector == 95) * 16)
+    out['fit_score'] = np.round(fit, 2)
+    out['grade'] = grades
+    out['product_similarity_score'] = product
+    out['sector_fit_score'] = sector
+    out['capital_fit_score'] = capital_fit
+    out['geo_fit_score'] = geo
+    out['maturity_score'] = maturity
+    out['fit_reasons'] = REASONS[reason]
+    return out
+
+
+def _select_columns(chunk):
+    """Renomeia as colunas do CSV para as colunas lógicas (ausentes viram vazias)"""
+    data = {}
+    for name, aliases in INPUT_COLUMNS.items():
+        source = next((alias for alias in aliases if alias in chunk.columns), None)
+        data[name] = chunk[source] if source is not None else pd.Series([''] * len(chunk), index=chunk.index)
+    return pd.DataFrame(data)
+
+
+def iter_prospect_batches(input_file: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator:
+    """Lê o CSV de prospects em lotes, só com as colunas usadas"""
+    wanted = {alias for aliases in INPUT_COLUMNS.values() for alias in aliases}
+    source = sys.stdin if input_file == '-' else input_file
+    for chunk in pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=batch_size,
+                             usecols=lambda column: column in wanted):
+        yield _select_columns(chunk)
+
+
+def synthetic_batches(total: int, batch_size: int, index: ClassificationIndex, seed: int = 42) -> Iterator:
+    """Prospects sintéticos (CNAEs da tabela + alguns inválidos) para --benchmark"""
+    rng = np.random.default_rng(seed)
+    cnaes = np.append(index.keys.astype(str), ['0000000', '62.03-1/00', ''])
+    estados = np.array(['SP', 'RJ', 'MG', 'SC', 'PR', 'RS', 'BA', 'PE', ''], dtype=object)
+    for start in range(0, total, batch_size):
+        n = min(batch_size, total - start)
+        cnpjs = pd.Series(np.arange(start, start + n, dtype=np.int64)).astype(str).str.zfill(14)
+        yield pd.DataFrame({
+            'cnpj': cnpjs.to_numpy(),
+            'razao_social': '',
+            'nome_fantasia': '',
+            'cnae': cnaes[rng.integers(0, len(cnaes), n)],
+            'estado': estados[rng.integers(0, len(estados), n)],
+            'cidade': '',
+            'capital_social': np.round(rng.lognormal(12, 2, n), 2).astype(str),
+            'produtos_count': rng.integers(0, 30, n).astype(str),
+            'website_fit_score': np.where(rng.random(n) < 0.2, '20', '0'),
+        })
+
+
+class ResultWriter:
+    """Grava os lotes pontuados em Parquet (um row group por lote) ou CSV (via pyarrow quando disponível)"""
+
+    def __init__(self, output: Optional[str]):
+        self.output = output
+        self._parquet = None
+        self._arrow_csv = None
+        self._header = True
+        try:
+            import pyarrow  # noqa: F401
+            self._has_arrow = True
+        except ImportError:
+            self._has_arrow = False
+        self._is_parquet = bool(output) and output.lower().endswith('.parquet')
+        if self._is_parquet and not self._has_arrow:
+            print("❌ Erro: pyarrow não instalado. Execute: pip install pyarrow", file=sys.stderr)
+            sys.exit(1)
+        if self._is_parquet:
+            self._file = None
+        elif output:
+            self._file = open(output, 'wb' if self._has_arrow else 'w',
+                              **({} if self._has_arrow else {'encoding': 'utf-8', 'newline': ''}))
+        else:
+            self._file = sys.stdout.buffer if self._has_arrow else sys.stdout
+
+    def write(self, scored):
+        if not self._has_arrow:
+            scored[OUTPUT_COLUMNS].to_csv(self._file, index=False, header=self._header)
+            self._header = False
+            return
+
+        import pyarrow as pa
+        table = pa.Table.from_pandas(scored[OUTPUT_COLUMNS], preserve_index=False)
+        if self._is_parquet:
+            import pyarrow.parquet as pq
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.output, table.schema, compression='zstd')
+            self._parquet.write_table(table)
+        else:
+            # ~9x mais rápido que DataFrame.to_csv
+            import pyarrow.csv as pa_csv
+            if self._arrow_csv is None:
+                self._arrow_csv = pa_csv.CSVWriter(self._file, table.schema)
+            self._arrow_csv.write_table(table)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._arrow_csv is not None:
+            self._arrow_csv.close()
+        if self._file is not None and self._file not in (sys.stdout, sys.stdout.buffer):
+            self._file.close()
+        elif self._file is not None:
+            self._file.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit score de prospects contra o ICP em massa (vetorizado)')
+    parser.add_argument('input_file', nargs='?', help="CSV de prospects ('-' para stdin)")
+    parser.add_argument('--icp', help='JSON com o ICP (linha da tabela icp); sem ele vale o score neutro')
+    parser.add_argument('--output', help='Saída .parquet ou .csv (padrão: CSV no stdout)')
+    parser.add_argument('--classifications', default=DEFAULT_CLASSIFICATIONS,
+                        help='Arquivo TSV com as classificações CNAE (padrão: cnae_data_complete.txt)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Prospects por lote (padrão: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help='Medir prospects/s com N prospects sintéticos (sem gravar saída, exceto com --output)')
+
+    args = parser.parse_args()
+
+    if not args.input_file and not args.benchmark:
+        parser.error('informe o CSV de prospects ou --benchmark N')
+
+    icp = load_icp(args.icp) if args.icp else None
+    index = ClassificationIndex(args.classifications)
+    print(f"📊 {len(index)} classificações CNAE carregadas"
+          + ('' if icp else ' (sem ICP: score neutro)'), file=sys.stderr)
+
+    if args.benchmark:
+        batches = synthetic_batches(args.benchmark, args.batch_size, index)
+    else:
+        batches = iter_prospect_batches(args.input_file, args.batch_size)
+    writer = ResultWriter(args.output) if args.output or not args.benchmark else None
+
+    total = 0
+    grades = {}
+    start = time.perf_counter()
+    try:
+        for i, batch in enumerate(batches):
+            scored = score_batch(batch, index, icp)
+            if writer is not None:
+                writer.write(scored)
+            total += len(scored)
+            for grade, count in scored['grade'].value_counts().items():
+                grades[grade] = grades.get(grade, 0) + int(count)
+            print(f"✅ Lote {i + 1}: {len(scored)} prospects (Total: {total})", file=sys.stderr)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Concluído! {total} prospects pontuados", file=sys.stderr)
+    print("   " + ' | '.join(f"{grade}: {grades.get(grade, 0)}" for grade in ['A+', 'A', 'B', 'C', 'D']),
+          file=sys.stderr)
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"   ⏱️ {elapsed:.2f}s ({rate:.0f} prospects/s, {rate * 60 / 1e6:.1f} milhões/min)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Índice hierárquico CNAE (seção / divisão / grupo / classe / subclasse)
+
+cnae_data_complete.txt e cnae_classifications são planos (subclasse ->
+setor/categoria). Este artefato acrescenta a estrutura do IBGE sobre as
+subclasses ordenadas pela chave de 7 dígitos:
+
+    - section:  letra (A-U), derivada da divisão pela tabela do IBGE
+    - division: 2 dígitos    - group: 3 dígitos    - class: 4 dígitos
+
+Como a ordem da chave é a ordem da hierarquia, cada nó cobre um intervalo
+contínuo [start, end) de subclasses e um intervalo contínuo de filhos no
+nível seguinte. Para cada setor e categoria há um bitset de subclasses (bit
+i = subclasse i), e cada nó traz os bitsets dos setores/categorias presentes
+abaixo dele (rollups prontos).
+
+"Todas as subclasses da divisão 62 na categoria Fabricante" vira a interseção
+do intervalo da divisão com o bitset da categoria, sem varrer a tabela (o que
+getCNAEsBySetor / getCNAEsBySetorECategoria fazem a cada filtro de ICP).
+
+Os bitsets vão no JSON como hexadecimal (BigInt('0x' + hex) no frontend).
+
+Uso:
+    # Compilar (padrão: public/cnae-hierarchy.json)
+    python scripts/cnae_hierarchy.py build cnae_data_complete.txt
+
+    # Subclasses de um nó, filtradas por setor/categoria
+    python scripts/cnae_hierarchy.py query 62 --categoria Fabricante
+    python scripts/cnae_hierarchy.py query C --setor Alimentos
+
+    # Contagem por nó de um nível
+    python scripts/cnae_hierarchy.py rollup division --categoria Fabricante
+
+    # Tabela de nós (TSV para COPY)
+    python scripts/cnae_hierarchy.py nodes > cnae_hierarchy.tsv
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from cnae_codes import cnae_digits, cnae_key, format_cnae_key
+from cnae_lookup import DEFAULT_INPUT, PROJECT_ROOT
+from cnae_stream import CnaeRecord, read_cnae_file
+
+FORMAT_VERSION = 1
+
+DEFAULT_OUTPUT = os.path.join(PROJECT_ROOT, 'public', 'cnae-hierarchy.json')
+
+# Níveis acima da subclasse e quantos dígitos da chave cada um usa
+LEVELS = ('section', 'division', 'group', 'class')
+LEVEL_DIGITS = {'division': 2, 'group': 3, 'class': 4}
+
+# Seções da CNAE 2.0 (IBGE): letra -> divisões (inclusive)
+SECTIONS = (
+    ('A', 1, 3), ('B', 5, 9), ('C', 10, 33), ('D', 35, 35), ('E', 36, 39),
+    ('F', 41, 43), ('G', 45, 47), ('H', 49, 53), ('I', 55, 56), ('J', 58, 63),
+    ('K', 64, 66), ('L', 68, 68), ('M', 69, 75), ('N', 77, 82), ('O', 84, 84),
+    ('P', 85, 85), ('Q', 86, 88), ('R', 90, 93), ('S', 94, 96), ('T', 97, 97),
+    ('U', 99, 99),
+)
+SECTION_BY_DIVISION = {division: letter for letter, first, last in SECTIONS for division in range(first, last + 1)}
+
+
+class CnaeMatch(NamedTuple):
+    """Subclasse selecionada no índice"""
+    cnae_code: str
+    setor_industria: str
+    categoria: str
+
+
+def node_code(level: str, key: int) -> str:
+    """Código do nó de `level` que contém a subclasse `key`"""
+    if level == 'section':
+        division = key // 100000
+        if division not in SECTION_BY_DIVISION:
+            raise ValueError(f"Divisão {division:02d} fora das seções da CNAE 2.0")
+        return SECTION_BY_DIVISION[division]
+    return f"{key:07d}"[:LEVEL_DIGITS[level]]
+
+
+def _bits(ids: Iterable[int]) -> int:
+    mask = 0
+    for i in ids:
+        mask |= 1 << i
+    return mask
+
+
+def _hex(mask: int) -> str:
+    return format(mask, 'x')
+
+
+def build_hierarchy(records: Iterable[CnaeRecord]) -> dict:
+    """Compila os registros no índice hierárquico (dict pronto para JSON)"""
+    by_key: Dict[int, CnaeRecord] = {}
+    skipped = 0
+    unknown_divisions: Dict[int, int] = {}
+    for record in records:
+        key = cnae_key(record[0])
+        if key is None:
+            skipped += 1
+            continue
+        division = key // 100000
+        if division not in SECTION_BY_DIVISION:
+            # Sem seção não há onde pendurar o nó (ex: 0411-1/00)
+            unknown_divisions[division] = unknown_divisions.get(division, 0) + 1
+            continue
+        by_key[key] = record  # última ocorrência vence, como no upsert
+
+    codes: List[int] = sorted(by_key)
+    setores: Dict[str, int] = {}
+    categorias: Dict[str, int] = {}
+    setor_ids: List[int] = []
+    categoria_ids: List[int] = []
+    digest = hashlib.blake2b(digest_size=16)
+    for key in codes:
+        _, setor, categoria = by_key[key]
+        setor_ids.append(setores.setdefault(setor, len(setores)))
+        categoria_ids.append(categorias.setdefault(categoria, len(categorias)))
+        digest.update(f"{key}\x1f{setor}\x1f{categoria}\n".encode('utf-8'))
+
+    setor_bits = [0] * len(setores)
+    categoria_bits = [0] * len(categorias)
+    for index, (setor_id, categoria_id) in enumerate(zip(setor_ids, categoria_ids)):
+        setor_bits[setor_id] |= 1 << index
+        categoria_bits[categoria_id] |= 1 << index
+
+    levels = {}
+    parents: Dict[str, int] = {}
+    for depth, level in enumerate(LEVELS):
+        node = {'codes': [], 'start': [], 'end': [], 'parent': [], 'setores': [], 'categorias': []}
+        for index, key in enumerate(codes):
+            code = node_code(level, key)
+            if not node['codes'] or node['codes'][-1] != code:
+                node['codes'].append(code)
+                node['start'].append(index)
+                node['end'].append(index)
+                node['parent'].append(parents[node_code(LEVELS[depth - 1], key)] if depth else None)
+            node['end'][-1] = index + 1
+        for start, end in zip(node['start'], node['end']):
+            node['setores'].append(_hex(_bits(setor_ids[start:end])))
+            node['categorias'].append(_hex(_bits(categoria_ids[start:end])))
+        parents = {code: i for i, code in enumerate(node['codes'])}
+        levels[level] = node
+
+    # Intervalo de filhos de cada nó no nível seguinte (os filhos são contíguos)
+    for level, child_level in zip(LEVELS, LEVELS[1:]):
+        node = levels[level]
+        node['child_start'] = [0] * len(node['codes'])
+        node['child_end'] = [0] * len(node['codes'])
+        for child, parent in enumerate(levels[child_level]['parent']):
+            if node['child_end'][parent] == 0:
+                node['child_start'][parent] = child
+            node['child_end'][parent] = child + 1
+
+    if skipped:
+        print(f"⚠️  {skipped} códigos ignorados (não têm 7 dígitos)", file=sys.stderr)
+    if unknown_divisions:
+        divisions = ', '.join(f"{division:02d}" for division in sorted(unknown_divisions))
+        print(f"⚠️  {sum(unknown_divisions.values())} códigos ignorados "
+              f"(divisão fora das seções da CNAE 2.0: {divisions})", file=sys.stderr)
+
+    return {
+        'format_version': FORMAT_VERSION,
+        'data_version': digest.hexdigest(),
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'total': len(codes),
+        'setores': list(setores),
+        'categorias': list(categorias),
+        'codes': codes,
+        'setor_ids': setor_ids,
+        'categoria_ids': categoria_ids,
+        'setor_bits': [_hex(mask) for mask in setor_bits],
+        'categoria_bits': [_hex(mask) for mask in categoria_bits],
+        'levels': levels,
+    }
+
+
+def write_hierarchy(artifact: dict, output_file: str):
+    """Grava o índice em JSON compacto"""
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(',', ':'))
+
+
+class CnaeHierarchy:
+    """Consultas sobre o índice: intervalos por nó e interseção de bitsets"""
+
+    def __init__(self, artifact: dict):
+        if artifact.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Versão de artefato não suportada: {artifact.get('format_version')}")
+        self.data_version = artifact['data_version']
+        self._codes = artifact['codes']
+        self._setores = artifact['setores']
+        self._categorias = artifact['categorias']
+        self._setor_ids = artifact['setor_ids']
+        self._categoria_ids = artifact['categoria_ids']
+        self._setor_index = {name: i for i, name in enumerate(self._setores)}
+        self._categoria_index = {name: i for i, name in enumerate(self._categorias)}
+        self._setor_bits = [int(mask, 16) for mask in artifact['setor_bits']]
+        self._categoria_bits = [int(mask, 16) for mask in artifact['categoria_bits']]
+        self._levels = artifact['levels']
+        self._node_index = {
+            level: {code: i for i, code in enumerate(node['codes'])}
+            for level, node in self._levels.items()
+        }
+        self._index = {key: i for i, key in enumerate(self._codes)}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_OUTPUT) -> 'CnaeHierarchy':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    @property
+    def setores(self) -> List[str]:
+        return list(self._setores)
+
+    @property
+    def categorias(self) -> List[str]:
+        return list(self._categorias)
+
+    def locate(self, code: str) -> Optional[Tuple[str, int]]:
+        """
+        Nível e posição de um nó: letra de seção ou código com 2, 3, 4 (ou 5,
+        com dígito verificador) dígitos; 7 dígitos é a própria subclasse.
+        """
+        code = (code or '').strip().upper()
+        if len(code) == 1 and code.isalpha():
+            index = self._node_index['section'].get(code)
+            return None if index is None else ('section', index)
+        digits = cnae_digits(code)
+        if len(digits) == 7:
+            index = self._index.get(int(digits))
+            return None if index is None else ('subclass', index)
+        level = {2: 'division', 3: 'group', 4: 'class', 5: 'class'}.get(len(digits))
+        if level is None:
+            return None
+        index = self._node_index[level].get(digits[:LEVEL_DIGITS[level]])
+        return None if index is None else (level, index)
+
+    def subclass_range(self, code: str) -> Optional[Tuple[int, int]]:
+        """Intervalo [start, end) de subclasses sob o nó"""
+        located = self.locate(code)
+        if located is None:
+            return None
+        level, index = located
+        if level == 'subclass':
+            return index, index + 1
+        node = self._levels[level]
+        return node['start'][index], node['end'][index]
+
+    def children(self, code: str) -> List[str]:
+        """Códigos dos filhos diretos do nó (subclasses formatadas abaixo da classe)"""
+        located = self.locate(code)
+        if located is None or located[0] == 'subclass':
+            return []
+        level, index = located
+        node = self._levels[level]
+        if level == LEVELS[-1]:
+            return [format_cnae_key(key) for key in self._codes[node['start'][index]:node['end'][index]]]
+        child_codes = self._levels[LEVELS[LEVELS.index(level) + 1]]['codes']
+        return child_codes[node['child_start'][index]:node['child_end'][index]]
+
+    def mask(self, code: Optional[str] = None, setor: Optional[str] = None,
+             categoria: Optional[str] = None) -> int:
+        """Bitset das subclasses que atendem a todos os filtros informados"""
+        mask = (1 << len(self._codes)) - 1
+        if code is not None:
+            bounds = self.subclass_range(code)
+            if bounds is None:
+                return 0
+            start, end = bounds
+            mask = ((1 << end) - 1) ^ ((1 << start) - 1)
+        if setor is not None:
+            index = self._setor_index.get(setor)
+            mask &= self._setor_bits[index] if index is not None else 0
+        if categoria is not None:
+            index = self._categoria_index.get(categoria)
+            mask &= self._categoria_bits[index] if index is not None else 0
+        return mask
+
+    def iter_mask(self, mask: int) -> Iterator[CnaeMatch]:
+        """Subclasses do bitset, em ordem de código"""
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            mask ^= low
+            yield CnaeMatch(
+                format_cnae_key(self._codes[index]),
+                self._setores[self._setor_ids[index]],
+                self._categorias[self._categoria_ids[index]],
+            )
+
+    def select(self, code: Optional[str] = None, setor: Optional[str] = None,
+               categoria: Optional[str] = None) -> List[CnaeMatch]:
+        """Equivalente a getCNAEsBySetorECategoria restrito a um nó da hierarquia"""
+        return list(self.iter_mask(self.mask(code, setor, categoria)))
+
+    def count(self, code: Optional[str] = None, setor: Optional[str] = None,
+              categoria: Optional[str] = None) -> int:
+        return self.mask(code, setor, categoria).bit_count()
+
+    def rollup(self, level: str, setor: Optional[str] = None,
+               categoria: Optional[str] = None) -> List[Tuple[str, int]]:
+        """(código do nó, subclasses que atendem aos filtros) para cada nó do nível com ao menos uma"""
+        node = self._levels[level]
+        setor_id = self._setor_index.get(setor) if setor is not None else None
+        categoria_id = self._categoria_index.get(categoria) if categoria is not None else None
+        if (setor is not None and setor_id is None) or (categoria is not None and categoria_id is None):
+            return []
+        filtered = self.mask(setor=setor, categoria=categoria)
+        result = []
+        for i, code in enumerate(node['codes']):
+            # Rollups pré-calculados descartam nós sem o setor/categoria sem tocar nos bitsets de subclasse
+            if setor_id is not None and not (int(node['setores'][i], 16) >> setor_id) & 1:
+                continue
+            if categoria_id is not None and not (int(node['categorias'][i], 16) >> categoria_id) & 1:
+                continue
+            start, end = node['start'][i], node['end'][i]
+            count = ((filtered >> start) & ((1 << (end - start)) - 1)).bit_count()
+            if count:
+                result.append((code, count))
+        return result
+
+    def iter_nodes(self) -> Iterator[tuple]:
+        """(nível, código, código do pai, start, end, subclasses) de todos os nós"""
+        for depth, level in enumerate(LEVELS):
+            node = self._levels[level]
+            parent_codes = self._levels[LEVELS[depth - 1]]['codes'] if depth else None
+            for i, code in enumerate(node['codes']):
+                parent = parent_codes[node['parent'][i]] if depth else None
+                start, end = node['start'][i], node['end'][i]
+                yield level, code, parent, start, end, end - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice hierárquico CNAE (seção/divisão/grupo/classe)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Compilar índice a partir do TSV')
+    build.add_argument('input_file', nargs='?', default=DEFAULT_INPUT,
+                       help="Arquivo com dados CNAE ('-' para stdin, aceita .gz)")
+    build.add_argument('--output', default=DEFAULT_OUTPUT, help='Arquivo JSON de saída')
+
+    def add_filters(sub):
+        sub.add_argument('--setor', help='Filtrar por setor_industria (valor exato)')
+        sub.add_argument('--categoria', help='Filtrar por categoria (valor exato)')
+        sub.add_argument('--artifact', default=DEFAULT_OUTPUT, help='Arquivo JSON do índice')
+
+    query = subparsers.add_parser('query', help='Subclasses sob um nó (seção, divisão, grupo ou classe)')
+    query.add_argument('node', nargs='?', help='Letra da seção ou código (ex: C, 62, 620, 6203)')
+    add_filters(query)
+
+    rollup = subparsers.add_parser('rollup', help='Contagem de subclasses por nó de um nível')
+    rollup.add_argument('level', choices=LEVELS)
+    add_filters(rollup)
+
+    nodes = subparsers.add_parser('nodes', help='Tabela de nós em TSV (level, code, parent, start, end, subclasses)')
+    nodes.add_argument('--artifact', default=DEFAULT_OUTPUT, help='Arquivo JSON do índice')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        artifact = build_hierarchy(read_cnae_file(args.input_file))
+        write_hierarchy(artifact, args.output)
+        counts = ' | '.join(f"{level}: {len(artifact['levels'][level]['codes'])}" for level in LEVELS)
+        print(f"✅ Índice gerado em: {args.output}", file=sys.stderr)
+        print(f"   Subclasses: {artifact['total']} | {counts}", file=sys.stderr)
+        return
+
+    hierarchy = CnaeHierarchy.load(args.artifact)
+    if args.command == 'nodes':
+        print('level\tcode\tparent\tstart\tend\tsubclasses')
+        for row in hierarchy.iter_nodes():
+            print('\t'.join('' if value is None else str(value) for value in row))
+    elif args.command == 'rollup':
+        for code, count in hierarchy.rollup(args.level, args.setor, args.categoria):
+            print(f"{code}\t{count}")
+    else:
+        if args.node and hierarchy.locate(args.node) is None:
+            print(f"❌ Nó não encontrado: {args.node}", file=sys.stderr)
+            sys.exit(1)
+        matches = hierarchy.select(args.node, args.setor, args.categoria)
+        for match in matches:
+            print(f"{match.cnae_code}\t{match.setor_industria}\t{match.categoria}")
+        print(f"📊 {len(matches)} subclasses", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Artefato compilado de lookup CNAE -> Setor/Categoria
+
+Compila cnae_data_complete.txt em um JSON compacto e versionado, com todas
+as chaves normalizadas para o inteiro de 7 dígitos da subclasse:
+
+    - codes / setor_ids / categoria_ids: subclasses ordenadas + ids nas
+      tabelas de strings `setores` e `categorias`
+    - prefix5: prefixo de 5 dígitos -> primeira subclasse com esse prefixo
+    - class4:  classe de 4 dígitos   -> primeira subclasse da classe
+
+O arquivo pode ser servido estático em public/ e resolvido em memória, sem
+consulta ao banco (substitui as variações + ilike de getCNAEClassification).
+
+Uso:
+    # Compilar (padrão: public/cnae-lookup.json)
+    python scripts/cnae_lookup.py build cnae_data_complete.txt
+
+    # Consultar
+    python scripts/cnae_lookup.py query 62.03-1/00 6203100 6203
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from cnae_codes import cnae_digits, cnae_key, format_cnae_key
+from cnae_stream import CnaeRecord, read_cnae_file
+
+FORMAT_VERSION = 1
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INPUT = os.path.join(PROJECT_ROOT, 'cnae_data_complete.txt')
+DEFAULT_OUTPUT = os.path.join(PROJECT_ROOT, 'public', 'cnae-lookup.json')
+
+
+class CnaeMatch(NamedTuple):
+    """Resultado de um lookup"""
+    cnae_code: str
+    setor_industria: str
+    categoria: str
+    match: str  # 'exact', 'prefix5' ou 'class4'
+
+
+def build_lookup(records: Iterable[CnaeRecord]) -> dict:
+    """Compila os registros no artefato de lookup (dict pronto para JSON)"""
+    by_key: Dict[int, CnaeRecord] = {}
+    skipped = 0
+    for record in records:
+        key = cnae_key(record[0])
+        if key is None:
+            skipped += 1
+            continue
+        by_key[key] = record  # última ocorrência vence, como no upsert
+
+    setores: Dict[str, int] = {}
+    categorias: Dict[str, int] = {}
+    codes: List[int] = sorted(by_key)
+    setor_ids: List[int] = []
+    categoria_ids: List[int] = []
+    prefix5: Dict[str, int] = {}
+    class4: Dict[str, int] = {}
+
+    digest = hashlib.blake2b(digest_size=16)
+    for index, key in enumerate(codes):
+        _, setor, categoria = by_key[key]
+        setor_ids.append(setores.setdefault(setor, len(setores)))
+        categoria_ids.append(categorias.setdefault(categoria, len(categorias)))
+        digits = f"{key:07d}"
+        prefix5.setdefault(digits[:5], index)
+        class4.setdefault(digits[:4], index)
+        digest.update(f"{key}\x1f{setor}\x1f{categoria}\n".encode('utf-8'))
+
+    if skipped:
+        print(f"⚠️  {skipped} códigos ignorados (não têm 7 dígitos)", file=sys.stderr)
+
+    return {
+        'format_version': FORMAT_VERSION,
+        'data_version': digest.hexdigest(),
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'total': len(codes),
+        'setores': list(setores),
+        'categorias': list(categorias),
+        'codes': codes,
+        'setor_ids': setor_ids,
+        'categoria_ids': categoria_ids,
+        'prefix5': prefix5,
+        'class4': class4,
+    }
+
+
+def write_lookup(artifact: dict, output_file: str):
+    """Grava o artefato em JSON compacto"""
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(',', ':'))
+
+
+class CnaeLookup:
+    """Lookup em memória sobre o artefato compilado (O(1) por consulta)"""
+
+    def __init__(self, artifact: dict):
+        if artifact.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Versão de artefato não suportada: {artifact.get('format_version')}")
+        self.data_version = artifact['data_version']
+        self._setores = artifact['setores']
+        self._categorias = artifact['categorias']
+        self._codes = artifact['codes']
+        self._setor_ids = artifact['setor_ids']
+        self._categoria_ids = artifact['categoria_ids']
+        self._prefix5 = artifact['prefix5']
+        self._class4 = artifact['class4']
+        self._index = {key: i for i, key in enumerate(self._codes)}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_OUTPUT) -> 'CnaeLookup':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def _match(self, index: int, match: str) -> CnaeMatch:
+        return CnaeMatch(
+            format_cnae_key(self._codes[index]),
+            self._setores[self._setor_ids[index]],
+            self._categorias[self._categoria_ids[index]],
+            match,
+        )
+
+    def resolve(self, code: Optional[str]) -> Optional[CnaeMatch]:
+        """
+        Resolve um código em qualquer formato ('62.03-1/00', '6203100', '6203-1/00').
+
+        Ordem: subclasse exata (7 dígitos), prefixo de 5 dígitos, classe de 4 dígitos.
+        """
+        digits = cnae_digits(code)
+        if len(digits) >= 7:
+            index = self._index.get(int(digits[:7]))
+            if index is not None:
+                return self._match(index, 'exact')
+        if len(digits) >= 5:
+            index = self._prefix5.get(digits[:5])
+            if index is not None:
+                return self._match(index, 'prefix5')
+        if len(digits) >= 4:
+            index = self._class4.get(digits[:4])
+            if index is not None:
+                return self._match(index, 'class4')
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Artefato compilado de lookup CNAE')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Compilar artefato a partir do TSV')
+    build.add_argument('input_file', nargs='?', default=DEFAULT_INPUT,
+                       help="Arquivo com dados CNAE ('-' para stdin, aceita .gz)")
+    build.add_argument('--output', default=DEFAULT_OUTPUT, help='Arquivo JSON de saída')
+
+    query = subparsers.add_parser('query', help='Consultar códigos CNAE no artefato')
+    query.add_argument('codes', nargs='+', help='Códigos CNAE em qualquer formato')
+    query.add_argument('--artifact', default=DEFAULT_OUTPUT, help='Arquivo JSON do artefato')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        artifact = build_lookup(read_cnae_file(args.input_file))
+        write_lookup(artifact, args.output)
+        print(f"✅ Artefato gerado em: {args.output}", file=sys.stderr)
+        print(f"   Subclasses: {artifact['total']} | Versão dos dados: {artifact['data_version']}", file=sys.stderr)
+    else:
+        lookup = CnaeLookup.load(args.artifact)
+        for code in args.codes:
+            result = lookup.resolve(code)
+            if result is None:
+                print(f"{code}\t(não encontrado)")
+            else:
+                print(f"{code}\t{result.cnae_code}\t{result.setor_industria}\t{result.categoria}\t{result.match}")
+
+
+if __name__ == '__main__':
+    main()
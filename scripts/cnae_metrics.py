@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Instrumentação dos scripts de CNAE: tempo por etapa, vazão, latência de lotes
+
+Um registro global (METRICS) acumula, por etapa do pipeline:
+    - read:      leitura da fonte (arquivo, stdin, gzip já descompactado)
+    - parse:     quebra e validação básica das linhas
+    - validate:  validações extras (ex: --strict)
+    - serialize: montagem de SQL/payloads
+    - write:     gravação de arquivos
+    - network:   requisições ao Supabase/Postgres
+
+com segundos, chamadas, registros e bytes (e registros/s, bytes/s), novas
+tentativas e latência p50/p95/p99 dos lotes. O tempo é exclusivo: uma etapa
+aberta dentro de outra (ex: read durante o parse em streaming) é descontada
+da etapa de fora, então a soma das etapas nunca passa do tempo total.
+
+Nos scripts, --metrics grava o resultado em JSON ou no formato textfile do
+Prometheus (node_exporter --collector.textfile.directory) e --profile roda
+tudo sob um profiler:
+    - cprofile: arquivo .pstats (snakeviz, flameprof, gprof2dot)
+    - sample:   amostragem por sinal (SIGPROF) em stacks "folded", uma linha
+                "f1;f2;f3 N" por stack (flamegraph.pl, speedscope, inferno);
+                só em sistemas com setitimer (Linux/macOS)
+
+Uso:
+    python scripts/populate_all_cnae_data.py --input-file cnae.txt --generate-sql --metrics metrics.json
+    python scripts/populate_all_cnae_data.py --input-file cnae.txt --insert \\
+        --metrics /var/lib/node_exporter/cnae.prom --profile sample --profile-output cnae.folded
+
+    from cnae_metrics import METRICS
+    with METRICS.stage('serialize', rows=len(batch)):
+        ...
+    METRICS.observe('network', latency, rows=len(batch))
+"""
+
+import io
+import os
+import math
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+STAGES = ('read', 'parse', 'validate', 'serialize', 'write', 'network')
+QUANTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_PREFIX = 'cnae'
+DEFAULT_SAMPLE_INTERVAL_MS = 5.0
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentil pelo método nearest-rank (lista já ordenada)"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(q * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+class StageStats:
+    """Acumulado de uma etapa"""
+
+    __slots__ = ('seconds', 'calls', 'rows', 'bytes', 'retries', 'latencies')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.rows = 0
+        self.bytes = 0
+        self.retries = 0
+        self.latencies: List[float] = []
+
+    def to_dict(self) -> dict:
+        result = {
+            'seconds': round(self.seconds, 6),
+            'calls': self.calls,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'rows_per_second': round(self.rows / self.seconds, 1) if self.seconds > 0 else 0.0,
+            'bytes_per_second': round(self.bytes / self.seconds, 1) if self.seconds > 0 else 0.0,
+            'retries': self.retries,
+        }
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            result['batches'] = len(ordered)
+            result['latency_seconds'] = {
+                **{f"p{int(q * 100)}": round(percentile(ordered, q), 6) for q in QUANTILES},
+                'max': round(ordered[-1], 6),
+            }
+        return result
+
+
+class Metrics:
+    """Registro de métricas por etapa (um por processo: METRICS)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, script: Optional[str] = None, engine: Optional[str] = None):
+        self.script = script
+        self.engine = engine
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Counter = Counter()
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._stack: List[List[float]] = []  # [início, tempo dos filhos] das etapas abertas
+
+    def _stats(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0, bytes: int = 0, batch: bool = False) -> Iterator[StageStats]:
+        """
+        Mede o bloco como uma chamada da etapa (tempo exclusivo). Com
+        batch=True a duração também entra na latência de lotes. O StageStats
+        é devolvido para somar rows/bytes conhecidos só no final.
+        """
+        stats = self._stats(name)
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield stats
+        finally:
+            elapsed = time.perf_counter() - frame[0]
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            stats.seconds += elapsed - frame[1]
+            stats.calls += 1
+            stats.rows += rows
+            stats.bytes += bytes
+            if batch:
+                stats.latencies.append(elapsed)
+
+    def observe(self, name: str, latency: float, rows: int = 0, bytes: int = 0):
+        """
+        Registra um lote medido por fora de stage() (ex: requisições
+        concorrentes). Não soma tempo à etapa: envolva o todo em stage().
+        """
+        stats = self._stats(name)
+        stats.latencies.append(latency)
+        stats.rows += rows
+        stats.bytes += bytes
+
+    def add(self, name: str, rows: int = 0, bytes: int = 0):
+        stats = self._stats(name)
+        stats.rows += rows
+        stats.bytes += bytes
+
+    def retry(self, name: str, count: int = 1):
+        self._stats(name).retries += count
+
+    def incr(self, counter: str, count: int = 1):
+        self.counters[counter] += count
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def to_dict(self, status: str = 'ok') -> dict:
+        ordered = [name for name in STAGES if name in self.stages]
+        ordered += sorted(name for name in self.stages if name not in STAGES)
+        return {
+            'script': self.script,
+            'engine': self.engine,
+            'started_at': self.started_at.isoformat(),
+            'duration_seconds': round(self.elapsed, 6),
+            'status': status,
+            'stages': {name: self.stages[name].to_dict() for name in ordered},
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def to_prometheus(self, status: str = 'ok') -> str:
+        """Formato textfile do Prometheus (uma série por etapa, rótulo script)"""
+        snapshot = self.to_dict(status)
+        script = (self.script or 'cnae').replace('\\', '\\\\').replace('"', '\\"')
+        p = PROMETHEUS_PREFIX
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join([f'script="{script}"'] + [f'{k}="{v}"' for k, v in labels])
+                lines.append(f"{p}_{name}{{{label_text}}} {value}")
+
+        stages = snapshot['stages']
+        metric('run_success', 'gauge', 'Última execução terminou sem erro (1) ou não (0)',
+               [((), 1 if status == 'ok' else 0)])
+        metric('run_timestamp_seconds', 'gauge', 'Início da última execução (epoch)',
+               [((), round(self.started_at.timestamp(), 3))])
+        metric('run_duration_seconds', 'gauge', 'Duração da última execução',
+               [((), snapshot['duration_seconds'])])
+        metric('stage_seconds', 'gauge', 'Tempo exclusivo por etapa',
+               [((('stage', n),), s['seconds']) for n, s in stages.items()])
+        metric('stage_calls', 'gauge', 'Chamadas medidas por etapa',
+               [((('stage', n),), s['calls']) for n, s in stages.items()])
+        metric('stage_rows', 'gauge', 'Registros processados por etapa',
+               [((('stage', n),), s['rows']) for n, s in stages.items()])
+        metric('stage_bytes', 'gauge', 'Bytes processados por etapa',
+               [((('stage', n),), s['bytes']) for n, s in stages.items()])
+        metric('stage_retries', 'gauge', 'Novas tentativas por etapa',
+               [((('stage', n),), s['retries']) for n, s in stages.items()])
+        latency_samples = []
+        for n, s in stages.items():
+            for q in QUANTILES:
+                if 'latency_seconds' in s:
+                    latency_samples.append(((('stage', n), ('quantile', q)), s['latency_seconds'][f"p{int(q * 100)}"]))
+        if latency_samples:
+            metric('batch_latency_seconds', 'gauge', 'Latência dos lotes (p50/p95/p99)', latency_samples)
+        if snapshot['counters']:
+            metric('counter', 'gauge', 'Contadores avulsos (ex: linhas rejeitadas)',
+                   [((('name', n),), v) for n, v in snapshot['counters'].items()])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, fmt: Optional[str] = None, status: str = 'ok'):
+        """Grava em JSON ou Prometheus de forma atômica (o coletor nunca lê arquivo pela metade)"""
+        fmt = fmt or ('prometheus' if path.endswith('.prom') else 'json')
+        content = (self.to_prometheus(status) if fmt == 'prometheus'
+                   else json.dumps(self.to_dict(status), ensure_ascii=False, indent=2) + '\n')
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def print_summary(self):
+        """Tabela por etapa no stderr"""
+        total = self.elapsed
+        print(f"\n⏱️ Etapas ({total:.2f}s no total):", file=sys.stderr)
+        for name, s in self.to_dict()['stages'].items():
+            share = s['seconds'] / total if total > 0 else 0
+            line = (f"   {name:<10} {s['seconds']:>8.3f}s {share:>6.1%}  {s['rows']:>9} registros "
+                    f"({s['rows_per_second']:,.0f}/s)")
+            if s['bytes']:
+                line += f"  {s['bytes'] / 1e6:,.2f} MB ({s['bytes_per_second'] / 1e6:,.1f} MB/s)"
+            if 'latency_seconds' in s:
+                lat = s['latency_seconds']
+                line += (f"  lotes p50/p95/p99 {lat['p50'] * 1000:.0f}/{lat['p95'] * 1000:.0f}/"
+                         f"{lat['p99'] * 1000:.0f} ms")
+            if s['retries']:
+                line += f"  🔁 {s['retries']}"
+            print(line, file=sys.stderr)
+        for name, value in self.counters.items():
+            print(f"   {name}: {value}", file=sys.stderr)
+
+
+METRICS = Metrics()
+
+
+class TimedReader(io.BufferedIOBase):
+    """
+    Conta bytes e tempo de leitura de um stream binário já bufferizado
+    (arquivo aberto em 'rb', GzipFile) na etapa `read`
+    """
+
+    def __init__(self, raw, metrics: Metrics = METRICS, stage: str = 'read'):
+        self._raw = raw
+        self._metrics = metrics
+        self._stage = stage
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        with self._metrics.stage(self._stage) as stats:
+            data = self._raw.read(size)
+            stats.bytes += len(data)
+        return data
+
+    def read1(self, size: int = -1) -> bytes:
+        with self._metrics.stage(self._stage) as stats:
+            data = self._raw.read1(size)
+            stats.bytes += len(data)
+        return data
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem (SIGPROF): conta stacks da thread principal em
+    formato folded, pronto para flamegraph.pl/speedscope
+    """
+
+    def __init__(self, interval_ms: float = DEFAULT_SAMPLE_INTERVAL_MS):
+        import signal
+        if not hasattr(signal, 'setitimer'):
+            raise RuntimeError("amostragem requer signal.setitimer (Linux/macOS); use --profile cprofile")
+        self.interval = interval_ms / 1000
+        self.samples: Counter = Counter()
+        self._signal = signal
+
+    def _handler(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._previous = self._signal.signal(self._signal.SIGPROF, self._handler)
+        self._signal.setitimer(self._signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        self._signal.setitimer(self._signal.ITIMER_PROF, 0, 0)
+        self._signal.signal(self._signal.SIGPROF, self._previous)
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    """Opções de métricas e profiling compartilhadas pelos scripts de CNAE"""
+    parser.add_argument('--metrics', help='Gravar métricas por etapa neste arquivo (.json ou .prom)')
+    parser.add_argument('--metrics-format', choices=['json', 'prometheus'],
+                        help='Formato de --metrics (padrão: pela extensão; .prom = prometheus)')
+    parser.add_argument('--profile', choices=['cprofile', 'sample'],
+                        help='Rodar sob cProfile (.pstats) ou amostragem (stacks folded para flamegraph)')
+    parser.add_argument('--profile-output', help='Arquivo do profile (padrão: <script>.pstats ou <script>.folded)')
+    parser.add_argument('--profile-interval', type=float, default=DEFAULT_SAMPLE_INTERVAL_MS,
+                        help=f'Intervalo de amostragem em ms para --profile sample (padrão: {DEFAULT_SAMPLE_INTERVAL_MS:g})')
+
+
+@contextmanager
+def instrumented_run(args, script: str):
+    """
+    Envolve a execução de um script: zera METRICS, liga o profiler pedido e,
+    no final (inclusive em sys.exit), grava métricas/profile e mostra o resumo
+    """
+    METRICS.reset(script, getattr(args, 'engine', None))
+    profile = getattr(args, 'profile', None)
+    profile_output = getattr(args, 'profile_output', None) or f"{script}.{'pstats' if profile == 'cprofile' else 'folded'}"
+    profiler = None
+    if profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == 'sample':
+        try:
+            profiler = SamplingProfiler(args.profile_interval)
+        except RuntimeError as e:
+            print(f"❌ Erro: {e}", file=sys.stderr)
+            sys.exit(1)
+        profiler.start()
+
+    status = 'error'
+    try:
+        yield METRICS
+        status = 'ok'
+    except SystemExit as e:
+        status = 'ok' if e.code in (None, 0) else 'error'
+        raise
+    finally:
+        if profile == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(profile_output)
+        elif profile == 'sample':
+            profiler.stop()
+            profiler.dump(profile_output)
+        if profile:
+            print(f"🔬 Profile ({profile}) gravado em: {profile_output}", file=sys.stderr)
+        if getattr(args, 'metrics', None):
+            METRICS.write(args.metrics, args.metrics_format, status)
+            print(f"📊 Métricas gravadas em: {args.metrics}", file=sys.stderr)
+        if getattr(args, 'metrics', None) or profile:
+            METRICS.print_summary()
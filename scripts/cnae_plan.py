@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Plano de execução (dry-run) de uma carga de cnae_classifications
+
+Antes de rodar um --insert ou aplicar a migration gerada, --plan lê a entrada,
+compara com um snapshot da tabela e mostra o que a carga faria, sem escrever
+nada (nem no banco, nem em cache/snapshot):
+
+    - novos, alterados, sem alteração (e removidos, com --diff --delete)
+    - registros enviados, requisições/statements e bytes de payload
+    - duração estimada a partir de vazões já medidas
+
+Snapshot da tabela (--snapshot), só leitura:
+    - JSON do cache de cnae_diff.py (.cnae_snapshot.json)
+    - dump local em TSV (aceita .gz), por exemplo:
+        psql "$DATABASE_URL" -c "\\copy (SELECT cnae_code, setor_industria, categoria
+            FROM public.cnae_classifications ORDER BY 1) TO 'cnae_dump.tsv'"
+    - ou, com --cache, o snapshot da última sincronização no cache SQLite
+      (cnae_sync_cache.py); se a entrada for igual à sincronizada, o plano
+      mostra que a carga seria dispensada
+Sem snapshot, a tabela é tratada como vazia (tudo conta como novo).
+
+Vazões (--throughput, pode repetir): JSON de cnae_benchmark.py (linhas/s por
+etapa e tamanho; vale o tamanho mais próximo da entrada) ou de --metrics
+(cnae_metrics.py, de uma execução real com a mesma engine). O parse usa o
+tempo medido na própria leitura do plano.
+
+Uso:
+    python scripts/populate_all_cnae_data.py --input-file cnae.txt --insert --engine copy --plan \\
+        --snapshot cnae_dump.tsv --throughput cnae_benchmark.json
+    python scripts/populate_all_cnae_data.py --input-file cnae.txt --generate-sql --plan
+    python scripts/populate_cnae_classifications_complete.py --input-file cnae.txt --diff --plan \\
+        --snapshot .cnae_snapshot.json --throughput metrics.json
+"""
+
+import os
+import sys
+import json
+import math
+import argparse
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from cnae_copy_loader import copy_escape
+from cnae_diff import content_hash, diff_records, load_snapshot, snapshot_from_records
+from cnae_metrics import METRICS
+from cnae_sql_chunks import sql_literal
+from cnae_stream import CnaeRecord, read_cnae_file
+
+# Lote fixo de insert_directly, populate_cnae_classifications e apply_diff;
+# também o lote inicial do upsert assíncrono (que depois se adapta)
+BATCH_SIZE = 100
+# CREATE TEMP, COPY, marcação de rejeitados, SELECT dos rejeitados, merge
+COPY_STATEMENTS = 5
+# Etapa do benchmark -> vazão usada no plano
+BENCHMARK_STAGES = {'parse': 'parse', 'write_sql': 'sql', 'upsert_async': 'async', 'copy': 'copy'}
+
+
+class LoadPlan(NamedTuple):
+    """Resultado do dry-run"""
+    mode: str            # sql, postgrest, async ou copy
+    total: int
+    inserts: int
+    updates: int
+    unchanged: int
+    deletes: int
+    rows_sent: int
+    requests: int
+    payload_bytes: int
+    # fase -> (registros, segundos estimados ou None, origem da estimativa)
+    phases: Dict[str, Tuple[int, Optional[float], str]]
+    notes: List[str]
+
+    @property
+    def estimated_seconds(self) -> Optional[float]:
+        seconds = [estimate for _, estimate, _ in self.phases.values()]
+        return None if any(s is None for s in seconds) else sum(seconds)
+
+
+def load_table_snapshot(path: str) -> Dict[str, str]:
+    """Snapshot (cnae_code -> hash) de um JSON de cnae_diff.py ou de um dump TSV"""
+    if path.endswith('.json'):
+        snapshot = load_snapshot(path)
+        if snapshot is None:
+            raise ValueError(f"snapshot ausente ou de outra versão: {path}")
+        return snapshot
+    return snapshot_from_records(read_cnae_file(path))
+
+
+def cached_snapshot(cache_path: str, engine: str, db_url: Optional[str] = None):
+    """(entrada, snapshot) da última sincronização do destino no cache SQLite, sem alterar o arquivo"""
+    from cnae_sync_cache import cache_key, peek_cache
+    target = (db_url or os.getenv("DATABASE_URL")) if engine == 'copy' else os.getenv("SUPABASE_URL")
+    if not target:
+        return None
+    return peek_cache(cache_path, cache_key(target))
+
+
+def load_throughput(paths: List[str]) -> Dict[str, List[Tuple[int, float, str]]]:
+    """
+    Vazões conhecidas por fase (parse, sql, postgrest, async, copy), cada uma
+    como lista de (registros medidos, registros/s, origem)
+    """
+    rates: Dict[str, List[Tuple[int, float, str]]] = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        name = os.path.basename(path)
+        if 'results' in report:  # cnae_benchmark.py
+            for result in report['results']:
+                phase = BENCHMARK_STAGES.get(result.get('stage'))
+                if phase and result.get('rows_per_second'):
+                    rates.setdefault(phase, []).append((result['size'], result['rows_per_second'], name))
+        elif 'stages' in report:  # cnae_metrics.py (--metrics)
+            stages = report['stages']
+            network = stages.get('network')
+            if network and network['rows_per_second']:
+                phase = report.get('engine') or 'postgrest'
+                rates.setdefault(phase, []).append((network['rows'], network['rows_per_second'], name))
+            sql = [stages[s] for s in ('serialize', 'write') if s in stages]
+            if sql and not network:
+                seconds = sum(s['seconds'] for s in sql)
+                if seconds > 0:
+                    rates.setdefault('sql', []).append((sql[0]['rows'], sql[0]['rows'] / seconds, name))
+    return rates
+
+
+def pick_rate(rates: Dict[str, List[Tuple[int, float, str]]], phase: str, rows: int) -> Optional[Tuple[float, str]]:
+    """Vazão medida com o tamanho mais próximo de `rows` (escala log)"""
+    candidates = rates.get(phase)
+    if not candidates or rows <= 0:
+        return None
+    size, rate, source = min(candidates, key=lambda c: abs(math.log(max(c[0], 1) / rows)))
+    return rate, f"{source} ({size} registros)"
+
+
+def _json_batches_bytes(records: List[CnaeRecord], batch_size: int = BATCH_SIZE) -> int:
+    """Bytes dos corpos JSON dos lotes de upsert (como enviados ao PostgREST)"""
+    total = 0
+    for i in range(0, len(records), batch_size):
+        payload = [{"cnae_code": cnae, "setor_industria": setor, "categoria": categoria}
+                   for cnae, setor, categoria in records[i:i + batch_size]]
+        total += len(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return total
+
+
+def _copy_bytes(records: List[CnaeRecord]) -> int:
+    """Bytes do stream COPY de cnae_copy_loader (número da linha + 3 campos)"""
+    return sum(len(f"{n}\t{copy_escape(cnae)}\t{copy_escape(setor)}\t{copy_escape(categoria)}\n".encode('utf-8'))
+               for n, (cnae, setor, categoria) in enumerate(records, 1))
+
+
+def _sql_bytes(records: List[CnaeRecord]) -> int:
+    """Bytes das linhas VALUES da migration (sem cabeçalho e rodapé)"""
+    return sum(len(f"({sql_literal(cnae)}, {sql_literal(setor)}, {sql_literal(categoria)}),\n".encode('utf-8'))
+               for cnae, setor, categoria in records)
+
+
+def build_plan(data: List[CnaeRecord], mode: str, snapshot: Optional[Dict[str, str]] = None,
+               rates: Optional[Dict[str, List[Tuple[int, float, str]]]] = None,
+               diff_only: bool = False, include_deletes: bool = False,
+               notes: Optional[List[str]] = None) -> LoadPlan:
+    """
+    Monta o plano. `mode` é sql (gerar migration), postgrest, async ou copy.
+    Com `diff_only` (--diff) só os novos/alterados são enviados; sem ele a
+    carga reenvia a entrada inteira (upsert de tudo).
+    """
+    rates = rates or {}
+    notes = list(notes or [])
+    if snapshot is None:
+        notes.append("sem snapshot da tabela: todos os registros contam como novos")
+    diff = diff_records(data, snapshot or {}, diff_only and include_deletes)
+    sent = diff.changes if diff_only else data
+    if not diff_only and diff.unchanged:
+        notes.append(f"sem --diff os {diff.unchanged} registros sem alteração também são reenviados")
+
+    if mode == 'sql':
+        requests = 1 if sent or diff.deletes else 0
+        payload = _sql_bytes(sent)
+    elif mode == 'copy':
+        requests = COPY_STATEMENTS if sent else 0
+        payload = _copy_bytes(sent)
+    else:
+        requests = math.ceil(len(sent) / BATCH_SIZE) + math.ceil(len(diff.deletes) / BATCH_SIZE)
+        payload = _json_batches_bytes(sent)
+        if mode == 'async':
+            notes.append(f"async: lotes começam com {BATCH_SIZE} registros e se adaptam, o número real de requisições varia")
+
+    parse_stats = [METRICS.stages[s] for s in ('read', 'parse') if s in METRICS.stages]
+    phases: Dict[str, Tuple[int, Optional[float], str]] = {}
+    if parse_stats:
+        phases['parse'] = (len(data), sum(s.seconds for s in parse_stats), 'medido nesta leitura')
+    else:
+        picked = pick_rate(rates, 'parse', len(data))
+        phases['parse'] = (len(data), len(data) / picked[0] if picked else None, picked[1] if picked else '-')
+
+    label = 'serialize+write' if mode == 'sql' else 'network'
+    picked = pick_rate(rates, mode, len(sent))
+    if not sent:
+        phases[label] = (0, 0.0, '-')
+    elif picked:
+        phases[label] = (len(sent), len(sent) / picked[0], picked[1])
+    else:
+        phases[label] = (len(sent), None, f"sem vazão medida para '{mode}' (use --throughput)")
+
+    return LoadPlan(mode, len(data), len(diff.inserts), len(diff.updates), diff.unchanged, len(diff.deletes),
+                    len(sent), requests, payload, phases, notes)
+
+
+def print_plan(plan: LoadPlan):
+    """Resumo do plano no stderr"""
+    unit = 'statements' if plan.mode in ('sql', 'copy') else 'requisições'
+    print(f"\n📋 Plano ({plan.mode}) - nada foi escrito", file=sys.stderr)
+    print(f"   Entrada: {plan.total} registros", file=sys.stderr)
+    print(f"   Novos: {plan.inserts} | Alterados: {plan.updates} | Sem alteração: {plan.unchanged}"
+          + (f" | Removidos: {plan.deletes}" if plan.deletes else ''), file=sys.stderr)
+    print(f"   Enviados: {plan.rows_sent} registros em {plan.requests} {unit} "
+          f"({plan.payload_bytes / 1e6:,.2f} MB de payload)", file=sys.stderr)
+    for name, (rows, seconds, source) in plan.phases.items():
+        estimate = f"{seconds:.2f}s" if seconds is not None else '?'
+        print(f"   ⏱️ {name:<16} {rows:>9} registros  {estimate:>9}  {source}", file=sys.stderr)
+    total = plan.estimated_seconds
+    print(f"   ⏱️ Estimativa total: {f'{total:.2f}s' if total is not None else 'indisponível'}", file=sys.stderr)
+    for note in plan.notes:
+        print(f"   ⚠️  {note}", file=sys.stderr)
+
+
+def add_plan_arguments(parser: argparse.ArgumentParser):
+    """Opções do dry-run compartilhadas pelos loaders (--snapshot fica a cargo de cada script)"""
+    parser.add_argument('--plan', action='store_true',
+                        help='Só mostrar o plano (novos/alterados, requisições, bytes, duração estimada); não escreve nada')
+    parser.add_argument('--throughput', action='append', default=[],
+                        help='JSON de cnae_benchmark.py ou de --metrics com vazões medidas (pode repetir)')
+
+
+def plan_from_args(data: List[CnaeRecord], args, mode: str, diff_only: bool = False) -> LoadPlan:
+    """Resolve snapshot/cache/vazões a partir dos argumentos, imprime e devolve o plano"""
+    notes = []
+    snapshot = None
+    cache_path = getattr(args, 'cache', None)
+    if getattr(args, 'snapshot', None):
+        try:
+            snapshot = load_table_snapshot(args.snapshot)
+        except (OSError, ValueError) as e:
+            print(f"❌ Erro ao ler snapshot: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"📦 Snapshot: {args.snapshot} ({len(snapshot)} registros)", file=sys.stderr)
+    elif cache_path and mode != 'sql':
+        cached = cached_snapshot(cache_path, mode, getattr(args, 'db_url', None))
+        if cached is None:
+            notes.append(f"destino sem entrada em {cache_path} (ou DATABASE_URL/SUPABASE_URL ausente)")
+        else:
+            entry, snapshot = cached
+            print(f"📦 Snapshot do cache de sincronização: {cache_path} ({len(snapshot)} registros)", file=sys.stderr)
+            if entry.synced_hash == content_hash(snapshot_from_records(data)):
+                # sync_with_cache dispensaria a carga: nada é enviado
+                diff_only = True
+                notes.append("entrada igual à última sincronização: carga dispensada pelo cache "
+                             + ("(dentro do TTL, nenhuma requisição)" if entry.fresh(args.cache_ttl)
+                                else "(TTL vencido: 1 consulta condicional ao servidor)"))
+    plan = build_plan(data, mode, snapshot, load_throughput(args.throughput), diff_only,
+                      getattr(args, 'delete', False), notes)
+    print_plan(plan)
+    return plan
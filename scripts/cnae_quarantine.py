@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Quarentena de linhas rejeitadas pelos parsers de CNAE
+
+Em vez de um print por linha inválida (ou descarte silencioso), cada rejeição
+vai para um arquivo NDJSON com escrita bufferizada:
+
+    {"source": "cnae.txt", "line": 1274, "reason": "campos_insuficientes", "raw": "..."}
+
+Motivos (reason):
+    - campos_insuficientes, campo_vazio, formato_cnae: regras do parser
+      (cnae_stream.REJECT_REASONS)
+    - formato_subclasse, digito_verificador: --strict (cnae_vectorized.py)
+
+No final sai um histograma dos motivos. Sem arquivo de quarentena, só as
+primeiras rejeições são mostradas no console. Com --max-reject-rate, a
+leitura é interrompida assim que a fração de linhas rejeitadas passa do
+limite (depois de --min-lines linhas lidas), com código de saída 1.
+
+Uso:
+    python scripts/process_cnae_complete_file.py --quarantine rejeitados.ndjson --max-reject-rate 0.01
+    python scripts/populate_all_cnae_data.py --input-file cnae.txt --generate-sql --quarantine rejeitados.ndjson
+
+    from cnae_quarantine import QuarantineSink
+    quarantine = QuarantineSink('rejeitados.ndjson', source='cnae.txt', max_reject_rate=0.05)
+    data = quarantine.collect(read_cnae_file('cnae.txt', on_reject=quarantine))
+"""
+
+import sys
+import json
+import argparse
+from collections import Counter
+from typing import Callable, Iterable, List, Optional
+
+from cnae_metrics import METRICS
+from cnae_stream import REJECT_REASONS, CnaeRecord, reject_reason, split_cnae_line
+
+STRICT_REJECT_REASONS = {
+    'formato_subclasse': 'código fora da máscara DDDD-D/DD (ou 7 dígitos sem máscara)',
+    'digito_verificador': 'dígito verificador da classe incorreto',
+}
+
+DEFAULT_MIN_LINES = 1000
+DEFAULT_ECHO = 10
+WRITE_BUFFER = 1 << 20
+
+
+class RejectRateExceeded(RuntimeError):
+    """Fração de linhas rejeitadas acima de --max-reject-rate"""
+
+
+class QuarantineSink:
+    """
+    Callback on_reject dos parsers: grava cada rejeição em NDJSON e conta os
+    motivos. Use collect() para consumir os registros e fechar o relatório.
+    """
+
+    def __init__(self, path: Optional[str] = None, source: Optional[str] = None,
+                 max_reject_rate: Optional[float] = None, min_lines: int = DEFAULT_MIN_LINES,
+                 echo: int = DEFAULT_ECHO):
+        self.path = path
+        self.source = source
+        self.max_reject_rate = max_reject_rate
+        self.min_lines = min_lines
+        self.echo = echo
+        self.reasons: Counter = Counter()
+        self.rejected = 0
+        self.lines = 0
+        self._file = open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) if path else None
+
+    def __call__(self, line_num: int, line: str):
+        self.reject(line_num, line, reject_reason(split_cnae_line(line)) or 'desconhecido')
+
+    def reject(self, line_num: Optional[int], raw: str, reason: str):
+        """
+        Registra uma rejeição (line_num None quando a linha de origem não é
+        conhecida, ex: validação depois do parse). Só rejeições com linha
+        conferem o limite durante a leitura; as demais ficam para finish()
+        """
+        self.rejected += 1
+        self.reasons[reason] += 1
+        if self._file is not None:
+            self._file.write(json.dumps(
+                {'source': self.source, 'line': line_num, 'reason': reason, 'raw': raw},
+                ensure_ascii=False) + '\n')
+        elif self.rejected <= self.echo:
+            where = f"linha {line_num}" if line_num else 'registro'
+            print(f"⚠️  {where}: {reason} - {raw[:60]}", file=sys.stderr)
+        if line_num:
+            # Na linha line_num, esse é o total lido até aqui
+            self.lines = max(self.lines, line_num)
+            self._check(self.lines)
+
+    def _check(self, lines: int, final: bool = False):
+        if self.max_reject_rate is None or not lines or (lines < self.min_lines and not final):
+            return
+        if self.rejected / lines > self.max_reject_rate:
+            raise RejectRateExceeded(
+                f"{self.rejected} de {lines} linhas rejeitadas "
+                f"({self.rejected / lines:.2%} > limite de {self.max_reject_rate:.2%})")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self, accepted: int):
+        """Confere o limite com o total final (aceitos + rejeitados) e fecha o arquivo"""
+        try:
+            self._check(accepted + self.rejected, final=True)
+        finally:
+            self.close()
+
+    def print_summary(self):
+        """Histograma dos motivos de rejeição"""
+        if not self.rejected:
+            return
+        descriptions = {**REJECT_REASONS, **STRICT_REJECT_REASONS}
+        print(f"⚠️  {self.rejected} linhas rejeitadas"
+              + (f" (quarentena: {self.path})" if self.path else ''), file=sys.stderr)
+        for reason, count in self.reasons.most_common():
+            print(f"   {reason:<22} {count:>8}  {descriptions.get(reason, '')}", file=sys.stderr)
+
+    def collect(self, records: Iterable[CnaeRecord],
+                validate: Optional[Callable[[List[CnaeRecord]], List[CnaeRecord]]] = None) -> List[CnaeRecord]:
+        """
+        Consome os registros, fecha a quarentena e mostra o resumo (sai com 1
+        se passar do limite). `validate` filtra os registros já lidos antes do
+        fechamento (ex: --strict), podendo rejeitar via reject().
+        """
+        try:
+            with METRICS.stage('parse') as stats:
+                data = list(records)
+                stats.rows += len(data)
+            if validate is not None:
+                with METRICS.stage('validate', rows=len(data)):
+                    data = validate(data)
+            METRICS.incr('rejected_rows', self.rejected)
+            self.finish(len(data))
+        except RejectRateExceeded as e:
+            self.close()
+            self.print_summary()
+            print(f"❌ Leitura interrompida: {e}", file=sys.stderr)
+            sys.exit(1)
+        self.print_summary()
+        return data
+
+
+def add_quarantine_arguments(parser: argparse.ArgumentParser):
+    """Opções de quarentena compartilhadas pelos scripts de CNAE"""
+    parser.add_argument('--quarantine', help='Gravar as linhas rejeitadas neste arquivo NDJSON')
+    parser.add_argument('--max-reject-rate', type=float,
+                        help='Interromper se a fração de linhas rejeitadas passar deste valor (ex: 0.01)')
+    parser.add_argument('--min-lines', type=int, default=DEFAULT_MIN_LINES,
+                        help=f'Linhas lidas antes de aplicar --max-reject-rate (padrão: {DEFAULT_MIN_LINES})')
+
+
+def quarantine_from_args(args, source: Optional[str]) -> QuarantineSink:
+    return QuarantineSink(args.quarantine, source, args.max_reject_rate, args.min_lines)
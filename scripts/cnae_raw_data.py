@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Extração do CNAE principal de payloads raw_data (Receita Federal / BrasilAPI)
+
+Porta para Python da função SQL extract_cnae_from_raw_data()
+(20260125000003_fix_update_companies_sector_function.sql), com a mesma ordem
+de precedência e a mesma semântica dos operadores JSONB (-> / ->>):
+
+    1. receita_federal.atividade_principal[0].code
+    2. receita.atividade_principal[0].code
+    3. atividade_principal[0].code
+    4. cnae_fiscal
+    5. cnae_principal
+
+Valores vazios são ignorados (NULLIF) e o resultado passa por
+normalize_cnae_code().
+
+CNAEs secundários seguem a mesma leitura do frontend (cnaeResolver.ts): a
+primeira lista existente entre receita_federal.atividades_secundarias,
+receita.atividades_secundarias, atividades_secundarias e cnaes_secundarios
+(BrasilAPI), com `code` ou `codigo` de cada item.
+
+Uso:
+    from cnae_raw_data import parse_raw_data_line, extract_cnae_from_raw_data
+
+    raw = parse_raw_data_line(line)  # None se a linha não cita CNAE
+    extract_cnae_from_raw_data(raw), extract_secondary_cnaes(raw)
+"""
+
+import json
+from decimal import Decimal
+from typing import Any, List, Optional, Union
+
+from cnae_codes import cnae_digits, normalize_cnae_code
+
+# Caminhos na ordem do COALESCE da função SQL
+CNAE_PATHS = (
+    ('receita_federal', 'atividade_principal', 0, 'code'),
+    ('receita', 'atividade_principal', 0, 'code'),
+    ('atividade_principal', 0, 'code'),
+    ('cnae_fiscal',),
+    ('cnae_principal',),
+)
+
+# Listas de CNAEs secundários, na ordem do cnaeResolver.ts
+SECONDARY_CNAE_PATHS = (
+    ('receita_federal', 'atividades_secundarias'),
+    ('receita', 'atividades_secundarias'),
+    ('atividades_secundarias',),
+    ('cnaes_secundarios',),
+)
+
+# A ReceitaWS devolve [{"code": "00.00-0-00", "text": "Não informada"}] quando não há secundários
+NO_SECONDARY_DIGITS = '0000000'
+
+# Toda chave usada acima contém um destes trechos: linhas sem nenhum deles
+# não têm CNAE e não precisam ser decodificadas
+_CNAE_KEY_MARKERS = ('"atividade', '"cnae')
+
+
+def jsonb_dumps(value: Any) -> str:
+    """Texto de um valor JSON como o Postgres imprime jsonb (chaves ordenadas por tamanho e bytes)"""
+    if isinstance(value, dict):
+        keys = sorted(value, key=lambda k: (len(k.encode('utf-8')), k.encode('utf-8')))
+        return '{' + ', '.join(f"{json.dumps(k, ensure_ascii=False)}: {jsonb_dumps(value[k])}" for k in keys) + '}'
+    if isinstance(value, list):
+        return '[' + ', '.join(jsonb_dumps(item) for item in value) + ']'
+    if value is None:
+        return 'null'
+    if isinstance(value, Decimal):
+        # numeric preserva a escala do texto de entrada, sem notação científica
+        return format(value, 'f')
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    return jsonb_text(value)
+
+
+def jsonb_text(value: Any) -> Optional[str]:
+    """Equivalente ao operador ->> do Postgres para um valor JSON já decodificado"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list, Decimal)):
+        return jsonb_dumps(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def jsonb_path(data: Any, path) -> Any:
+    """Equivalente a encadear -> (chave em objeto, índice em array); None se não existir"""
+    for step in path:
+        if isinstance(step, int):
+            if not isinstance(data, list) or len(data) <= step:
+                return None
+        elif not isinstance(data, dict):
+            return None
+        else:
+            if step not in data:
+                return None
+        data = data[step]
+    return data
+
+
+def parse_raw_data_line(line: Union[str, bytes]) -> Optional[Any]:
+    """
+    Decodifica uma linha NDJSON de raw_data. Linhas sem nenhuma chave de CNAE
+    devolvem None sem passar pelo decoder; números decimais viram Decimal para
+    que ->> devolva o mesmo texto do jsonb.
+    """
+    text = line.decode('utf-8') if isinstance(line, bytes) else line
+    if not any(marker in text for marker in _CNAE_KEY_MARKERS):
+        return None
+    text = text.strip()
+    if not text:
+        return None
+    return json.loads(text, parse_float=Decimal)
+
+
+def extract_cnae_from_raw_data(raw_data: Any) -> Optional[str]:
+    """Mesmo resultado de extract_cnae_from_raw_data(p_raw_data JSONB) no banco"""
+    if raw_data is None:
+        return None
+    for path in CNAE_PATHS:
+        value = jsonb_text(jsonb_path(raw_data, path))
+        if value:  # NULLIF(..., '')
+            return normalize_cnae_code(value)
+    return None
+
+
+def extract_secondary_cnaes(raw_data: Any) -> List[str]:
+    """
+    CNAEs secundários normalizados, sem repetições e na ordem do payload.
+    Como no frontend, vale a primeira lista presente (mesmo vazia).
+    """
+    if raw_data is None:
+        return []
+    items = None
+    for path in SECONDARY_CNAE_PATHS:
+        items = jsonb_path(raw_data, path)
+        if items is not None:
+            break
+    if not isinstance(items, list):
+        return []
+
+    codes = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        code = normalize_cnae_code(jsonb_text(item.get('code') or item.get('codigo')))
+        if not code or code in seen or cnae_digits(code) == NO_SECONDARY_DIGITS:
+            continue
+        seen.add(code)
+        codes.append(code)
+    return codes
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Extração em massa de CNAEs de exports NDJSON de companies.raw_data
+
+Lê o export linha a linha (arquivo, stdin ou gzip), extrai o CNAE principal
+com a mesma precedência de extract_cnae_from_raw_data() e os CNAEs
+secundários (atividades_secundarias / cnaes_secundarios) e grava um arquivo
+colunar para a classificação (cnae_company_sector.py, cnae_sector_backfill.py).
+
+Cada linha pode ser o próprio raw_data ou uma linha da tabela com a coluna
+raw_data (objeto ou texto JSON), ex: {"id": ..., "cnpj": ..., "raw_data": {...}}.
+Linhas que não citam nenhuma chave de CNAE não passam pelo decoder JSON e não
+vão para a saída (use --keep-empty para mantê-las com CNAE nulo).
+
+Saída (colunas id, cnpj, cnae_principal, cnaes_secundarios):
+    - .parquet: cnaes_secundarios como list<string>, um row group por lote
+    - .csv / stdout: cnaes_secundarios como literal de array do Postgres
+      ({"6201-5/01","6204-0/00"}), pronto para COPY em uma coluna text[]
+
+Com --parity, cada linha também é avaliada pela função SQL no banco e
+qualquer divergência do CNAE principal é listada (código de saída 1). Antes
+do arquivo roda um conjunto fixo de casos de borda (PARITY_CASES).
+
+Uso:
+    # Export sem escapes do COPY (psql -At imprime o JSON como está)
+    psql "$DATABASE_URL" -At -c "SELECT json_build_object('id', id, 'cnpj', cnpj, 'raw_data', raw_data) FROM companies" > raw_data.ndjson
+
+    python scripts/cnae_raw_extract.py raw_data.ndjson --output cnaes.parquet
+    python scripts/cnae_raw_extract.py raw_data.ndjson.gz --output cnaes.csv
+    python scripts/cnae_raw_extract.py raw_data.ndjson --parity --output /dev/null
+
+Requisitos:
+    - Para .parquet: pyarrow (pip install pyarrow)
+    - Para --parity: psycopg2 (pip install psycopg2-binary) e DATABASE_URL
+"""
+
+import csv
+import sys
+import json
+import time
+import argparse
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from cnae_raw_data import (
+    extract_cnae_from_raw_data,
+    extract_secondary_cnaes,
+    jsonb_text,
+    parse_raw_data_line,
+)
+from cnae_stream import open_cnae_source
+
+OUTPUT_COLUMNS = ['id', 'cnpj', 'cnae_principal', 'cnaes_secundarios']
+
+# (linha, cnae_principal Python) por linha do lote
+ParityRow = Tuple[str, Optional[str]]
+
+# Casos de borda da semântica de ->> / NULLIF / COALESCE conferidos com --parity
+# (só ASCII, para não depender do encoding do servidor)
+PARITY_CASES = [
+    '{"receita_federal": {"atividade_principal": [{"code": "62.03-1-00"}]}, "cnae_fiscal": 4711301}',
+    '{"receita_federal": {"atividade_principal": [{"code": ""}]}, "receita": {"atividade_principal": [{"code": "47.11-3-01"}]}}',
+    '{"receita_federal": {"atividade_principal": []}, "atividade_principal": [{"code": " 01.11-3/01 "}]}',
+    '{"receita_federal": "texto", "receita": null, "atividade_principal": {"code": "x"}, "cnae_fiscal": ""}',
+    '{"atividade_principal": [{"code": null}], "cnae_fiscal": 6203100}',
+    '{"cnae_fiscal": 6203100.0}',
+    '{"cnae_fiscal": 1.50}',
+    '{"cnae_fiscal": 1e3}',
+    '{"cnae_fiscal": true}',
+    '{"cnae_fiscal": "", "cnae_principal": "62.03 - 1 / 00"}',
+    '{"cnae_principal": {"b": 1, "aa": [1, "x"], "a": null}}',
+    '{"cnae_principal": ["62.03-1-00"]}',
+    '{"atividade_principal": [{"code": "ab.cd-x/y"}]}',
+    '{"atividade_principal": [{"code": "\\t6203 100\\n"}]}',
+    '{"nome": "SEM CNAE"}',
+    '[{"cnae_fiscal": 1}]',
+    '"cnae_fiscal"',
+    'null',
+]
+
+
+def _decode_embedded(value):
+    """raw_data exportado como texto JSON (coluna json/text) em vez de objeto"""
+    if isinstance(value, str) and value.strip().startswith(('{', '[')):
+        try:
+            return json.loads(value, parse_float=Decimal)
+        except ValueError:
+            return value
+    return value
+
+
+def extract_line(line: str, keep_empty: bool = False) -> Optional[tuple]:
+    """(id, cnpj, cnae_principal, cnaes_secundarios) de uma linha, ou None se não houver CNAE"""
+    record = parse_raw_data_line(line)
+    if record is None:
+        if keep_empty and line.strip():
+            record = json.loads(line, parse_float=Decimal)
+        else:
+            return None
+
+    row_id = None
+    payload = record
+    if isinstance(record, dict) and 'raw_data' in record:
+        row_id = jsonb_text(record.get('id'))
+        payload = _decode_embedded(record['raw_data'])
+    cnpj = jsonb_text(record.get('cnpj')) if isinstance(record, dict) else None
+    if cnpj is None and isinstance(payload, dict):
+        cnpj = jsonb_text(payload.get('cnpj'))
+
+    principal = extract_cnae_from_raw_data(payload)
+    secondary = extract_secondary_cnaes(payload)
+    if principal is None and not secondary and not keep_empty:
+        return None
+    return row_id, cnpj, principal, secondary
+
+
+def iter_extracted_batches(lines: Iterable[str], batch_size: int = 10000,
+                           keep_empty: bool = False, parity: bool = False) -> Iterator[tuple]:
+    """
+    Gera (linhas_extraídas, linhas_lidas, linhas_inválidas, parity_rows) por
+    lote. parity_rows só é preenchido com `parity` (todas as linhas válidas,
+    inclusive as sem CNAE). Totais são acumulados desde o início.
+    """
+    rows: List[tuple] = []
+    checks: List[ParityRow] = []
+    read = invalid = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        read += 1
+        try:
+            row = extract_line(line, keep_empty)
+            if parity and row is None:
+                # Linhas puladas sem decodificar também vão para o banco: precisam ser JSON
+                json.loads(line)
+        except ValueError:
+            invalid += 1
+            continue
+        if row is not None:
+            rows.append(row)
+        if parity:
+            checks.append((line, row[2] if row else None))
+        if read % batch_size == 0:
+            yield rows, read, invalid, checks
+            rows, checks = [], []
+    if rows or checks or read % batch_size:
+        yield rows, read, invalid, checks
+
+
+def _python_principal(line: str) -> Optional[str]:
+    """CNAE principal calculado em Python para a mesma entrada usada no banco"""
+    row = extract_line(line)
+    return row[2] if row else None
+
+
+# A mesma regra de desembrulhar a coluna raw_data, feita pelo Postgres
+PARITY_SQL = """
+    SELECT t.n, extract_cnae_from_raw_data(
+        CASE
+            WHEN jsonb_typeof(t.j) = 'object' AND t.j ? 'raw_data' THEN
+                CASE WHEN jsonb_typeof(t.j->'raw_data') = 'string'
+                          AND ltrim(t.j->>'raw_data') ~ '^[{\\[]'
+                     THEN (t.j->>'raw_data')::jsonb
+                     ELSE t.j->'raw_data' END
+            ELSE t.j
+        END)
+    FROM (SELECT line::jsonb AS j, n FROM unnest(%s::text[]) WITH ORDINALITY AS u(line, n)) t
+    ORDER BY t.n
+"""
+
+
+def check_parity(conn, checks: List[ParityRow]) -> List[tuple]:
+    """Compara com extract_cnae_from_raw_data() no banco; devolve (linha, python, sql) divergentes"""
+    with conn.cursor() as cur:
+        cur.execute(PARITY_SQL, ([line for line, _ in checks],))
+        results = cur.fetchall()
+    conn.rollback()
+    return [(line, expected, actual)
+            for (line, expected), (_, actual) in zip(checks, results)
+            if expected != actual]
+
+
+def connect(db_url: str):
+    """Abre a conexão usada por --parity"""
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ Erro: psycopg2 não instalado. Execute: pip install psycopg2-binary", file=sys.stderr)
+        sys.exit(1)
+
+    conn = psycopg2.connect(db_url)
+    conn.set_client_encoding('UTF8')
+    return conn
+
+
+def pg_array_literal(values: Iterable[Optional[str]]) -> str:
+    """
+    Literal de array text[] do Postgres. Todo elemento vai entre aspas (com
+    '\\' e '"' escapados): sem aspas, vírgula, chaves ou espaço dentro do
+    valor quebram o elemento, e um valor "NULL" viraria nulo.
+    """
+    return '{' + ','.join(
+        'NULL' if value is None else '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        for value in values
+    ) + '}'
+
+
+class CsvSink:
+    """CSV com cnaes_secundarios como literal de array do Postgres"""
+
+    def __init__(self, output):
+        self.output = output
+        self.writer = csv.writer(output)
+        self.writer.writerow(OUTPUT_COLUMNS)
+
+    def write(self, rows: List[tuple]):
+        self.writer.writerows(
+            (row_id, cnpj, principal, pg_array_literal(secondary))
+            for row_id, cnpj, principal, secondary in rows
+        )
+
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    """Parquet com um row group por lote; cnae_principal usa dicionário"""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("❌ Erro: pyarrow não instalado. Execute: pip install pyarrow", file=sys.stderr)
+            sys.exit(1)
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.string()),
+            ('cnpj', pa.string()),
+            ('cnae_principal', pa.string()),
+            ('cnaes_secundarios', pa.list_(pa.string())),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows: List[tuple]):
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        table = self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extrair CNAEs (principal e secundários) de exports NDJSON de raw_data')
+    parser.add_argument('input_file', nargs='?', default='-', help="NDJSON de raw_data ('-' para stdin, aceita .gz)")
+    parser.add_argument('--output', help='Arquivo de saída .parquet ou .csv (padrão: CSV no stdout)')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Linhas por lote (padrão: 10000)')
+    parser.add_argument('--keep-empty', action='store_true', help='Manter linhas sem CNAE (CNAE nulo)')
+    parser.add_argument('--parity', action='store_true',
+                        help='Conferir o CNAE principal com extract_cnae_from_raw_data() no banco')
+    parser.add_argument('--db-url', help='Connection string do Postgres para --parity (padrão: DATABASE_URL)')
+
+    args = parser.parse_args()
+
+    conn = None
+    mismatches: List[tuple] = []
+    if args.parity:
+        from cnae_copy_loader import resolve_db_url
+        conn = connect(resolve_db_url(args.db_url))
+        cases = check_parity(conn, [(case, _python_principal(case)) for case in PARITY_CASES])
+        mismatches.extend(cases)
+        print(f"📊 Casos de borda: {len(PARITY_CASES) - len(cases)}/{len(PARITY_CASES)} iguais ao SQL", file=sys.stderr)
+
+    if args.output and args.output.lower().endswith('.parquet'):
+        sink = ParquetSink(args.output)
+        output = None
+    else:
+        output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+        sink = CsvSink(output)
+
+    total = invalid = written = with_secondary = checked = 0
+    start = time.perf_counter()
+    try:
+        with open_cnae_source(args.input_file) as lines:
+            for i, (rows, total, invalid, checks) in enumerate(
+                    iter_extracted_batches(lines, args.batch_size, args.keep_empty, args.parity)):
+                sink.write(rows)
+                written += len(rows)
+                with_secondary += sum(1 for row in rows if row[3])
+                if checks:
+                    mismatches.extend(check_parity(conn, checks))
+                    checked += len(checks)
+                print(f"✅ Lote {i + 1}: {len(rows)} empresas com CNAE (Total lido: {total})", file=sys.stderr)
+    finally:
+        sink.close()
+        if output is not None and args.output:
+            output.close()
+        if conn is not None:
+            conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Concluído! {written}/{total} linhas gravadas ({with_secondary} com secundários)", file=sys.stderr)
+    if invalid:
+        print(f"⚠️ {invalid} linhas com JSON inválido ignoradas", file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({total / elapsed if elapsed > 0 else 0:.0f} registros/s)", file=sys.stderr)
+
+    if args.parity:
+        print(f"📊 Paridade com o SQL: {checked} linhas conferidas, {len(mismatches)} divergências", file=sys.stderr)
+        for line, expected, actual in mismatches[:20]:
+            print(f"❌ python={expected!r} sql={actual!r}: {line.strip()[:200]}", file=sys.stderr)
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Registros de classificação CNAE compactos
+
+Tuplas (cnae, setor, categoria) custam ~130-280 bytes por linha: a tupla, a
+string do código e, sem interning, uma cópia de setor/categoria por linha.
+Aqui o código vira a chave inteira de 7 dígitos (cnae_codes.cnae_key) e setor/
+categoria viram ids pequenos em dicionários de strings únicos por processo
+(SETORES, CATEGORIAS), como na tabela binária (cnae_binary.py):
+
+    - CnaeClassification: um registro com __slots__ (chave + 2 ids), para
+      quem precisa carregar o registro resolvido (ex: uma empresa)
+    - CnaeColumns: colunas em array ('I' para a chave, 'H' para os ids),
+      8 bytes por registro, para conjuntos grandes
+
+Os dois iteram como (cnae, setor, categoria), com o código no formato
+canônico DDDD-D/DD, então servem onde os scripts esperam as tuplas.
+Códigos sem 7 dígitos não são representáveis e ficam de fora (on_invalid).
+
+Memória por milhão de registros: python scripts/cnae_benchmark.py --stages records_tuple records_slots records_columns
+
+Uso:
+    from cnae_records import CnaeColumns, read_cnae_columns
+
+    columns = read_cnae_columns('cnae_data_complete.txt')
+    columns.lookup('62.03-1/00')   # -> CnaeClassification('6203-1/00', 'Tecnologia da Informação', 'Serviços')
+    columns.nbytes                 # bytes dos arrays
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from cnae_codes import cnae_key, format_cnae_key
+from cnae_stream import CnaeRecord, read_cnae_file
+
+MAX_IDS = 1 << 16  # ids em array 'H'
+
+
+class StringPool:
+    """Dicionário de strings únicas: valor <-> id pequeno (ordem de chegada)"""
+
+    __slots__ = ('values', '_ids')
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for value in values:
+            self.id_of(value)
+
+    def id_of(self, value: str) -> int:
+        """Id do valor, criando se for novo"""
+        ident = self._ids.get(value)
+        if ident is None:
+            ident = len(self.values)
+            if ident >= MAX_IDS:
+                raise OverflowError(f"mais de {MAX_IDS} valores distintos")
+            self._ids[value] = ident
+            self.values.append(value)
+        return ident
+
+    def get(self, value: str) -> Optional[int]:
+        """Id do valor, sem criar"""
+        return self._ids.get(value)
+
+    def __getitem__(self, ident: int) -> str:
+        return self.values[ident]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+# Dicionários compartilhados por todos os registros do processo
+SETORES = StringPool()
+CATEGORIAS = StringPool()
+
+
+class CnaeClassification:
+    """Classificação de uma subclasse: chave de 7 dígitos + ids de setor/categoria"""
+
+    __slots__ = ('key', 'setor_id', 'categoria_id')
+
+    def __init__(self, key: int, setor_id: int, categoria_id: int):
+        self.key = key
+        self.setor_id = setor_id
+        self.categoria_id = categoria_id
+
+    @classmethod
+    def from_record(cls, record: CnaeRecord) -> Optional['CnaeClassification']:
+        """Converte uma tupla (cnae, setor, categoria); None se o código não tiver 7 dígitos"""
+        cnae, setor, categoria = record
+        key = cnae_key(cnae)
+        if key is None:
+            return None
+        return cls(key, SETORES.id_of(setor), CATEGORIAS.id_of(categoria))
+
+    @property
+    def code(self) -> str:
+        return format_cnae_key(self.key)
+
+    @property
+    def setor(self) -> str:
+        return SETORES[self.setor_id]
+
+    @property
+    def categoria(self) -> str:
+        return CATEGORIAS[self.categoria_id]
+
+    def as_tuple(self) -> CnaeRecord:
+        return (self.code, self.setor, self.categoria)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.as_tuple())
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CnaeClassification):
+            return NotImplemented
+        return (self.key, self.setor_id, self.categoria_id) == (other.key, other.setor_id, other.categoria_id)
+
+    def __hash__(self) -> int:
+        return hash((self.key, self.setor_id, self.categoria_id))
+
+    def __repr__(self) -> str:
+        return f"CnaeClassification({self.code!r}, {self.setor!r}, {self.categoria!r})"
+
+
+def to_classifications(records: Iterable[CnaeRecord],
+                       on_invalid: Optional[Callable[[CnaeRecord], None]] = None) -> List[CnaeClassification]:
+    """Lista de registros compactos a partir de tuplas"""
+    result = []
+    for record in records:
+        item = CnaeClassification.from_record(record)
+        if item is not None:
+            result.append(item)
+        elif on_invalid is not None:
+            on_invalid(record)
+    return result
+
+
+class CnaeColumns:
+    """
+    Conjunto de classificações em colunas (array): chave u32 e ids u16.
+    Depois de sort(), lookup() faz busca binária pela chave.
+    """
+
+    __slots__ = ('keys', 'setor_ids', 'categoria_ids', '_sorted')
+
+    def __init__(self):
+        self.keys = array('I')
+        self.setor_ids = array('H')
+        self.categoria_ids = array('H')
+        self._sorted = True
+
+    def append(self, cnae: str, setor: str, categoria: str) -> bool:
+        """Adiciona um registro; False se o código não tiver 7 dígitos"""
+        key = cnae_key(cnae)
+        if key is None:
+            return False
+        if self.keys and key < self.keys[-1]:
+            self._sorted = False
+        self.keys.append(key)
+        self.setor_ids.append(SETORES.id_of(setor))
+        self.categoria_ids.append(CATEGORIAS.id_of(categoria))
+        return True
+
+    def extend(self, records: Iterable[CnaeRecord],
+               on_invalid: Optional[Callable[[CnaeRecord], None]] = None) -> int:
+        """Adiciona registros em lote; retorna quantos foram adicionados"""
+        keys, setor_ids, categoria_ids = self.keys, self.setor_ids, self.categoria_ids
+        setor_id, categoria_id = SETORES.id_of, CATEGORIAS.id_of
+        start = len(keys)
+        last = keys[-1] if keys else -1
+        for record in records:
+            key = cnae_key(record[0])
+            if key is None:
+                if on_invalid is not None:
+                    on_invalid(record)
+                continue
+            if key < last:
+                self._sorted = False
+            last = key
+            keys.append(key)
+            setor_ids.append(setor_id(record[1]))
+            categoria_ids.append(categoria_id(record[2]))
+        return len(keys) - start
+
+    def sort(self, dedupe: bool = True):
+        """Ordena pela chave; com dedupe vale a última ocorrência de cada código (como no upsert)"""
+        if dedupe:
+            indices = {key: index for index, key in enumerate(self.keys)}.values()
+        else:
+            indices = range(len(self.keys))
+        order = sorted(indices, key=self.keys.__getitem__)
+        self.keys = array('I', (self.keys[i] for i in order))
+        self.setor_ids = array('H', (self.setor_ids[i] for i in order))
+        self.categoria_ids = array('H', (self.categoria_ids[i] for i in order))
+        self._sorted = True
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __getitem__(self, index: int) -> CnaeClassification:
+        return CnaeClassification(self.keys[index], self.setor_ids[index], self.categoria_ids[index])
+
+    def __iter__(self) -> Iterator[CnaeRecord]:
+        setores = SETORES.values
+        categorias = CATEGORIAS.values
+        for key, setor_id, categoria_id in zip(self.keys, self.setor_ids, self.categoria_ids):
+            yield (format_cnae_key(key), setores[setor_id], categorias[categoria_id])
+
+    def lookup_key(self, key: int) -> Optional[CnaeClassification]:
+        if not self._sorted:
+            raise RuntimeError("CnaeColumns.lookup requer sort()")
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self[index]
+        return None
+
+    def lookup(self, code: Optional[str]) -> Optional[CnaeClassification]:
+        key = cnae_key(code)
+        return None if key is None else self.lookup_key(key)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes ocupados pelos dados das colunas (sem os dicionários de strings)"""
+        return sum(column.itemsize * len(column) for column in (self.keys, self.setor_ids, self.categoria_ids))
+
+
+def read_cnae_columns(path: Optional[str], on_reject=None,
+                      on_invalid: Optional[Callable[[CnaeRecord], None]] = None) -> CnaeColumns:
+    """Lê um arquivo/stdin/gzip direto para colunas, sem materializar as tuplas"""
+    columns = CnaeColumns()
+    columns.extend(read_cnae_file(path, on_reject), on_invalid)
+    return columns
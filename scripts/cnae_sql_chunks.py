@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Geração de SQL de cnae_classifications em blocos limitados
+
+Em vez de um único `INSERT ... VALUES` gigante com um `ON CONFLICT` no final,
+emite vários statements limitados por número de linhas e/ou bytes, cada um
+na sua própria transação (BEGIN/COMMIT). Assim o Postgres analisa e planeja
+blocos pequenos, os locks duram só um bloco e o SQL Editor do Supabase
+consegue executar os arquivos.
+
+Formatos:
+    - insert (padrão): INSERT ... VALUES ... ON CONFLICT (cnae_code) DO UPDATE
+    - copy: tabela temporária + `COPY ... FROM stdin` + merge. Só roda via
+      psql (o SQL Editor não aceita COPY FROM stdin), mas é bem mais rápido
+
+Códigos repetidos dentro de um bloco são resolvidos antes de gerar o SQL
+(vale a última ocorrência, como no upsert); entre blocos, o bloco seguinte
+sobrescreve o anterior, então o resultado final é o mesmo.
+
+Junto com o SQL é gravado um manifesto JSON com, para cada bloco: arquivo,
+linhas, bytes, primeiro/último código e SHA-256 do conteúdo.
+
+Uso:
+    # Um arquivo com vários blocos de 1000 linhas
+    python scripts/populate_all_cnae_data.py --input-file cnae_data_complete.txt --generate-sql --chunk-rows 1000
+
+    # Um arquivo por bloco (até 256 KB cada), em formato COPY
+    python scripts/cnae_sql_chunks.py cnae_data_complete.txt --split-dir sql_chunks --chunk-bytes 262144 --copy-format
+
+    # Executar os blocos em ordem
+    for f in sql_chunks/part_*.sql; do psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f "$f"; done
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cnae_copy_loader import STAGING_TABLE, copy_escape
+from cnae_metrics import METRICS
+from cnae_stream import CnaeRecord, read_cnae_file
+
+DEFAULT_CHUNK_ROWS = 1000
+MANIFEST_VERSION = 1
+
+UPSERT_CLAUSE = """ON CONFLICT (cnae_code) DO UPDATE SET
+  setor_industria = EXCLUDED.setor_industria,
+  categoria = EXCLUDED.categoria,
+  updated_at = NOW()"""
+
+
+def sql_literal(value: str) -> str:
+    """Literal SQL com aspas simples escapadas"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _insert_row(record: CnaeRecord) -> str:
+    cnae, setor, categoria = record
+    return f"({sql_literal(cnae)}, {sql_literal(setor)}, {sql_literal(categoria)})"
+
+
+def _copy_row(record: CnaeRecord) -> str:
+    return '\t'.join(copy_escape(value) for value in record)
+
+
+def iter_chunks(records: Iterable[CnaeRecord], max_rows: Optional[int] = DEFAULT_CHUNK_ROWS,
+                max_bytes: Optional[int] = None, copy_format: bool = False) -> Iterator[List[Tuple[str, str]]]:
+    """
+    Agrupa os registros em blocos de (código, linha formatada), com no máximo
+    `max_rows` linhas e `max_bytes` bytes de dados (o que vier primeiro).
+    Um código repetido no mesmo bloco substitui a linha anterior.
+    """
+    render = _copy_row if copy_format else _insert_row
+    pending: Dict[str, str] = {}
+    sizes: Dict[str, int] = {}
+    size = 0
+
+    for record in records:
+        code = record[0]
+        row = render(record)
+        row_bytes = len(row.encode('utf-8')) + 2  # separador ',\n'
+        if code not in pending and pending and (
+                (max_rows and len(pending) >= max_rows) or (max_bytes and size + row_bytes > max_bytes)):
+            yield list(pending.items())
+            pending, sizes, size = {}, {}, 0
+        size += row_bytes - sizes.get(code, 0)
+        pending[code] = row
+        sizes[code] = row_bytes
+
+    if pending:
+        yield list(pending.items())
+
+
+def render_insert_chunk(rows: List[str]) -> str:
+    return (
+        "BEGIN;\n"
+        "INSERT INTO public.cnae_classifications (cnae_code, setor_industria, categoria) VALUES\n"
+        + ',\n'.join(rows)
+        + f"\n{UPSERT_CLAUSE};\n"
+        "COMMIT;\n"
+    )
+
+
+def render_copy_chunk(rows: List[str]) -> str:
+    return (
+        "BEGIN;\n"
+        f"CREATE TEMP TABLE {STAGING_TABLE} (cnae_code TEXT, setor_industria TEXT, categoria TEXT) ON COMMIT DROP;\n"
+        f"COPY {STAGING_TABLE} (cnae_code, setor_industria, categoria) FROM stdin;\n"
+        + '\n'.join(rows)
+        + "\n\\.\n"
+        "INSERT INTO public.cnae_classifications (cnae_code, setor_industria, categoria)\n"
+        f"SELECT cnae_code, setor_industria, categoria FROM {STAGING_TABLE}\n"
+        f"{UPSERT_CLAUSE};\n"
+        "COMMIT;\n"
+    )
+
+
+def _file_header(chunk: Optional[int] = None) -> str:
+    part = f" (bloco {chunk})" if chunk else ''
+    return f"""-- ============================================================================
+-- MIGRATION: Popular Tabela cnae_classifications - DADOS COMPLETOS{part}
+-- ============================================================================
+-- Gerado em blocos limitados, cada um em sua própria transação.
+-- Conferir linhas e checksums no manifesto JSON gerado junto.
+-- ============================================================================
+
+"""
+
+
+def write_chunked_sql(records: Iterable[CnaeRecord], output_file: Optional[str] = None,
+                      split_dir: Optional[str] = None, max_rows: Optional[int] = DEFAULT_CHUNK_ROWS,
+                      max_bytes: Optional[int] = None, copy_format: bool = False) -> dict:
+    """
+    Grava o SQL em blocos em `output_file` (um arquivo) ou em `split_dir`
+    (part_0001.sql, part_0002.sql, ...) e o manifesto ao lado. Retorna o manifesto.
+    """
+    if not output_file and not split_dir:
+        raise ValueError("Informe output_file ou split_dir")
+    render = render_copy_chunk if copy_format else render_insert_chunk
+
+    if split_dir:
+        os.makedirs(split_dir, exist_ok=True)
+        manifest_file = os.path.join(split_dir, 'manifest.json')
+        single = None
+    else:
+        manifest_file = output_file + '.manifest.json'
+        single = open(output_file, 'w', encoding='utf-8', newline='\n')
+        single.write(_file_header())
+
+    chunks = []
+    offset = 0
+    try:
+        for number, items in enumerate(iter_chunks(records, max_rows, max_bytes, copy_format), start=1):
+            with METRICS.stage('serialize', rows=len(items)):
+                rows = [row for _, row in items]
+                body = f"-- Bloco {number}: {len(rows)} registros\n" + render(rows) + "\n"
+                if split_dir:
+                    body = _file_header(number) + body
+                encoded = body.encode('utf-8')
+            with METRICS.stage('write', rows=len(rows), bytes=len(encoded)):
+                if split_dir:
+                    name = f"part_{number:04d}.sql"
+                    with open(os.path.join(split_dir, name), 'w', encoding='utf-8', newline='\n') as f:
+                        f.write(body)
+                else:
+                    name = os.path.basename(output_file)
+                    single.write(body)
+            chunk = {
+                'chunk': number,
+                'file': name,
+                'rows': len(rows),
+                'bytes': len(encoded),
+                'first_code': items[0][0],
+                'last_code': items[-1][0],
+                'sha256': hashlib.sha256(encoded).hexdigest(),
+            }
+            if not split_dir:
+                # Posição do bloco dentro do arquivo único (para conferir o checksum)
+                chunk['offset'] = len(_file_header().encode('utf-8')) + offset
+                offset += len(encoded)
+            chunks.append(chunk)
+            print(f"  Bloco {number}: {len(rows)} registros ({len(encoded)} bytes)", file=sys.stderr)
+    finally:
+        if single:
+            single.close()
+
+    manifest = {
+        'format_version': MANIFEST_VERSION,
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'format': 'copy' if copy_format else 'insert',
+        'max_rows': max_rows,
+        'max_bytes': max_bytes,
+        'total_rows': sum(chunk['rows'] for chunk in chunks),
+        'total_chunks': len(chunks),
+        'chunks': chunks,
+    }
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ {manifest['total_rows']} registros em {len(chunks)} blocos "
+          f"({split_dir or output_file}); manifesto: {manifest_file}", file=sys.stderr)
+    return manifest
+
+
+def add_chunk_arguments(parser: argparse.ArgumentParser):
+    """Opções de geração em blocos compartilhadas pelos scripts de SQL"""
+    parser.add_argument('--chunk-rows', type=int,
+                        help=f'Gerar SQL em blocos de até N registros (ex: {DEFAULT_CHUNK_ROWS}), um por transação')
+    parser.add_argument('--chunk-bytes', type=int, help='Limite de bytes de dados por bloco')
+    parser.add_argument('--copy-format', action='store_true',
+                        help='Blocos em formato COPY FROM stdin (executar via psql)')
+    parser.add_argument('--split-dir', help='Gravar um arquivo por bloco neste diretório')
+
+
+def chunking_requested(args) -> bool:
+    return bool(args.chunk_rows or args.chunk_bytes or args.copy_format or args.split_dir)
+
+
+def write_chunked_from_args(records: Iterable[CnaeRecord], args, output_file: Optional[str]) -> dict:
+    max_rows = args.chunk_rows or (None if args.chunk_bytes else DEFAULT_CHUNK_ROWS)
+    return write_chunked_sql(records, None if args.split_dir else output_file, args.split_dir,
+                             max_rows, args.chunk_bytes, args.copy_format)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gerar SQL de cnae_classifications em blocos limitados')
+    parser.add_argument('input_file', help="Arquivo com dados CNAE ('-' para stdin, aceita .gz)")
+    parser.add_argument('--output', help='Arquivo SQL de saída (um arquivo com todos os blocos)')
+    add_chunk_arguments(parser)
+
+    args = parser.parse_args()
+    if not args.output and not args.split_dir:
+        parser.error('informe --output ou --split-dir')
+
+    write_chunked_from_args(read_cnae_file(args.input_file), args, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Leitor streaming de dados CNAE (formato: CNAE\\tSetor\\tCategoria)
+
+Compartilhado pelos scripts de CNAE. Lê linha a linha de um arquivo, do stdin
+('-') ou de um stream gzip, sem carregar o arquivo inteiro em memória.
+
+Uso:
+    from cnae_stream import open_cnae_source, iter_cnae_records
+
+    with open_cnae_source('cnae_data_complete.txt') as f:
+        for cnae, setor, categoria in iter_cnae_records(f):
+            ...
+"""
+
+import gzip
+import io
+import sys
+from itertools import islice
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from cnae_metrics import TimedReader
+
+CnaeRecord = Tuple[str, str, str]
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+@contextmanager
+def open_cnae_source(path: Optional[str]) -> Iterator[TextIO]:
+    """
+    Abre a fonte de dados CNAE como texto UTF-8.
+
+    `path` pode ser um arquivo, '-' (ou None) para stdin. Streams gzip são
+    detectados pelo cabeçalho, independente da extensão.
+    """
+    from_stdin = path in (None, '-')
+    source = sys.stdin.buffer if from_stdin else open(path, 'rb')
+    try:
+        raw = source
+        if source.peek(2)[:2] == GZIP_MAGIC:
+            raw = gzip.GzipFile(fileobj=source)
+        # Bytes e tempo de leitura vão para a etapa `read` (cnae_metrics.py)
+        text = io.TextIOWrapper(TimedReader(raw), encoding='utf-8-sig')
+        try:
+            yield text
+        finally:
+            if from_stdin:
+                text.detach()
+            else:
+                text.close()
+    finally:
+        if not from_stdin:
+            source.close()
+
+
+def split_cnae_line(line: str) -> List[str]:
+    """Separa uma linha em campos (tab, espaços múltiplos ou espaços simples)"""
+    if '\t' in line:
+        return line.split('\t')
+    if '  ' in line:  # Espaços múltiplos
+        return [p.strip() for p in line.split('  ') if p.strip()]
+    return line.split()
+
+
+# Motivos de descarte de uma linha (código estável, usado na quarentena)
+REJECT_REASONS = {
+    'campos_insuficientes': 'menos de 3 campos',
+    'campo_vazio': 'CNAE, setor ou categoria vazio',
+    'formato_cnae': "código CNAE sem '-' ou '/'",
+}
+
+
+def reject_reason(parts: List[str]) -> Optional[str]:
+    """
+    Motivo de descarte dos campos de uma linha, ou None se a linha é válida.
+    Mesmas regras de iter_cnae_records, que só consulta esta função nos descartes.
+    """
+    if len(parts) < 3:
+        return 'campos_insuficientes'
+    cnae = parts[0].strip()
+    if not (cnae and parts[1].strip() and parts[2].strip()):
+        return 'campo_vazio'
+    if '-' not in cnae and '/' not in cnae:
+        return 'formato_cnae'
+    return None
+
+
+def iter_cnae_records(
+    lines: Iterable[str],
+    on_reject: Optional[Callable[[int, str], None]] = None,
+    require_format: bool = True,
+) -> Iterator[CnaeRecord]:
+    """
+    Gera tuplas (cnae, setor, categoria) validadas, uma linha por vez.
+
+    Ignora linhas vazias, comentários (#) e o cabeçalho (CNAE...). Linhas com
+    formato inválido são descartadas; se `on_reject` for informado, ele recebe
+    (numero_da_linha, linha) de cada descarte; o motivo sai de
+    reject_reason(split_cnae_line(linha)).
+
+    Com `require_format=False` (regras do process_cnae_data) o código não
+    precisa ter '-' ou '/' (aceita 7 dígitos sem máscara) e só é ignorado o
+    cabeçalho cujo primeiro campo é exatamente CNAE.
+
+    Setor e categoria repetidos apontam para o mesmo objeto str (poucas
+    centenas de valores distintos para milhões de linhas).
+    """
+    strings: dict = {}
+    intern = strings.setdefault
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#') or (require_format and line.startswith('CNAE')):
+            continue
+
+        parts = split_cnae_line(line)
+        if len(parts) >= 3:
+            cnae = parts[0].strip()
+            setor = parts[1].strip()
+            categoria = parts[2].strip()
+            if not require_format and cnae.upper() == 'CNAE':
+                continue
+
+            # Validar formato CNAE (ex: 0111-3/01)
+            if cnae and setor and categoria and (not require_format or '-' in cnae or '/' in cnae):
+                yield (cnae, intern(setor, setor), intern(categoria, categoria))
+                continue
+
+        if on_reject is not None:
+            on_reject(line_num, line)
+
+
+def read_cnae_file(
+    path: Optional[str],
+    on_reject: Optional[Callable[[int, str], None]] = None,
+    require_format: bool = True,
+) -> Iterator[CnaeRecord]:
+    """Gera registros CNAE direto de um arquivo, stdin ('-') ou gzip"""
+    with open_cnae_source(path) as f:
+        yield from iter_cnae_records(f, on_reject, require_format)
+
+
+def iter_batches(records: Iterable[CnaeRecord], size: int) -> Iterator[List[CnaeRecord]]:
+    """Agrupa um iterador de registros em listas de até `size`, sem materializar o resto"""
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_cnae_text(
+    text: str,
+    on_reject: Optional[Callable[[int, str], None]] = None,
+    require_format: bool = True,
+) -> List[CnaeRecord]:
+    """Parse de dados CNAE já em memória (ex: literais embutidos nos scripts)"""
+    return list(iter_cnae_records(io.StringIO(text), on_reject, require_format))
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Cache local (SQLite) da última sincronização de cnae_classifications
+
+Os loaders terminam com um `select("cnae_code", count="exact")` e não lembram
+o que escreveram. Este cache guarda, por destino (URL do Supabase ou do
+Postgres + tabela):
+
+    - o snapshot sincronizado (cnae_code -> hash, como em cnae_diff.py),
+      comprimido, e o content_hash da entrada escrita
+    - o validador do servidor: total de linhas + max(updated_at) (watermark),
+      gravado como ETag fraco W/"<total>-<watermark>"
+    - quando foi validado e quando foi usado pela última vez
+
+Fluxo de um loader com --cache:
+    1. Entrada igual à última sincronizada e validação dentro do TTL:
+       termina sem nenhuma requisição
+    2. TTL vencido: uma requisição condicional (total + watermark, sem
+       corpo de dados). Se o ETag bate, é "não modificado" e o TTL renova
+    3. Entrada diferente ou servidor alterado: carga normal e o estado do
+       servidor depois da escrita (a mesma consulta de total que o loader já
+       fazia) vira o novo validador. Se algum registro falhar ou for
+       rejeitado, nada é gravado no cache e a próxima execução carrega de novo
+
+O PostgREST não devolve ETag em selects, por isso o validador é calculado a
+partir do total e do watermark. Escritas que não atualizam updated_at só
+são percebidas pela mudança de total ou depois do TTL.
+
+Entradas são removidas por LRU quando o tamanho total passa de --cache-max-mb.
+
+Uso:
+    python scripts/populate_cnae_classifications_complete.py --input-file cnae_data_complete.txt --cache .cnae_cache.sqlite
+    python scripts/populate_all_cnae_data.py --input-file cnae_data_complete.txt --insert --cache .cnae_cache.sqlite --cache-ttl 86400
+
+    # Inspecionar / limpar
+    python scripts/cnae_sync_cache.py .cnae_cache.sqlite
+    python scripts/cnae_sync_cache.py .cnae_cache.sqlite --clear
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import argparse
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from cnae_diff import TABLE, content_hash, snapshot_from_records
+from cnae_stream import CnaeRecord
+
+CACHE_VERSION = 1
+DEFAULT_TTL = 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_cache (
+    key TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    synced_hash TEXT NOT NULL,
+    etag TEXT,
+    watermark TEXT,
+    row_count INTEGER,
+    validated_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    snapshot BLOB NOT NULL
+)
+"""
+
+
+class RemoteState(NamedTuple):
+    """Estado da tabela no servidor usado como validador"""
+    row_count: int
+    watermark: Optional[str]
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self.row_count}-{self.watermark or ""}"'
+
+
+class LoadResult(NamedTuple):
+    """O que a carga escreveu: registros gravados e registros que falharam ou foram rejeitados"""
+    written: int
+    failed: int
+
+
+class CacheEntry(NamedTuple):
+    key: str
+    synced_hash: str
+    etag: Optional[str]
+    watermark: Optional[str]
+    row_count: Optional[int]
+    validated_at: float
+    accessed_at: float
+    size_bytes: int
+
+    def fresh(self, ttl: float, now: Optional[float] = None) -> bool:
+        return ((now or time.time()) - self.validated_at) < ttl
+
+
+def cache_key(target: str, table: str = TABLE) -> str:
+    """Chave do destino, sem credenciais (senha da connection string)"""
+    parts = urlsplit(target)
+    if parts.password:
+        netloc = parts.netloc.rsplit('@', 1)
+        netloc = f"{parts.username}@{netloc[-1]}"
+        target = urlunsplit(parts._replace(netloc=netloc))
+    return f"{target.rstrip('/')}#{table}"
+
+
+def postgrest_state(supabase, table: str = TABLE) -> RemoteState:
+    """Total + maior updated_at via PostgREST (uma linha no corpo)"""
+    result = supabase.table(table).select("updated_at", count="exact") \
+        .order("updated_at", desc=True, nullsfirst=False).limit(1).execute()
+    rows = result.data or []
+    return RemoteState(result.count or 0, rows[0]["updated_at"] if rows else None)
+
+
+def postgres_state(db_url: str, table: str = TABLE) -> RemoteState:
+    """Total + maior updated_at direto no Postgres"""
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ Erro: psycopg2 não instalado. Execute: pip install psycopg2-binary", file=sys.stderr)
+        sys.exit(1)
+
+    conn = psycopg2.connect(db_url)
+    try:
+        with conn.cursor() as cur:
+            # Mesmo formato de timestamp que o PostgREST devolve
+            cur.execute(f"SELECT count(*), to_json(max(updated_at))#>>'{{}}' FROM public.{table}")
+            count, watermark = cur.fetchone()
+    finally:
+        conn.close()
+    return RemoteState(count, watermark)
+
+
+class SyncCache:
+    """Cache SQLite com TTL, validador por ETag e remoção LRU por tamanho"""
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self) -> 'SyncCache':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Entrada da chave (marca como usada agora); None se ausente ou de outra versão"""
+        row = self.conn.execute(
+            "SELECT key, synced_hash, etag, watermark, row_count, validated_at, accessed_at, "
+            "size_bytes FROM sync_cache WHERE key = ? AND version = ?", (key, CACHE_VERSION)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE sync_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return CacheEntry(*row)
+
+    def snapshot(self, key: str) -> Optional[Dict[str, str]]:
+        """Snapshot sincronizado da chave (cnae_code -> hash)"""
+        row = self.conn.execute("SELECT snapshot FROM sync_cache WHERE key = ? AND version = ?",
+                                (key, CACHE_VERSION)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def put(self, key: str, snapshot: Dict[str, str], state: Optional[RemoteState]):
+        """Grava a sincronização (content_hash do snapshot) e remove entradas antigas se passar do limite"""
+        synced_hash = content_hash(snapshot)
+        blob = zlib.compress(json.dumps(snapshot, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_cache (key, version, synced_hash, etag, watermark, "
+                "row_count, validated_at, accessed_at, size_bytes, snapshot) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, CACHE_VERSION, synced_hash,
+                 state.etag if state else None, state.watermark if state else None,
+                 state.row_count if state else None, now, now, len(blob), blob))
+        self.evict()
+
+    def mark_validated(self, key: str):
+        """Renova o TTL depois de uma validação 'não modificado'"""
+        with self.conn:
+            self.conn.execute("UPDATE sync_cache SET validated_at = ? WHERE key = ?", (time.time(), key))
+
+    def evict(self) -> int:
+        """Remove as entradas menos usadas até caber em max_bytes; retorna quantas saíram"""
+        rows = self.conn.execute("SELECT key, size_bytes FROM sync_cache ORDER BY accessed_at DESC").fetchall()
+        total = 0
+        evicted: List[str] = []
+        for key, size in rows:
+            total += size
+            # A entrada mais recente fica mesmo que sozinha passe do limite
+            if total > self.max_bytes and key != rows[0][0]:
+                evicted.append(key)
+        if evicted:
+            with self.conn:
+                self.conn.executemany("DELETE FROM sync_cache WHERE key = ?", [(key,) for key in evicted])
+        return len(evicted)
+
+    def entries(self) -> List[CacheEntry]:
+        rows = self.conn.execute(
+            "SELECT key, synced_hash, etag, watermark, row_count, validated_at, accessed_at, "
+            "size_bytes FROM sync_cache ORDER BY accessed_at DESC").fetchall()
+        return [CacheEntry(*row) for row in rows]
+
+    def clear(self) -> int:
+        with self.conn:
+            return self.conn.execute("DELETE FROM sync_cache").rowcount
+
+
+def peek_cache(path: str, key: str) -> Optional[Tuple[CacheEntry, Dict[str, str]]]:
+    """
+    Entrada e snapshot da chave sem alterar o arquivo (somente leitura, não
+    marca o uso); None se o cache ou a chave não existirem
+    """
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+    try:
+        row = conn.execute(
+            "SELECT key, synced_hash, etag, watermark, row_count, validated_at, accessed_at, "
+            "size_bytes, snapshot FROM sync_cache WHERE key = ? AND version = ?", (key, CACHE_VERSION)).fetchone()
+    except sqlite3.OperationalError:  # arquivo sem a tabela sync_cache
+        return None
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return CacheEntry(*row[:8]), json.loads(zlib.decompress(row[8]))
+
+
+def sync_with_cache(cache: SyncCache, key: str, data: List[CnaeRecord],
+                    remote_state: Callable[[], RemoteState], load: Callable[[], LoadResult]) -> bool:
+    """
+    Executa `load` só se a entrada mudou desde a última sincronização ou se o
+    servidor mudou (validador diferente). Retorna True se houve carga.
+
+    A entrada só é gravada quando a carga escreveu todos os códigos sem
+    nenhuma falha; senão a tabela pode não refletir o snapshot e a próxima
+    execução tem de tentar de novo.
+    """
+    snapshot = snapshot_from_records(data)
+    input_hash = content_hash(snapshot)
+    entry = cache.get(key)
+
+    if entry is not None and entry.synced_hash == input_hash:
+        if entry.fresh(cache.ttl):
+            print(f"📦 Nada mudou desde a última sincronização ({len(snapshot)} registros, "
+                  f"validado há {time.time() - entry.validated_at:.0f}s); nenhuma requisição", file=sys.stderr)
+            return False
+        state = remote_state()
+        if state.etag == entry.etag:
+            cache.mark_validated(key)
+            print(f"📦 Servidor não modificado ({state.etag}); carga dispensada", file=sys.stderr)
+            return False
+        print(f"🔄 Tabela alterada no servidor ({entry.etag} -> {state.etag}); sincronizando", file=sys.stderr)
+    elif entry is not None:
+        print("🔄 Entrada diferente da última sincronização; sincronizando", file=sys.stderr)
+
+    result = load()
+    state = remote_state()
+    print(f"   📊 Total na tabela: {state.row_count} | validador: {state.etag}", file=sys.stderr)
+    if result.failed or result.written < len(snapshot):
+        print(f"⚠️  Carga incompleta ({result.written} de {len(snapshot)} registros escritos, "
+              f"{result.failed} com falha): cache não atualizado", file=sys.stderr)
+        return True
+    cache.put(key, snapshot, state)
+    return True
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    """Opções de cache compartilhadas pelos loaders"""
+    parser.add_argument('--cache', help='Arquivo SQLite do cache de sincronização (ex: .cnae_cache.sqlite)')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                        help=f'Segundos em que o cache vale sem revalidar no servidor (padrão: {DEFAULT_TTL})')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help='Tamanho máximo do cache antes da remoção LRU (padrão: 64)')
+
+
+def open_cache_from_args(args) -> SyncCache:
+    return SyncCache(args.cache, args.cache_ttl, int(args.cache_max_mb * 1024 * 1024))
+
+
+def run_cached_load(args, data: List[CnaeRecord], engine: str, load: Callable[[], LoadResult]) -> bool:
+    """
+    Envolve a carga de um loader com o cache. `engine` 'copy' valida direto no
+    Postgres (DATABASE_URL); os demais via PostgREST (SUPABASE_URL).
+    """
+    if engine == 'copy':
+        from cnae_copy_loader import resolve_db_url
+        db_url = resolve_db_url(args.db_url)
+        key = cache_key(db_url)
+
+        def remote_state():
+            return postgres_state(db_url)
+    else:
+        supabase_url = os.getenv("SUPABASE_URL")
+        if not supabase_url:
+            print("❌ Erro: SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY devem estar configurados", file=sys.stderr)
+            sys.exit(1)
+        key = cache_key(supabase_url)
+
+        def remote_state():
+            from cnae_diff import get_supabase_client
+            return postgrest_state(get_supabase_client())
+
+    with open_cache_from_args(args) as cache:
+        return sync_with_cache(cache, key, data, remote_state, load)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Listar (mais recentes primeiro) ou limpar o cache de sincronização')
+    parser.add_argument('cache_file', help='Arquivo SQLite do cache')
+    parser.add_argument('--clear', action='store_true', help='Remover todas as entradas')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.cache_file):
+        print(f"❌ Cache não encontrado: {args.cache_file}", file=sys.stderr)
+        sys.exit(1)
+
+    with SyncCache(args.cache_file) as cache:
+        if args.clear:
+            print(f"🗑️  {cache.clear()} entradas removidas", file=sys.stderr)
+            return
+        now = time.time()
+        for entry in cache.entries():
+            print(f"{entry.key}\t{entry.row_count}\t{entry.etag}\t"
+                  f"validado há {now - entry.validated_at:.0f}s\t{entry.size_bytes} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Ingestão paralela de overrides de classificação CNAE por tenant
+
+Cada tenant tem um TSV (mesmo formato de cnae_data_complete.txt) com os
+setores/categorias que sobrescrevem a base. Em vez de rodar
+process_cnae_complete_file.py uma vez por arquivo, este script lê todos os
+arquivos de uma vez em um ProcessPoolExecutor e aplica as camadas com
+precedência explícita:
+
+    base (cnae_data_complete.txt) < sector packs (--pack) < tenant (--tenants)
+
+Packs são aplicados em ordem de nome de arquivo; dentro de um arquivo vale a
+última ocorrência de cada código (como no upsert). Códigos são comparados
+pela chave de 7 dígitos, então '62.03-1/00' no arquivo do tenant sobrescreve
+'6203-1/00' da base.
+
+Base e packs são lidos em paralelo e mesclados uma vez; cada tenant é então
+uma tarefa independente no pool (ler, validar, mesclar e gravar), o que
+escala quase linearmente com o número de núcleos. A saída é determinística:
+registros em ordem de código, no formato canônico DDDD-D/DD, e o manifesto em
+ordem de tenant.
+
+Saída em --output-dir, um arquivo por tenant (nome do arquivo sem extensão):
+    - tsv (padrão): mesmo formato de cnae_data_complete.txt
+    - bin: tabela binária para mmap (cnae_binary.py)
+    - json: artefato de lookup (cnae_lookup.py)
+e manifest.json com linhas, overrides aplicados, rejeitados e SHA-256.
+
+Uso:
+    python scripts/cnae_tenant_overrides.py --tenants overrides/tenants/ --output-dir build/tenants
+    python scripts/cnae_tenant_overrides.py --pack 'overrides/packs/*.tsv' --tenants 'overrides/tenants/*.tsv.gz' \\
+        --output-dir build/tenants --format bin --workers 8 --strict
+
+Requisitos:
+    - Para --strict: numpy (pip install numpy)
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from cnae_codes import cnae_key, format_cnae_key
+from cnae_lookup import DEFAULT_INPUT
+from cnae_stream import read_cnae_file
+
+MANIFEST_VERSION = 1
+INPUT_EXTENSIONS = ('.tsv', '.txt', '.tsv.gz', '.txt.gz')
+OUTPUT_EXTENSIONS = {'tsv': '.tsv', 'bin': '.bin', 'json': '.json'}
+TSV_HEADER = 'CNAE\tSetor / Indústria\tCategoria\n'
+
+# chave de 7 dígitos -> (setor, categoria)
+Layer = Dict[int, Tuple[str, str]]
+
+
+class LayerFile(NamedTuple):
+    """Resultado da leitura de um arquivo de camada"""
+    path: str
+    records: Layer
+    total: int
+    rejects: List[str]
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """Arquivos de uma lista de diretórios/globs, sem repetição e em ordem de nome"""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(os.path.join(pattern, name) for name in os.listdir(pattern)
+                         if name.lower().endswith(INPUT_EXTENSIONS))
+        else:
+            paths.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def tenant_name(path: str) -> str:
+    """Nome do tenant a partir do arquivo (ex: tenants/acme.tsv.gz -> acme)"""
+    name = os.path.basename(path)
+    for extension in sorted(INPUT_EXTENSIONS, key=len, reverse=True):
+        if name.lower().endswith(extension):
+            return name[:-len(extension)]
+    return os.path.splitext(name)[0]
+
+
+def parse_layer(path: str, strict: bool = False) -> LayerFile:
+    """Lê e valida um arquivo de camada (roda nos processos do pool)"""
+    rejects: List[str] = []
+    rows = list(read_cnae_file(path, on_reject=lambda line_num, line: rejects.append(f"linha {line_num}: {line[:80]}")))
+
+    valid = None
+    if strict:
+        from cnae_vectorized import normalize_cnae_array
+        valid = normalize_cnae_array([cnae for cnae, _, _ in rows]).valid
+
+    records: Layer = {}
+    for i, (cnae, setor, categoria) in enumerate(rows):
+        key = cnae_key(cnae)
+        if key is None or (valid is not None and not valid[i]):
+            rejects.append(f"código inválido: {cnae}")
+            continue
+        records[key] = (setor, categoria)  # última ocorrência vence
+    return LayerFile(path, records, len(rows), rejects)
+
+
+def merge_layers(layers: List[Layer]) -> Tuple[Layer, int]:
+    """Aplica as camadas em ordem (a última vence); retorna o resultado e quantos códigos foram sobrescritos"""
+    merged: Layer = {}
+    overridden = 0
+    for layer in layers:
+        for key, value in layer.items():
+            previous = merged.get(key)
+            if previous is not None and previous != value:
+                overridden += 1
+            merged[key] = value
+    return merged, overridden
+
+
+def write_output(merged: Layer, output_file: str, fmt: str):
+    """Grava o resultado mesclado em ordem de código"""
+    records = [(format_cnae_key(key), *merged[key]) for key in sorted(merged)]
+    if fmt == 'bin':
+        from cnae_binary import write_cnae_table
+        write_cnae_table(records, output_file)
+    elif fmt == 'json':
+        from cnae_lookup import build_lookup, write_lookup
+        write_lookup(build_lookup(records), output_file)
+    else:
+        with open(output_file, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(TSV_HEADER)
+            f.writelines(f"{cnae}\t{setor}\t{categoria}\n" for cnae, setor, categoria in records)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Base + packs já mesclados, enviados uma vez para cada processo do pool
+_SHARED_LAYER: Layer = {}
+
+
+def _init_worker(shared: Layer):
+    global _SHARED_LAYER
+    _SHARED_LAYER = shared
+
+
+def build_tenant(tenant: str, path: str, output_dir: str, fmt: str, strict: bool) -> dict:
+    """Lê o arquivo do tenant, mescla sobre base + packs e grava a saída (roda no pool)"""
+    layer = parse_layer(path, strict)
+    merged = dict(_SHARED_LAYER)
+    overridden = added = 0
+    for key, value in layer.records.items():
+        previous = merged.get(key)
+        if previous is None:
+            added += 1
+        elif previous != value:
+            overridden += 1
+        merged[key] = value
+
+    output_file = os.path.join(output_dir, tenant + OUTPUT_EXTENSIONS[fmt])
+    write_output(merged, output_file, fmt)
+    return {
+        'tenant': tenant,
+        'input': path,
+        'file': os.path.basename(output_file),
+        'rows': len(merged),
+        'tenant_rows': layer.total,
+        'overridden': overridden,
+        'added': added,
+        'rejected': len(layer.rejects),
+        'rejects': layer.rejects[:20],
+        'sha256': _file_sha256(output_file),
+    }
+
+
+def run_batch(base: str, packs: List[str], tenants: List[str], output_dir: str, fmt: str = 'tsv',
+              workers: Optional[int] = None, strict: bool = False) -> dict:
+    """Processa base, packs e tenants no pool e grava as saídas e o manifesto"""
+    names: Dict[str, str] = {}
+    for path in tenants:
+        name = tenant_name(path)
+        if name in names:
+            raise ValueError(f"Tenant duplicado '{name}': {names[name]} e {path}")
+        names[name] = path
+
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    # 1) Base e packs em paralelo; mescla no processo principal, na ordem das camadas
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_layer, path, strict) for path in [base] + packs]
+        layer_files = [future.result() for future in futures]
+    for layer in layer_files:
+        print(f"📊 {layer.path}: {len(layer.records)} códigos ({len(layer.rejects)} rejeitados)", file=sys.stderr)
+    shared, pack_overrides = merge_layers([layer.records for layer in layer_files])
+    if pack_overrides:
+        print(f"   Packs sobrescreveram {pack_overrides} classificações da base", file=sys.stderr)
+
+    # 2) Um tenant por tarefa; base + packs vão uma vez por processo (initializer)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) as executor:
+        futures = {name: executor.submit(build_tenant, name, path, output_dir, fmt, strict)
+                   for name, path in names.items()}
+        for name in sorted(futures):
+            result = futures[name].result()
+            results.append(result)
+            print(f"✅ {name}: {result['rows']} códigos ({result['overridden']} sobrescritos, "
+                  f"{result['added']} novos, {result['rejected']} rejeitados)", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    manifest = {
+        'format_version': MANIFEST_VERSION,
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'format': fmt,
+        'strict': strict,
+        'layers': {
+            'base': {'file': base, 'rows': len(layer_files[0].records), 'rejected': len(layer_files[0].rejects)},
+            'packs': [{'file': layer.path, 'rows': len(layer.records), 'rejected': len(layer.rejects)}
+                      for layer in layer_files[1:]],
+            'pack_overrides': pack_overrides,
+        },
+        'tenants': results,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    total_rows = sum(layer.total for layer in layer_files) + sum(result['tenant_rows'] for result in results)
+    print(f"\n✅ {len(results)} tenants em {output_dir}", file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({total_rows / elapsed if elapsed > 0 else 0:.0f} registros/s)", file=sys.stderr)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mesclar overrides CNAE por tenant (base < packs < tenant) em paralelo')
+    parser.add_argument('--base', default=DEFAULT_INPUT, help='Arquivo base (padrão: cnae_data_complete.txt)')
+    parser.add_argument('--pack', action='append', default=[],
+                        help='Diretório ou glob de sector packs (pode repetir; aplicados em ordem de nome)')
+    parser.add_argument('--tenants', action='append', required=True,
+                        help='Diretório ou glob com um arquivo por tenant (pode repetir)')
+    parser.add_argument('--output-dir', required=True, help='Diretório das saídas por tenant e do manifesto')
+    parser.add_argument('--format', choices=sorted(OUTPUT_EXTENSIONS), default='tsv', help='Formato de saída (padrão: tsv)')
+    parser.add_argument('--workers', type=int, help='Processos no pool (padrão: núcleos disponíveis)')
+    parser.add_argument('--strict', action='store_true',
+                        help='Descartar códigos com formato ou dígito verificador inválido (requer numpy)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.base):
+        print(f"❌ Arquivo não encontrado: {args.base}", file=sys.stderr)
+        sys.exit(1)
+    packs = expand_inputs(args.pack)
+    tenants = expand_inputs(args.tenants)
+    if not tenants:
+        print("❌ Nenhum arquivo de tenant encontrado", file=sys.stderr)
+        sys.exit(1)
+    print(f"📊 Base: {args.base} | Packs: {len(packs)} | Tenants: {len(tenants)}", file=sys.stderr)
+
+    try:
+        run_batch(args.base, packs, tenants, args.output_dir, args.format, args.workers, args.strict)
+    except ValueError as e:
+        print(f"❌ Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Normalização e validação vetorizada de códigos CNAE (NumPy)
+
+Recebe um array de códigos em qualquer formato ('62.03-1/00', '6203100',
+'6203-1/00', ' 62.03-1-00 ') e devolve, em uma passada sobre uma matriz de
+bytes (uma linha por código):
+
+    - normalized: igual a normalize_cnae_code() do banco
+                  (UPPER(REPLACE(REPLACE(TRIM(x), '.', ''), ' ', '')));
+                  nulos/vazios viram b''
+    - canonical:  formato do banco 'DDDD-D/DD' (b'' quando inválido)
+    - keys:       inteiro de 7 dígitos da subclasse (-1 quando inválido)
+    - valid:      7 dígitos sem máscara (6203100) ou na máscara DDDD-D/DD,
+                  com o ponto opcional do IBGE (62.03-1/00) e '-' aceito no
+                  lugar da barra (6203-1-00); espaços só nas pontas; dígito
+                  verificador da classe correto
+
+Dígito verificador da classe (5º dígito): soma dos 4 primeiros dígitos com
+pesos 5, 4, 3, 2, módulo 11, mapeada por CLASS_CHECK_DIGITS. A regra confere
+com todas as classes de cnae_data_complete.txt.
+
+Uso:
+    from cnae_vectorized import normalize_cnae_array
+    cols = normalize_cnae_array(['62.03-1/00', '6203100', 'xx'])
+    cols.keys   # array([6203100, 6203100, -1])
+    cols.valid  # array([ True,  True, False])
+
+    # Linha de comando: um código por linha (arquivo ou stdin) -> TSV
+    python scripts/cnae_vectorized.py codigos.txt
+    python scripts/cnae_vectorized.py --benchmark 10000000
+
+Requisitos:
+    - numpy: pip install numpy
+"""
+
+import sys
+import time
+import argparse
+from typing import NamedTuple, Sequence
+
+from cnae_codes import normalize_cnae_code
+
+try:
+    import numpy as np
+except ImportError:
+    print("❌ Erro: numpy não instalado. Execute: pip install numpy", file=sys.stderr)
+    sys.exit(1)
+
+# Resto de (5*d1 + 4*d2 + 3*d3 + 2*d4) % 11 -> dígito verificador da classe
+CLASS_CHECK_DIGITS = np.array([1, 1, 0, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.uint8)
+CLASS_WEIGHTS = np.array([5, 4, 3, 2], dtype=np.int32)
+
+_DOT, _SPACE, _DASH, _SLASH = ord('.'), ord(' '), ord('-'), ord('/')
+_ZERO, _NINE, _LOWER_A = ord('0'), ord('9'), ord('a')
+
+# Tabelas pré-calculadas (consultadas por índice em vez de aritmética por dígito)
+_CLASS_NUMBERS = np.arange(10000)
+_CLASS_DIGITS = (_CLASS_NUMBERS[:, None] // np.array([1000, 100, 10, 1])) % 10
+# classe de 4 dígitos -> dígito verificador esperado (5º dígito)
+_CLASS_CHECK = CLASS_CHECK_DIGITS[(_CLASS_DIGITS @ CLASS_WEIGHTS) % 11]
+# classe de 4 dígitos / par de dígitos -> texto ASCII
+_CLASS_TEXT = np.array([f"{i:04d}" for i in range(10000)], dtype='S4')
+_PAIR_TEXT = np.array([f"{i:02d}" for i in range(100)], dtype='S2')
+_DIGIT_TEXT = np.array([str(i) for i in range(10)], dtype='S1')
+# 'DDDD-D/DD' montado campo a campo e lido como S9
+_CANONICAL = np.dtype([('classe', 'S4'), ('traco', 'S1'), ('dv', 'S1'), ('barra', 'S1'), ('final', 'S2')])
+
+
+def class_check_digit(class4: int) -> int:
+    """Dígito verificador esperado para a classe de 4 dígitos"""
+    return int(_CLASS_CHECK[class4])
+
+
+class CnaeColumns(NamedTuple):
+    normalized: 'np.ndarray'
+    canonical: 'np.ndarray'
+    keys: 'np.ndarray'
+    valid: 'np.ndarray'
+
+
+def _as_byte_matrix(codes):
+    """Converte os códigos para uma matriz uint8 (n, largura) e máscara de não-ASCII"""
+    array = codes if isinstance(codes, np.ndarray) else np.asarray(codes, dtype=object)
+    if array.dtype.kind == 'O':
+        array = np.where(np.equal(array, None), '', array)
+    if array.dtype.kind == 'S':
+        raw = array
+        non_ascii = np.zeros(len(array), dtype=bool)
+    else:
+        try:
+            raw = array.astype('S')
+            non_ascii = np.zeros(len(array), dtype=bool)
+        except UnicodeEncodeError:
+            text = array.astype('U')
+            raw = np.char.encode(text, 'utf-8')
+            non_ascii = np.char.str_len(raw) != np.char.str_len(text)
+    width = max(raw.dtype.itemsize, 1)
+    matrix = np.frombuffer(np.ascontiguousarray(raw, dtype=f'S{width}').tobytes(), dtype=np.uint8)
+    return matrix.reshape(len(array), width), non_ascii
+
+
+def _compact(columns, keep):
+    """
+    Move os bytes marcados em `keep` para o início de cada código, preservando
+    a ordem. Opera na matriz transposta (largura, n): uma passada por coluna.
+    """
+    width, n = columns.shape
+    out = np.zeros((width + 1, n), dtype=np.uint8)
+    flat = out.reshape(-1)
+    rows = np.arange(n, dtype=np.int64)
+    position = np.zeros(n, dtype=np.int64)
+    for j in range(width):
+        # Bytes descartados vão para a linha extra, que é cortada no final
+        flat[np.where(keep[j], position, width) * n + rows] = columns[j]
+        position += keep[j]
+    return out[:width]
+
+
+def normalize_cnae_array(codes: Sequence) -> CnaeColumns:
+    """Normaliza, canonicaliza e valida um array de códigos CNAE"""
+    matrix, non_ascii = _as_byte_matrix(codes)
+    n, width = matrix.shape
+    # Uma coluna contígua por posição de caractere: as passadas abaixo são
+    # operações 1-D sobre n bytes, sem acesso com stride nem máscaras where=
+    # (cópia: a transposta de uma matriz (1, w) já é contígua e ascontiguousarray
+    # devolveria a própria view somente leitura de _as_byte_matrix)
+    columns = matrix.T.copy()
+
+    # Chave inteira e máscara, na ordem original dos bytes. A posição de cada
+    # separador é dada pelos dígitos vistos antes dele: '.' depois de 2, '-'
+    # depois de 4, '/' (ou '-') depois de 5. Chaves com mais de 7 dígitos
+    # podem estourar int32, mas já são inválidas
+    keys = np.zeros(n, dtype=np.int32)
+    digit_count = np.zeros(n, dtype=np.uint8)
+    dots = np.zeros(n, dtype=np.uint8)
+    dashes = np.zeros(n, dtype=np.uint8)
+    slashes = np.zeros(n, dtype=np.uint8)
+    started = np.zeros(n, dtype=bool)
+    bad = np.zeros(n, dtype=bool)
+    value = np.empty(n, dtype=np.uint8)
+    is_digit = np.empty(n, dtype=bool)
+    step = np.empty(n, dtype=np.int32)
+    with np.errstate(over='ignore'):
+        for column in columns:
+            np.subtract(column, np.uint8(_ZERO), out=value)  # uint8: não-dígitos dão valores >= 10
+            np.less(value, 10, out=is_digit)
+            # keys = keys * 10 + value apenas onde é dígito
+            np.multiply(keys, 9, out=step)
+            step += value
+            step *= is_digit
+            keys += step
+
+            is_space = column == _SPACE
+            padding = column == 0
+            dot = (column == _DOT) & (digit_count == 2)
+            dash = (column == _DASH) & (digit_count == 4)
+            slash = ((column == _SLASH) | (column == _DASH)) & (digit_count == 5)
+            # Espaço só antes do código ou depois do 7º dígito; nenhum dígito depois do 7º
+            bad |= is_space & started & (digit_count != 7)
+            bad |= is_digit & (digit_count >= 7)
+            bad |= ~(is_digit | is_space | padding | dot | dash | slash)
+            started |= ~(is_space | padding)
+            dots += dot
+            dashes += dash
+            slashes += slash
+            digit_count += is_digit
+
+    # Sem máscara (7 dígitos seguidos) ou máscara completa, cada separador uma vez
+    masked = (dashes == 1) & (slashes == 1) & (dots <= 1)
+    bare = (dashes == 0) & (slashes == 0) & (dots == 0)
+    valid = (digit_count == 7) & ~bad & ~non_ascii & (masked | bare)
+
+    # normalize_cnae_code: remover '.', ' ' e converter para maiúsculas
+    removed = (columns == _DOT)
+    removed |= columns == _SPACE
+    dirty = np.zeros(n, dtype=bool)
+    for row in removed:
+        dirty |= row
+    dirty_rows = np.flatnonzero(dirty)
+    if len(dirty_rows):
+        columns[:, dirty_rows] = _compact(columns.take(dirty_rows, axis=1), ~removed.take(dirty_rows, axis=1))
+    for column in columns:
+        lower = (column - np.uint8(_LOWER_A)) < 26
+        if lower.any():
+            column[lower] -= 32
+
+    keys[~valid] = 0
+
+    # Classe (4 dígitos), dígito verificador e final de 2 dígitos via tabelas
+    class4 = keys // 1000
+    tail = keys - class4 * 1000
+    check = tail // 100
+    tail -= check * 100
+    valid &= _CLASS_CHECK[class4] == check
+    keys = np.where(valid, keys.astype(np.int64), -1)
+
+    canonical = np.empty(n, dtype=_CANONICAL)
+    canonical['classe'] = _CLASS_TEXT.take(class4)
+    canonical['traco'] = b'-'
+    canonical['dv'] = _DIGIT_TEXT.take(check)
+    canonical['barra'] = b'/'
+    canonical['final'] = _PAIR_TEXT.take(tail)
+    canonical = canonical.view('S9')
+    canonical[~valid] = b''
+
+    normalized = np.ascontiguousarray(columns.T).view(f'S{width}').reshape(n)
+    if non_ascii.any():
+        # Maiúsculas fora do ASCII: usar a normalização escalar (mesmo resultado do banco)
+        normalized = normalized.astype(object)
+        for i in np.nonzero(non_ascii)[0]:
+            normalized[i] = (normalize_cnae_code(codes[i]) or '').encode('utf-8')
+
+    return CnaeColumns(normalized, canonical, keys, valid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Normalização vetorizada de códigos CNAE')
+    parser.add_argument('input_file', nargs='?', default='-', help="Um código por linha ('-' para stdin)")
+    parser.add_argument('--benchmark', type=int, metavar='N', help='Medir códigos/s com N códigos sintéticos')
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        samples = np.array(['62.03-1/00', '6203100', '6203-1/00', '0111-3/01', 'invalido'], dtype='S')
+        codes = samples[np.arange(args.benchmark) % len(samples)]
+        start = time.perf_counter()
+        cols = normalize_cnae_array(codes)
+        elapsed = time.perf_counter() - start
+        print(f"⏱️ {len(codes)} códigos em {elapsed:.2f}s ({len(codes) / elapsed:,.0f} códigos/s), "
+              f"{int(cols.valid.sum())} válidos", file=sys.stderr)
+        return
+
+    source = sys.stdin if args.input_file == '-' else open(args.input_file, 'r', encoding='utf-8')
+    try:
+        codes = [line.rstrip('\r\n') for line in source]
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    cols = normalize_cnae_array(codes)
+    for code, normalized, canonical, key, valid in zip(codes, cols.normalized, cols.canonical, cols.keys, cols.valid):
+        print(f"{code}\t{normalized.decode('utf-8')}\t{canonical.decode('ascii')}\t{key}\t{int(valid)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Store local de respostas da Receita/BrasilAPI por CNPJ (content-addressed)
+
+A qualificação em massa (enrichProspect em qualify-prospects-bulk) busca
+https://brasilapi.com.br/api/cnpj/v1/{cnpj} para todo CNPJ em toda execução,
+mesmo com uploads que se repetem quase inteiros. Este store guarda as
+respostas em SQLite:
+
+    - cnpj_index: CNPJ normalizado (14 dígitos) -> status HTTP, digest e
+      quando foi buscado. 404 também é guardado (cache negativo)
+    - blobs: corpo JSON canônico (chaves ordenadas) comprimido com zlib e um
+      dicionário com os campos da BrasilAPI, endereçado pelo SHA-256. Corpos
+      iguais (ex: a mesma resposta buscada de novo) são gravados uma vez
+
+Política de validade: respostas valem --max-age-days (padrão 30) e 404
+valem --negative-max-age-days (padrão 1); vencidas contam como falta.
+
+Comandos:
+    prefetch: lê o CSV (coluna cnpj, ex: scripts/test-10-companies.csv),
+              normaliza, valida os DVs e deduplica os CNPJs (inválidos
+              nunca viram requisição), consulta o store em lote
+              (get_many) e lista só as faltas; com --fetch busca as faltas
+              (concorrência e taxa limitadas, retry com backoff) e grava
+    export:   respostas guardadas dos CNPJs do CSV, como NDJSON (entrada de
+              cnae_company_sector.py) ou CSV com os campos da Receita (entrada
+              de cnae_fit_score.py), para rodar a classificação offline
+    stats:    CNPJs, blobs, bytes comprimidos/originais e vencidos
+    gc:       remove entradas vencidas (--purge-stale) e blobs sem referência
+
+Uso:
+    python scripts/cnpj_store.py prefetch empresas.csv --store .cnpj_store.sqlite --misses faltando.txt
+    python scripts/cnpj_store.py prefetch empresas.csv --store .cnpj_store.sqlite --fetch --rate 3
+
+    # Contra um mock local da BrasilAPI (testes, sem rede)
+    python scripts/cnpj_store.py prefetch empresas.csv --fetch --base-url http://127.0.0.1:8000/api/cnpj/v1
+
+    # Classificação offline a partir do store
+    python scripts/cnpj_store.py export empresas.csv --output receita.ndjson
+    python scripts/cnae_company_sector.py receita.ndjson --output setores.csv
+    python scripts/cnpj_store.py export empresas.csv --format csv --output receita.csv
+    python scripts/cnae_fit_score.py receita.csv --icp icp.json --output scores.csv
+
+    from cnpj_store import CnpjStore
+    with CnpjStore('.cnpj_store.sqlite') as store:
+        found = store.get_many(['00.163.083/0001-30', '83630053000113'])
+
+Requisitos:
+    - numpy (validação dos CNPJs em cnpj_vectorized.py): pip install numpy
+    - Para --fetch: httpx (pip install httpx)
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import zlib
+import sqlite3
+import asyncio
+import hashlib
+import argparse
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from cnae_metrics import METRICS
+
+STORE_VERSION = 1
+DEFAULT_STORE = '.cnpj_store.sqlite'
+DEFAULT_BASE_URL = 'https://brasilapi.com.br/api/cnpj/v1'
+DEFAULT_MAX_AGE_DAYS = 30.0
+DEFAULT_NEGATIVE_MAX_AGE_DAYS = 1.0
+DEFAULT_RATE = 3.0  # req/s, como RATE_LIMIT_DELAY (333 ms) da Edge Function
+DEFAULT_CONCURRENCY = 4
+SQLITE_MAX_PARAMS = 900
+DAY = 86400
+
+# Dicionário do zlib: campos e valores frequentes das respostas da BrasilAPI no
+# JSON canônico. Respostas têm ~1-3 KB e compressão isolada aproveita pouco sem ele.
+# Mudou o dicionário? Suba o CODEC (blobs antigos continuam lidos pelo codec gravado).
+ZDICT_V1 = (
+    '"identificador_de_socio":"nome_socio":"cnpj_cpf_do_socio":"codigo_qualificacao_socio":'
+    '"percentual_capital_social":"data_entrada_sociedade":"cpf_representante_legal":'
+    '"nome_representante_legal":"codigo_qualificacao_representante_legal":"faixa_etaria":'
+    '"qualificacao_socio":"qualificacao_representante_legal":"codigo_pais":"pais":'
+    '"cnaes_secundarios":[{"codigo":"descricao":"qsa":[{"bairro":"capital_social":"cep":'
+    '"cnae_fiscal":"cnae_fiscal_descricao":"codigo_municipio":"codigo_municipio_ibge":'
+    '"codigo_natureza_juridica":"codigo_porte":"complemento":"data_exclusao_do_simples":null,'
+    '"data_inicio_atividade":"data_opcao_pelo_simples":null,"data_situacao_cadastral":'
+    '"data_situacao_especial":null,"ddd_fax":"","ddd_telefone_1":"ddd_telefone_2":"",'
+    '"descricao_identificador_matriz_filial":"MATRIZ","descricao_motivo_situacao_cadastral":'
+    '"SEM MOTIVO","descricao_porte":"descricao_situacao_cadastral":"ATIVA",'
+    '"descricao_tipo_de_logradouro":"RUA","email":null,"ente_federativo_responsavel":"",'
+    '"identificador_matriz_filial":1,"logradouro":"motivo_situacao_cadastral":0,"municipio":'
+    '"natureza_juridica":"Sociedade Empresária Limitada","nome_cidade_no_exterior":"",'
+    '"nome_fantasia":"numero":"opcao_pelo_mei":false,"opcao_pelo_simples":false,'
+    '"porte":"DEMAIS","qualificacao_do_responsavel":49,"razao_social":"regime_tributario":[],'
+    '"situacao_cadastral":2,"situacao_especial":"","uf":"SP","cnpj":"'
+).encode('utf-8')
+CODECS = {'zlib-v1': ZDICT_V1}
+CODEC = 'zlib-v1'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cnpj_index (
+    cnpj TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    digest TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cnpj_index_digest ON cnpj_index(digest);
+"""
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+
+
+def normalize_cnpj(value) -> Optional[str]:
+    """
+    CNPJ com 14 caracteres (zeros à esquerda restaurados nos numéricos; o
+    alfanumérico precisa vir completo) ou None se não couber. Não confere os
+    DVs: isso é feito na leitura dos arquivos (cnpj_vectorized)
+    """
+    if value is None:
+        return None
+    code = _NON_ALNUM.sub('', str(value).upper())
+    if not code or len(code) > 14:
+        return None
+    if code.isdigit():
+        return code.zfill(14)
+    return code if len(code) == 14 else None
+
+
+def canonical_json(payload) -> bytes:
+    """Serialização canônica (chaves ordenadas, sem espaços): base do digest"""
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def compress(raw: bytes, codec: str = CODEC) -> bytes:
+    compressor = zlib.compressobj(9, zdict=CODECS[codec])
+    return compressor.compress(raw) + compressor.flush()
+
+
+def decompress(body: bytes, codec: str) -> bytes:
+    decompressor = zlib.decompressobj(zdict=CODECS[codec])
+    return decompressor.decompress(body) + decompressor.flush()
+
+
+class StalenessPolicy(NamedTuple):
+    """Segundos de validade de respostas (200) e de ausências (404)"""
+    max_age: float = DEFAULT_MAX_AGE_DAYS * DAY
+    negative_max_age: float = DEFAULT_NEGATIVE_MAX_AGE_DAYS * DAY
+
+    def is_fresh(self, status: int, fetched_at: float, now: Optional[float] = None) -> bool:
+        age = (now or time.time()) - fetched_at
+        return age < (self.max_age if status == 200 else self.negative_max_age)
+
+
+class StoreEntry(NamedTuple):
+    cnpj: str
+    status: int
+    digest: Optional[str]
+    fetched_at: float
+    fresh: bool
+    payload: Optional[dict]
+
+
+class CnpjStore:
+    """Store SQLite de respostas por CNPJ, com corpo comprimido e deduplicado por SHA-256"""
+
+    def __init__(self, path: str = DEFAULT_STORE, policy: StalenessPolicy = StalenessPolicy()):
+        self.path = path
+        self.policy = policy
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self) -> 'CnpjStore':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _rows(self, cnpjs: List[str], with_body: bool) -> Iterator[tuple]:
+        columns = "i.cnpj, i.status, i.digest, i.fetched_at" + (", b.codec, b.body" if with_body else "")
+        for start in range(0, len(cnpjs), SQLITE_MAX_PARAMS):
+            chunk = cnpjs[start:start + SQLITE_MAX_PARAMS]
+            yield from self.conn.execute(
+                f"SELECT {columns} FROM cnpj_index i LEFT JOIN blobs b ON b.digest = i.digest "
+                f"WHERE i.version = ? AND i.cnpj IN ({','.join('?' * len(chunk))})",
+                [STORE_VERSION, *chunk])
+
+    def get_many(self, cnpjs: Iterable[str], include_stale: bool = False,
+                 with_payload: bool = True) -> Dict[str, StoreEntry]:
+        """
+        Entradas dos CNPJs (normalizados aqui) em consultas de até 900 chaves.
+        Vencidas ficam de fora, a não ser com include_stale.
+        """
+        keys = sorted({cnpj for cnpj in map(normalize_cnpj, cnpjs) if cnpj})
+        now = time.time()
+        found: Dict[str, StoreEntry] = {}
+        for row in self._rows(keys, with_payload):
+            cnpj, status, digest, fetched_at = row[:4]
+            fresh = self.policy.is_fresh(status, fetched_at, now)
+            if not fresh and not include_stale:
+                continue
+            payload = None
+            if with_payload and row[5] is not None:
+                payload = json.loads(decompress(row[5], row[4]))
+            found[cnpj] = StoreEntry(cnpj, status, digest, fetched_at, fresh, payload)
+        return found
+
+    def get(self, cnpj: str, include_stale: bool = False) -> Optional[StoreEntry]:
+        normalized = normalize_cnpj(cnpj)
+        return self.get_many([normalized], include_stale).get(normalized) if normalized else None
+
+    def misses(self, cnpjs: Iterable[str]) -> List[str]:
+        """CNPJs normalizados sem entrada válida no store (na ordem de entrada, sem repetição)"""
+        keys = list(dict.fromkeys(cnpj for cnpj in map(normalize_cnpj, cnpjs) if cnpj))
+        fresh = self.get_many(keys, with_payload=False)
+        return [cnpj for cnpj in keys if cnpj not in fresh]
+
+    def put_many(self, responses: Iterable[Tuple[str, int, Optional[dict]]],
+                 fetched_at: Optional[float] = None) -> int:
+        """Grava (cnpj, status, payload) em uma transação; payload None para 404. Retorna blobs novos"""
+        fetched_at = fetched_at or time.time()
+        blobs = {}
+        index = []
+        for cnpj, status, payload in responses:
+            normalized = normalize_cnpj(cnpj)
+            if normalized is None:
+                continue
+            digest = None
+            if payload is not None:
+                raw = canonical_json(payload)
+                digest = hashlib.sha256(raw).hexdigest()
+                blobs.setdefault(digest, raw)
+            index.append((normalized, STORE_VERSION, status, digest, fetched_at))
+        with self.conn:
+            existing = set()
+            digests = list(blobs)
+            for start in range(0, len(digests), SQLITE_MAX_PARAMS):
+                chunk = digests[start:start + SQLITE_MAX_PARAMS]
+                existing.update(row[0] for row in self.conn.execute(
+                    f"SELECT digest FROM blobs WHERE digest IN ({','.join('?' * len(chunk))})", chunk))
+            new = []
+            for digest, raw in blobs.items():
+                if digest not in existing:
+                    body = compress(raw)
+                    new.append((digest, CODEC, len(raw), len(body), body))
+            self.conn.executemany(
+                "INSERT INTO blobs (digest, codec, raw_bytes, size_bytes, body) VALUES (?, ?, ?, ?, ?)", new)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO cnpj_index (cnpj, version, status, digest, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                index)
+        return len(new)
+
+    def put(self, cnpj: str, payload: Optional[dict], status: int = 200):
+        self.put_many([(cnpj, status, payload)])
+
+    def gc(self, purge_stale: bool = False) -> Tuple[int, int]:
+        """Remove entradas vencidas (opcional) e blobs sem referência; retorna (entradas, blobs)"""
+        entries = 0
+        with self.conn:
+            if purge_stale:
+                now = time.time()
+                entries = self.conn.execute(
+                    "DELETE FROM cnpj_index WHERE (status = 200 AND fetched_at < ?) "
+                    "OR (status <> 200 AND fetched_at < ?)",
+                    (now - self.policy.max_age, now - self.policy.negative_max_age)).rowcount
+            blobs = self.conn.execute(
+                "DELETE FROM blobs WHERE digest NOT IN (SELECT digest FROM cnpj_index WHERE digest IS NOT NULL)"
+            ).rowcount
+        return entries, blobs
+
+    def stats(self) -> dict:
+        now = time.time()
+        cnpjs, negative, stale = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(status <> 200), 0), "
+            "COALESCE(SUM((status = 200 AND fetched_at < ?) OR (status <> 200 AND fetched_at < ?)), 0) "
+            "FROM cnpj_index", (now - self.policy.max_age, now - self.policy.negative_max_age)).fetchone()
+        blobs, raw_bytes, size_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(size_bytes), 0) FROM blobs").fetchone()
+        return {'cnpjs': cnpjs, 'not_found': negative, 'stale': stale, 'blobs': blobs,
+                'raw_bytes': raw_bytes, 'stored_bytes': size_bytes}
+
+
+def read_cnpjs(path: str, column: str = 'cnpj', batch_size: int = 100000) -> Tuple[List[str], int]:
+    """
+    CNPJs normalizados e deduplicados do CSV (ou '-'), na ordem do arquivo, e
+    quantos eram inválidos. A validação (DVs incluídos) é feita em lote por
+    cnpj_vectorized, antes de qualquer consulta ao store ou à API
+    """
+    from cnpj_vectorized import normalize_cnpj_array
+
+    source = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8-sig', newline='')
+    seen: Dict[str, None] = {}
+    invalid = 0
+
+    def flush(values):
+        nonlocal invalid
+        cols = normalize_cnpj_array(values)
+        invalid += len(values) - int(cols.valid.sum())
+        for cnpj in cols.normalized[cols.valid]:
+            seen[cnpj.decode('ascii')] = None
+
+    try:
+        reader = csv.DictReader(source)
+        if reader.fieldnames is None or column not in reader.fieldnames:
+            raise ValueError(f"coluna '{column}' não encontrada em {path}")
+        batch = []
+        for row in reader:
+            batch.append(row[column])
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return list(seen), invalid
+
+
+class RateLimiter:
+    """Intervalo mínimo entre o início de requisições (compartilhado pelas tarefas)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def fetch_many(cnpjs: List[str], base_url: str, concurrency: int = DEFAULT_CONCURRENCY,
+                     rate: float = DEFAULT_RATE, max_retries: int = 5,
+                     on_response=None) -> Dict[str, int]:
+    """
+    Busca os CNPJs em base_url/{cnpj}; chama on_response(cnpj, status, payload)
+    para 200 e 404. Retorna a contagem por resultado.
+    """
+    try:
+        import httpx
+    except ImportError:
+        print("❌ Erro: httpx não instalado. Execute: pip install httpx", file=sys.stderr)
+        sys.exit(1)
+    from cnae_async_upsert import RETRYABLE_STATUS, backoff_delay
+
+    counts = {'ok': 0, 'not_found': 0, 'failed': 0}
+    limiter = RateLimiter(rate)
+    queue: asyncio.Queue = asyncio.Queue()
+    for cnpj in cnpjs:
+        queue.put_nowait(cnpj)
+
+    async with httpx.AsyncClient(base_url=base_url.rstrip('/') + '/', timeout=httpx.Timeout(30.0),
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def fetch(cnpj: str):
+            for attempt in range(max_retries + 1):
+                await limiter.wait()
+                start = time.perf_counter()
+                try:
+                    response = await client.get(cnpj)
+                except httpx.HTTPError:
+                    if attempt == max_retries:
+                        raise
+                    METRICS.retry('network')
+                    await asyncio.sleep(backoff_delay(attempt))
+                    continue
+                METRICS.observe('network', time.perf_counter() - start, rows=1, bytes=len(response.content))
+                if response.status_code == 200:
+                    return 200, response.json()
+                if response.status_code == 404:
+                    return 404, None
+                if response.status_code in RETRYABLE_STATUS and attempt < max_retries:
+                    METRICS.retry('network')
+                    await asyncio.sleep(backoff_delay(attempt, retry_after=response.headers.get('retry-after')))
+                    continue
+                raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+            raise RuntimeError("número máximo de tentativas excedido")
+
+        async def worker():
+            while not queue.empty():
+                cnpj = queue.get_nowait()
+                try:
+                    status, payload = await fetch(cnpj)
+                except Exception as e:
+                    counts['failed'] += 1
+                    print(f"⚠️  {cnpj}: {e}", file=sys.stderr)
+                    continue
+                counts['ok' if status == 200 else 'not_found'] += 1
+                if on_response is not None:
+                    on_response(cnpj, status, payload)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return counts
+
+
+def prefetch(store: CnpjStore, input_file: str, column: str = 'cnpj', misses_file: Optional[str] = None,
+             fetch: bool = False, base_url: str = DEFAULT_BASE_URL, concurrency: int = DEFAULT_CONCURRENCY,
+             rate: float = DEFAULT_RATE, flush_every: int = 500) -> dict:
+    """Deduplica o CSV contra o store, lista as faltas e (com fetch) busca e grava só elas"""
+    cnpjs, invalid = read_cnpjs(input_file, column)
+    misses = store.misses(cnpjs)
+    print(f"📊 {len(cnpjs)} CNPJs únicos ({invalid} inválidos): "
+          f"{len(cnpjs) - len(misses)} no store, {len(misses)} faltando", file=sys.stderr)
+    if misses_file:
+        with open(misses_file, 'w', encoding='utf-8') as f:
+            f.writelines(cnpj + '\n' for cnpj in misses)
+        print(f"📋 Faltas: {misses_file}", file=sys.stderr)
+
+    result = {'unique': len(cnpjs), 'invalid': invalid, 'hits': len(cnpjs) - len(misses), 'misses': len(misses)}
+    if not fetch or not misses:
+        return result
+
+    pending: List[Tuple[str, int, Optional[dict]]] = []
+
+    def on_response(cnpj: str, status: int, payload: Optional[dict]):
+        pending.append((cnpj, status, payload))
+        if len(pending) >= flush_every:
+            store.put_many(pending)
+            pending.clear()
+
+    start = time.perf_counter()
+    counts = asyncio.run(fetch_many(misses, base_url, concurrency, rate, on_response=on_response))
+    if pending:
+        store.put_many(pending)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Buscados: {counts['ok']} | não encontrados: {counts['not_found']} | falhas: {counts['failed']}",
+          file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({len(misses) / elapsed if elapsed > 0 else 0:.1f} req/s)", file=sys.stderr)
+    result.update(counts)
+    return result
+
+
+# Campos da resposta exportados com --format csv (entrada de cnae_fit_score.py)
+EXPORT_CSV_COLUMNS = ['cnpj', 'razao_social', 'nome_fantasia', 'cnae_fiscal', 'uf', 'municipio', 'capital_social']
+
+
+def export_responses(store: CnpjStore, input_file: str, output, column: str = 'cnpj',
+                     include_stale: bool = False, fmt: str = 'ndjson') -> Tuple[int, int]:
+    """
+    Grava as respostas guardadas dos CNPJs do CSV como NDJSON (resposta inteira)
+    ou CSV (EXPORT_CSV_COLUMNS); retorna (gravadas, faltando)
+    """
+    cnpjs, _ = read_cnpjs(input_file, column)
+    found = store.get_many(cnpjs, include_stale)
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(output, EXPORT_CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+    written = 0
+    for cnpj in cnpjs:
+        entry = found.get(cnpj)
+        if entry is None or entry.payload is None:
+            continue
+        if writer is not None:
+            writer.writerow({**{name: entry.payload.get(name, '') for name in EXPORT_CSV_COLUMNS}, 'cnpj': cnpj})
+        else:
+            output.write(json.dumps(entry.payload, ensure_ascii=False) + '\n')
+        written += 1
+    return written, len(cnpjs) - len(found)
+
+
+def add_store_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--store', default=DEFAULT_STORE, help=f'Arquivo SQLite do store (padrão: {DEFAULT_STORE})')
+    parser.add_argument('--max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help=f'Validade das respostas em dias (padrão: {DEFAULT_MAX_AGE_DAYS:g})')
+    parser.add_argument('--negative-max-age-days', type=float, default=DEFAULT_NEGATIVE_MAX_AGE_DAYS,
+                        help=f'Validade de CNPJs não encontrados (404) em dias (padrão: {DEFAULT_NEGATIVE_MAX_AGE_DAYS:g})')
+
+
+def open_store_from_args(args) -> CnpjStore:
+    return CnpjStore(args.store, StalenessPolicy(args.max_age_days * DAY, args.negative_max_age_days * DAY))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store local de respostas da Receita/BrasilAPI por CNPJ')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    prefetch_parser = commands.add_parser('prefetch', help='Listar (e buscar) só os CNPJs do CSV que faltam no store')
+    prefetch_parser.add_argument('input_file', help="CSV com a coluna de CNPJ ('-' para stdin)")
+    prefetch_parser.add_argument('--column', default='cnpj', help='Coluna do CNPJ (padrão: cnpj)')
+    prefetch_parser.add_argument('--misses', help='Gravar os CNPJs que faltam neste arquivo (um por linha)')
+    prefetch_parser.add_argument('--fetch', action='store_true', help='Buscar as faltas e gravar no store')
+    prefetch_parser.add_argument('--base-url', default=os.getenv('BRASILAPI_CNPJ_URL', DEFAULT_BASE_URL),
+                                 help='URL base da API de CNPJ (padrão: BRASILAPI_CNPJ_URL ou BrasilAPI)')
+    prefetch_parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                                 help=f'Requisições em voo (padrão: {DEFAULT_CONCURRENCY})')
+    prefetch_parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                                 help=f'Máximo de requisições por segundo, 0 = sem limite (padrão: {DEFAULT_RATE:g})')
+    add_store_arguments(prefetch_parser)
+
+    export_parser = commands.add_parser('export', help='NDJSON das respostas guardadas para os CNPJs do CSV')
+    export_parser.add_argument('input_file', help="CSV com a coluna de CNPJ ('-' para stdin)")
+    export_parser.add_argument('--column', default='cnpj', help='Coluna do CNPJ (padrão: cnpj)')
+    export_parser.add_argument('--output', help='Arquivo de saída (padrão: stdout)')
+    export_parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson',
+                               help='ndjson (resposta inteira, para cnae_company_sector.py) ou csv '
+                                    '(campos da Receita, para cnae_fit_score.py); padrão: ndjson')
+    export_parser.add_argument('--include-stale', action='store_true', help='Incluir respostas vencidas')
+    add_store_arguments(export_parser)
+
+    stats_parser = commands.add_parser('stats', help='Resumo do store')
+    add_store_arguments(stats_parser)
+
+    gc_parser = commands.add_parser('gc', help='Remover blobs sem referência')
+    gc_parser.add_argument('--purge-stale', action='store_true', help='Remover também as entradas vencidas')
+    add_store_arguments(gc_parser)
+
+    args = parser.parse_args()
+
+    try:
+        with open_store_from_args(args) as store:
+            if args.command == 'prefetch':
+                result = prefetch(store, args.input_file, args.column, args.misses, args.fetch,
+                                  args.base_url, args.concurrency, args.rate)
+                if result.get('failed'):
+                    sys.exit(1)
+            elif args.command == 'export':
+                output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+                try:
+                    written, missing = export_responses(store, args.input_file, output, args.column,
+                                                        args.include_stale, args.format)
+                finally:
+                    if args.output:
+                        output.close()
+                print(f"✅ {written} respostas exportadas ({missing} CNPJs sem resposta no store)", file=sys.stderr)
+            elif args.command == 'stats':
+                stats = store.stats()
+                ratio = stats['raw_bytes'] / stats['stored_bytes'] if stats['stored_bytes'] else 0
+                print(f"📦 {stats['cnpjs']} CNPJs ({stats['not_found']} não encontrados, {stats['stale']} vencidos), "
+                      f"{stats['blobs']} blobs", file=sys.stderr)
+                print(f"   {stats['stored_bytes']} bytes guardados de {stats['raw_bytes']} ({ratio:.1f}x)",
+                      file=sys.stderr)
+            else:
+                entries, blobs = store.gc(args.purge_stale)
+                print(f"🗑️  {entries} entradas vencidas e {blobs} blobs removidos", file=sys.stderr)
+    except ValueError as e:
+        print(f"❌ Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
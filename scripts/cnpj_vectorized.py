@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Normalização, validação e deduplicação vetorizada de CNPJs (NumPy)
+
+Os uploads em massa (bulk-upload-companies, mc9-import-csv,
+upload-leads-csv) recebem CNPJs com ou sem pontuação e com os zeros à
+esquerda perdidos pelo Excel ('163083000130'). CNPJs inválidos só falham
+depois de uma chamada de enriquecimento. Este kernel trata um lote inteiro
+em uma passada sobre uma matriz de bytes (uma linha por CNPJ):
+
+    - remove pontuação ('.', '/', '-', espaços) e converte para maiúsculas
+    - completa com zeros à esquerda códigos só numéricos com menos de 14 dígitos
+    - valida os dois dígitos verificadores (módulo 11, pesos 2-9) e recusa
+      sequências repetidas (00000000000000, 11111111111111, ...)
+    - aceita o CNPJ alfanumérico (12 primeiros caracteres [0-9A-Z], valor
+      ASCII - 48 no cálculo, DVs numéricos); o numérico é o caso particular
+    - dedup no array: chave int64 (raiz de 12 caracteres em base 36; os DVs
+      são determinados por ela), primeira ocorrência vence
+
+Motivos de rejeição (reason): vazio, caractere_invalido, tamanho,
+sequencia_repetida, digito_verificador.
+
+Em arquivo, o CSV é lido em lotes e cada linha vai para uma de três saídas
+(mesmas colunas da entrada, cnpj já normalizado nas válidas):
+    - limpo:      CNPJ válido, primeira ocorrência
+    - rejeitados: + colunas linha e motivo
+    - duplicados: + colunas linha e primeira_linha
+
+Uso:
+    from cnpj_vectorized import normalize_cnpj_array
+    cols = normalize_cnpj_array(['00.163.083/0001-30', '163083000130', '12345678000100'])
+    cols.normalized  # array([b'00163083000130', b'00163083000130', b'12345678000100'])
+    cols.valid       # array([ True,  True, False])
+
+    python scripts/cnpj_vectorized.py scripts/test-10-companies.csv --clean limpo.csv \\
+        --rejected rejeitados.csv --duplicates duplicados.csv
+    python scripts/cnpj_vectorized.py --benchmark 10000000
+
+Requisitos:
+    - numpy: pip install numpy
+    - Para arquivos CSV: pandas (pip install pandas)
+"""
+
+import sys
+import time
+import argparse
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    print("❌ Erro: numpy não instalado. Execute: pip install numpy", file=sys.stderr)
+    sys.exit(1)
+
+from cnae_vectorized import _as_byte_matrix, _compact
+
+CNPJ_LEN = 14
+ROOT_LEN = 12
+# Pesos do módulo 11 (1º DV sobre 12 caracteres, 2º DV sobre 13)
+DV1_WEIGHTS = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int64)
+DV2_WEIGHTS = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int64)
+
+REJECT_REASONS = {
+    'vazio': 'CNPJ ausente',
+    'caractere_invalido': 'caractere fora de [0-9A-Z] e da pontuação . / - espaço',
+    'tamanho': 'mais de 14 caracteres, ou alfanumérico com menos de 14',
+    'sequencia_repetida': 'todos os caracteres iguais (ex: 00000000000000)',
+    'digito_verificador': 'dígitos verificadores não conferem',
+}
+# Código numérico de cada motivo no array `reason` (0 = válido)
+REASON_CODES = ['', *REJECT_REASONS]
+
+_DOT, _SLASH, _DASH, _SPACE = ord('.'), ord('/'), ord('-'), ord(' ')
+_ZERO, _UPPER_A, _LOWER_A = ord('0'), ord('A'), ord('a')
+
+
+class CnpjColumns(NamedTuple):
+    normalized: 'np.ndarray'  # S14 (object com o texto sem pontuação se houver caractere/tamanho inválido)
+    keys: 'np.ndarray'        # int64, -1 quando inválido
+    valid: 'np.ndarray'       # bool
+    reason: 'np.ndarray'      # uint8, índice em REASON_CODES
+
+
+def check_digits(root: str) -> str:
+    """Os dois DVs de uma raiz de 12 caracteres (escalar, para conferência)"""
+    values = [ord(ch) - _ZERO for ch in root.upper()]
+    digits = ''
+    for weights in (DV1_WEIGHTS, DV2_WEIGHTS):
+        remainder = sum(int(w) * v for w, v in zip(weights, values)) % 11
+        digit = 0 if remainder < 2 else 11 - remainder
+        digits += str(digit)
+        values.append(digit)
+    return digits
+
+
+def normalize_cnpj_array(values: Sequence) -> CnpjColumns:
+    """Normaliza e valida um array de CNPJs (sem deduplicar)"""
+    matrix, non_ascii = _as_byte_matrix(values)
+    n, width = matrix.shape
+    columns = matrix.T.copy()  # a matriz vem de frombuffer (somente leitura)
+
+    # Pontuação sai; minúsculas viram maiúsculas
+    removed = (columns == _DOT) | (columns == _SLASH) | (columns == _DASH) | (columns == _SPACE)
+    dirty_rows = np.flatnonzero(removed.any(axis=0))
+    if len(dirty_rows):
+        columns[:, dirty_rows] = _compact(columns.take(dirty_rows, axis=1), ~removed.take(dirty_rows, axis=1))
+    lower = (columns - np.uint8(_LOWER_A)) < 26
+    columns[lower] -= 32
+
+    is_digit = (columns - np.uint8(_ZERO)) < 10
+    is_letter = (columns - np.uint8(_UPPER_A)) < 26
+    filled = columns != 0
+    length = filled.sum(axis=0)
+    bad_char = ((filled & ~is_digit & ~is_letter).any(axis=0)) | non_ascii
+    numeric = ~(filled & is_letter).any(axis=0)
+
+    reason = np.zeros(n, dtype=np.uint8)
+    code = {name: np.uint8(i) for i, name in enumerate(REASON_CODES)}
+    reason[length == 0] = code['vazio']
+    reason[(reason == 0) & bad_char] = code['caractere_invalido']
+    reason[(reason == 0) & ((length > CNPJ_LEN) | (~numeric & (length < CNPJ_LEN)))] = code['tamanho']
+
+    # (14, n) alinhada à direita: zeros à esquerda para os numéricos curtos.
+    # Linhas recusadas acima ficam com lixo aqui, mas já têm motivo
+    ok = reason == 0
+    fixed = np.full((CNPJ_LEN, n), _ZERO, dtype=np.uint8)
+    take = min(width, CNPJ_LEN)
+    fixed[:take] = columns[:take]
+    short = np.flatnonzero(ok & (length < CNPJ_LEN))
+    shifts = CNPJ_LEN - length[short]
+    for shift in np.unique(shifts):
+        rows = short[shifts == shift]
+        fixed[:, rows] = _ZERO
+        fixed[shift:, rows] = columns[:CNPJ_LEN - shift].take(rows, axis=1)
+
+    # Somas ponderadas dos DVs e chave base 36 da raiz, uma coluna por vez
+    sum1 = np.zeros(n, dtype=np.int32)
+    sum2 = np.zeros(n, dtype=np.int32)
+    keys = np.zeros(n, dtype=np.int64)
+    repeated = np.ones(n, dtype=bool)
+    for j in range(ROOT_LEN):
+        value = (fixed[j] - np.uint8(_ZERO)).astype(np.int32)  # 0-9, A-Z = 17-42
+        sum1 += int(DV1_WEIGHTS[j]) * value
+        sum2 += int(DV2_WEIGHTS[j]) * value
+        keys *= 36
+        keys += value - 7 * (value >= 17)
+        repeated &= fixed[j] == fixed[0]
+    dv1 = sum1 % 11
+    dv1 = np.where(dv1 < 2, 0, 11 - dv1)
+    dv2 = (sum2 + int(DV2_WEIGHTS[ROOT_LEN]) * dv1) % 11
+    dv2 = np.where(dv2 < 2, 0, 11 - dv2)
+    repeated &= (fixed[ROOT_LEN] == fixed[0]) & (fixed[ROOT_LEN + 1] == fixed[0])
+    # DVs são 0-9: letras ou bytes fora de '0'-'9' nunca conferem
+    dv_ok = ((fixed[ROOT_LEN] - np.uint8(_ZERO)) == dv1) & ((fixed[ROOT_LEN + 1] - np.uint8(_ZERO)) == dv2)
+    reason[ok & repeated] = code['sequencia_repetida']
+    reason[(reason == 0) & ~dv_ok] = code['digito_verificador']
+
+    valid = reason == 0
+    normalized = np.ascontiguousarray(fixed.T).view(f'S{CNPJ_LEN}').reshape(n)
+    normalized[reason == code['vazio']] = b''
+    # Sem forma de 14 caracteres: devolve o texto sem pontuação (para o relatório)
+    unshaped = (reason == code['caractere_invalido']) | (reason == code['tamanho'])
+    if unshaped.any():
+        stripped = np.ascontiguousarray(columns.T).view(f'S{width}').reshape(n)
+        normalized = normalized.astype(object)
+        normalized[unshaped] = stripped[unshaped]
+    keys[~valid] = -1
+    return CnpjColumns(normalized, keys, valid, reason)
+
+
+def first_occurrence(keys: 'np.ndarray', valid: 'np.ndarray', seen=None, offset: int = 0):
+    """
+    Deduplica um lote: retorna a máscara de duplicados, a posição da primeira
+    ocorrência de cada válido (offset + índice no lote, -1 nos inválidos) e o
+    novo `seen` (chaves ordenadas, posições) para o próximo lote
+    """
+    n = len(keys)
+    first = np.full(n, -1, dtype=np.int64)
+    rows = np.flatnonzero(valid)
+    unique, first_pos, inverse = np.unique(keys[rows], return_index=True, return_inverse=True)
+    unique_first = rows[first_pos] + offset
+
+    if seen is not None and len(seen[0]):
+        seen_keys, seen_first = seen
+        position = np.searchsorted(seen_keys, unique)
+        position[position == len(seen_keys)] = 0
+        earlier = seen_keys[position] == unique
+        unique_first[earlier] = seen_first[position[earlier]]
+        new = ~earlier
+        merged_keys = np.concatenate([seen_keys, unique[new]])
+        order = np.argsort(merged_keys, kind='stable')
+        seen = (merged_keys[order], np.concatenate([seen_first, unique_first[new]])[order])
+    else:
+        seen = (unique, unique_first)
+
+    first[rows] = unique_first[inverse]
+    duplicate = np.zeros(n, dtype=bool)
+    duplicate[rows] = first[rows] != rows + offset
+    return duplicate, first, seen
+
+
+def iter_csv_batches(input_file: str, batch_size: int) -> Iterator:
+    try:
+        import pandas as pd
+    except ImportError:
+        print("❌ Erro: pandas não instalado. Execute: pip install pandas", file=sys.stderr)
+        sys.exit(1)
+    source = sys.stdin if input_file == '-' else input_file
+    yield from pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=batch_size)
+
+
+class _CsvOutput:
+    """Saída CSV por lotes: pyarrow (CSVWriter) quando disponível, senão DataFrame.to_csv"""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow.csv as pa_csv
+        except ImportError:
+            pa_csv = None
+        self._pa_csv = pa_csv
+        self._writer = None
+        self._header = True
+        self._file = open(path, 'wb') if pa_csv else open(path, 'w', encoding='utf-8', newline='')
+
+    def write(self, frame):
+        if self._pa_csv is None:
+            frame.to_csv(self._file, index=False, header=self._header)
+            self._header = False
+            return
+        import pyarrow as pa
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            options = self._pa_csv.WriteOptions(quoting_style='needed')
+            self._writer = self._pa_csv.CSVWriter(self._file, table.schema, write_options=options)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._file.close()
+
+
+class CsvSplitResult(NamedTuple):
+    total: int
+    clean: int
+    rejected: int
+    duplicates: int
+    reasons: dict
+
+
+def split_csv(input_file: str, column: str = 'cnpj', clean_file: Optional[str] = None,
+              rejected_file: Optional[str] = None, duplicates_file: Optional[str] = None,
+              batch_size: int = 500000) -> CsvSplitResult:
+    """Separa o CSV em limpo / rejeitados / duplicados, lote a lote"""
+    outputs = {name: _CsvOutput(path) if path else None
+               for name, path in (('clean', clean_file), ('rejected', rejected_file),
+                                  ('duplicates', duplicates_file))}
+    written = set()
+    seen = None
+    line = 2  # linha 1 é o cabeçalho
+    total = clean = rejected = duplicates = 0
+    reasons = {name: 0 for name in REJECT_REASONS}
+    try:
+        for batch in iter_csv_batches(input_file, batch_size):
+            if column not in batch.columns:
+                raise ValueError(f"coluna '{column}' não encontrada em {input_file}")
+            cols = normalize_cnpj_array(batch[column].to_numpy())
+            duplicate, first, seen = first_occurrence(cols.keys, cols.valid, seen, offset=line)
+            lines = np.arange(line, line + len(batch))
+            keep = cols.valid & ~duplicate
+
+            total += len(batch)
+            clean += int(keep.sum())
+            rejected += int((~cols.valid).sum())
+            duplicates += int(duplicate.sum())
+            for i, count in enumerate(np.bincount(cols.reason, minlength=len(REASON_CODES))[1:], start=1):
+                reasons[REASON_CODES[i]] += int(count)
+
+            batch = batch.copy()
+            batch[column] = [value.decode('ascii', 'replace') for value in cols.normalized]
+            parts = {
+                'clean': batch[keep],
+                'rejected': batch[~cols.valid].assign(
+                    linha=lines[~cols.valid],
+                    motivo=np.array(REASON_CODES, dtype=object)[cols.reason[~cols.valid]]),
+                'duplicates': batch[duplicate].assign(
+                    linha=lines[duplicate],
+                    primeira_linha=first[duplicate]),
+            }
+            for name, output in outputs.items():
+                # O primeiro lote grava o cabeçalho mesmo sem linhas
+                if output is not None and (name not in written or len(parts[name])):
+                    output.write(parts[name])
+                    written.add(name)
+            line += len(batch)
+    finally:
+        for output in outputs.values():
+            if output is not None:
+                output.close()
+    return CsvSplitResult(total, clean, rejected, duplicates, reasons)
+
+
+def _synthetic_cnpjs(n: int, seed: int = 42) -> 'np.ndarray':
+    """CNPJs sintéticos: válidos, DV errado, formatados, sem zeros à esquerda e repetidos"""
+    rng = np.random.default_rng(seed)
+    roots = rng.integers(0, 10 ** 8, n // 2 + 1) * 10000 + rng.integers(1, 3, n // 2 + 1)  # filiais 0001/0002
+    digits = (roots[:, None] // 10 ** np.arange(ROOT_LEN - 1, -1, -1)) % 10
+    dv1 = (digits @ DV1_WEIGHTS) % 11
+    dv1 = np.where(dv1 < 2, 0, 11 - dv1)
+    dv2 = (digits @ DV2_WEIGHTS[:ROOT_LEN] + dv1 * DV2_WEIGHTS[ROOT_LEN]) % 11
+    dv2 = np.where(dv2 < 2, 0, 11 - dv2)
+    full = roots * 100 + dv1 * 10 + dv2
+    full[::7] += 1  # DV errado (ou 9 -> 10: tamanho/DV)
+    codes = full[rng.integers(0, len(full), n)]  # repetidos
+    text = np.char.zfill(codes.astype('U14'), CNPJ_LEN).astype('S14')
+    # Um terço no formato 00.000.000/0000-00
+    digits = np.ascontiguousarray(text[::3]).view(np.uint8).reshape(-1, CNPJ_LEN)
+    masked = np.empty((len(digits), 18), dtype=np.uint8)
+    masked[:, [2, 6]], masked[:, 10], masked[:, 15] = _DOT, _SLASH, _DASH
+    masked[:, [0, 1, 3, 4, 5, 7, 8, 9, 11, 12, 13, 14, 16, 17]] = digits
+    result = text.astype('S18')
+    result[::3] = masked.view('S18').reshape(-1)
+    result[1::5] = codes[1::5].astype('S18')  # zeros à esquerda perdidos
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Normalização, validação e dedup vetorizada de CNPJs')
+    parser.add_argument('input_file', nargs='?', default='-', help="CSV com a coluna de CNPJ ('-' para stdin)")
+    parser.add_argument('--column', default='cnpj', help='Coluna do CNPJ (padrão: cnpj)')
+    parser.add_argument('--clean', help='CSV com as linhas válidas (primeira ocorrência de cada CNPJ)')
+    parser.add_argument('--rejected', help='CSV com as linhas inválidas (+ linha, motivo)')
+    parser.add_argument('--duplicates', help='CSV com as linhas repetidas (+ linha, primeira_linha)')
+    parser.add_argument('--batch-size', type=int, default=500000, help='Linhas por lote (padrão: 500000)')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='Medir CNPJs/s com N CNPJs sintéticos')
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        values = _synthetic_cnpjs(args.benchmark)
+        start = time.perf_counter()
+        cols = normalize_cnpj_array(values)
+        duplicate, _, _ = first_occurrence(cols.keys, cols.valid)
+        elapsed = time.perf_counter() - start
+        print(f"⏱️ {len(values)} CNPJs em {elapsed:.2f}s ({len(values) / elapsed:,.0f} CNPJs/s), "
+              f"{int(cols.valid.sum())} válidos, {int(duplicate.sum())} duplicados", file=sys.stderr)
+        return
+
+    start = time.perf_counter()
+    try:
+        result = split_csv(args.input_file, args.column, args.clean, args.rejected, args.duplicates,
+                           args.batch_size)
+    except ValueError as e:
+        print(f"❌ Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {result.total} linhas: {result.clean} limpas, {result.rejected} rejeitadas, "
+          f"{result.duplicates} duplicadas", file=sys.stderr)
+    for reason, count in result.reasons.items():
+        if count:
+            print(f"   {reason:<20} {count:>8}  {REJECT_REASONS[reason]}", file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({result.total / elapsed if elapsed > 0 else 0:.0f} linhas/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Deduplicação aproximada de empresas por nome (razao_social / nome_fantasia)
+
+Uploads em massa trazem a mesma empresa com grafias diferentes
+("Transjoi Transportes Ltda." e "TRANSJOI TRANSPORTES LTDA"), e cada
+variante é enriquecida e pontuada à parte. Este índice atribui um
+cluster_id por linha sem comparar todos os pares (O(n²)):
+
+    1. Normalização do nome (normalize_company_names): sem acentos, minúsculas,
+       sem pontuação, sem a natureza jurídica (LTDA, S/A, ME, EPP, EIRELI, SLU,
+       CIA, ...) nem conectivos (de, da, e, ...), abreviações comuns expandidas
+       (Ind. -> industria, Com. -> comercio). Nomes que ficam iguais caem no
+       mesmo documento, sem custo de comparação.
+    2. MinHash sobre trigramas de caracteres de cada nome distinto (numpy,
+       --num-perm permutações) e LSH em --bands faixas: nomes só viram
+       candidatos se coincidirem em alguma faixa inteira. Dentro de cada
+       balde só se comparam vizinhos a até --window posições, então o custo
+       é linear no número de nomes mesmo com baldes grandes.
+    3. Verificação: o par só é unido se a similaridade de Jaccard estimada
+       pela assinatura inteira for >= --threshold.
+    4. Componentes conexos (linhas, nomes e CNPJs como nós) com propagação do
+       menor rótulo: a mesma empresa pode ligar por razão social, por nome
+       fantasia ou pelo mesmo CNPJ válido (cnpj_vectorized).
+
+cluster_id é o índice (0-based, ordem do arquivo) da primeira linha do
+cluster; cluster_size é o número de linhas nele. Com --scope-column (ex:
+tenant_id) só linhas do mesmo escopo são unidas; sem ele o índice vale
+entre tenants.
+
+Uso:
+    python scripts/company_dedup.py scripts/test-10-companies.csv --output clusters.csv
+    python scripts/company_dedup.py empresas.csv --scope-column tenant_id --threshold 0.8 --output clusters.csv
+    python scripts/company_dedup.py empresas_parquet/ --output clusters.parquet   # saída de cnae_company_columnar.py
+    python scripts/company_dedup.py --benchmark 1000000
+
+    from company_dedup import cluster_companies
+    result = cluster_companies(df)   # df com razao_social / nome_fantasia / cnpj
+    result.cluster_id
+
+Requisitos:
+    - pandas e numpy: pip install pandas numpy
+    - Para entrada em diretório (Parquet/Arrow) ou saída .parquet: pyarrow
+"""
+
+import os
+import sys
+import time
+import argparse
+from typing import List, NamedTuple, Optional
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    print("❌ Erro: pandas/numpy não instalados. Execute: pip install pandas numpy", file=sys.stderr)
+    sys.exit(1)
+
+from cnpj_vectorized import normalize_cnpj_array
+
+DEFAULT_COLUMNS = ['razao_social', 'nome_fantasia']
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_WINDOW = 4
+DEFAULT_MIN_LENGTH = 4
+
+# Natureza jurídica e termos societários (já sem acento, minúsculos, sem pontuação)
+LEGAL_PHRASES = [
+    'sociedade empresaria limitada', 'sociedade limitada unipessoal', 'sociedade anonima',
+    'sociedade simples', 'empresa individual de responsabilidade limitada',
+    'microempreendedor individual', 'empresa de pequeno porte', 'microempresa',
+    'em recuperacao judicial', 'em liquidacao',
+]
+LEGAL_TOKENS = ['ltda', 'limitada', 'sa', 'me', 'epp', 'eireli', 'mei', 'slu', 'ss', 'cia', 'companhia']
+STOPWORDS = ['de', 'da', 'do', 'das', 'dos', 'e']
+ABBREVIATIONS = {
+    'ind': 'industria', 'inds': 'industrias', 'com': 'comercio', 'serv': 'servicos',
+    'transp': 'transportes', 'distrib': 'distribuidora', 'adm': 'administracao',
+    'emp': 'empreendimentos', 'part': 'participacoes', 'imp': 'importacao', 'exp': 'exportacao',
+}
+
+def _words_pattern(words: List[str]) -> str:
+    return r'\b(?:' + '|'.join(sorted(words, key=len, reverse=True)) + r')\b'
+
+
+_LEGAL_PHRASES_RE = _words_pattern(LEGAL_PHRASES)
+_LEGAL_TOKENS_RE = _words_pattern(LEGAL_TOKENS)
+_STOPWORDS_RE = _words_pattern(STOPWORDS)
+_ABBREVIATIONS_RE = _words_pattern(list(ABBREVIATIONS))
+
+
+def normalize_company_names(values) -> 'pd.Series':
+    """Nome normalizado para comparação ('' quando não sobra nada)"""
+    names = pd.Series(values, dtype='string').fillna('')
+    names = names.str.normalize('NFKD').str.replace('[\u0300-\u036f]', '', regex=True).str.lower()
+    # S/A, S.A., S. A. antes de a pontuação virar espaço
+    names = names.str.replace(r'\bs\s*[./]\s*a\b\.?', ' ', regex=True)
+    names = names.str.replace(r'[^a-z0-9]+', ' ', regex=True)
+    # A substituição com função roda em Python: só nas linhas que têm abreviação
+    abbreviated = names.str.contains(_ABBREVIATIONS_RE, regex=True).to_numpy(dtype=bool)
+    if abbreviated.any():
+        names = names.astype(object)
+        names[abbreviated] = names[abbreviated].str.replace(
+            _ABBREVIATIONS_RE, lambda m: ABBREVIATIONS[m.group(0)], regex=True)
+        names = names.astype('string')
+    stripped = names.str.replace(_LEGAL_PHRASES_RE, ' ', regex=True)
+    stripped = stripped.str.replace(_STOPWORDS_RE, ' ', regex=True).str.replace(_LEGAL_TOKENS_RE, ' ', regex=True)
+    stripped = stripped.str.replace(r'\s+', ' ', regex=True).str.strip()
+    # Nome que era só natureza jurídica (ex: "ME"): mantém o texto sem remover
+    base = names.str.replace(r'\s+', ' ', regex=True).str.strip()
+    return stripped.where(stripped != '', base).astype(object)
+
+
+_NO_TRIGRAM = 1 << 24
+
+
+def _trigrams(names: 'np.ndarray'):
+    """
+    Trigramas de caracteres (' ' + nome + ' ') por nome, como inteiros de 24
+    bits (os nomes normalizados são ASCII): matriz (n, largura - 2), -1 fora
+    do nome, e quantos trigramas cada nome tem
+    """
+    padded = np.char.add(np.char.add(' ', names.astype('U')), ' ').astype('S')
+    width = max(padded.dtype.itemsize, 3)
+    matrix = np.frombuffer(np.ascontiguousarray(padded, dtype=f'S{width}').tobytes(), dtype=np.uint8)
+    matrix = matrix.reshape(len(names), width).astype(np.int32)
+    codes = (matrix[:, :-2] << 16) | (matrix[:, 1:-1] << 8) | matrix[:, 2:]
+    counts = np.maximum(np.char.str_len(padded) - 2, 0)
+    codes[np.arange(width - 2)[None, :] >= counts[:, None]] = -1
+    return codes, counts
+
+
+def minhash_signatures(names: 'np.ndarray', num_perm: int = DEFAULT_NUM_PERM, seed: int = 1) -> 'np.ndarray':
+    """
+    Assinaturas MinHash (n, num_perm) dos trigramas de cada nome. Cada
+    trigrama distinto é hasheado uma vez (multiply-shift: 32 bits altos de
+    a*x + b em 64 bits); o mínimo por nome sai de uma tabela de hashes
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+    codes, counts = _trigrams(names)
+    # Trigramas distintos por tabela direta de 2^24 posições (mais rápido que np.unique)
+    codes[codes < 0] = _NO_TRIGRAM
+    present = np.zeros(_NO_TRIGRAM + 1, dtype=bool)
+    present[codes.ravel()] = True
+    unique = np.flatnonzero(present)
+    remap = np.zeros(_NO_TRIGRAM + 1, dtype=np.int32)
+    remap[unique] = np.arange(len(unique), dtype=np.int32)
+    inverse = remap[codes]
+    with np.errstate(over='ignore'):
+        table = ((unique.astype(np.uint64)[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)).astype(np.uint32)
+    table[unique == _NO_TRIGRAM] = np.iinfo(np.uint32).max  # posições fora do nome
+
+    # Blocos de nomes de tamanho parecido: só as colunas usadas entram no gather
+    signatures = np.empty((len(names), num_perm), dtype=np.uint32)
+    order = np.argsort(counts, kind='stable')
+    block = max(1, (1 << 22) // (num_perm * max(int(counts.mean()) if len(counts) else 1, 1)))
+    for start in range(0, len(order), block):
+        rows = order[start:start + block]
+        used = max(int(counts[rows[-1]]), 1)
+        signatures[rows] = table[inverse[rows, :used]].min(axis=1)
+    return signatures
+
+
+def candidate_pairs(signatures: 'np.ndarray', bands: int = DEFAULT_BANDS, window: int = DEFAULT_WINDOW,
+                    scopes: Optional['np.ndarray'] = None) -> 'np.ndarray':
+    """Pares (i, j) que coincidem em alguma faixa do LSH, sem repetição"""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs = []
+    with np.errstate(over='ignore'):
+        for band in range(bands):
+            block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+            key = np.full(n, band, dtype=np.uint64)
+            for column in block.T:
+                key = key * np.uint64(0x9E3779B97F4A7C15) + column
+            if scopes is not None:
+                key ^= scopes.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+            order = np.argsort(key, kind='stable')
+            sorted_key = key[order]
+            for distance in range(1, window + 1):
+                same = sorted_key[distance:] == sorted_key[:-distance]
+                if same.any():
+                    pairs.append(np.stack([order[:-distance][same], order[distance:][same]], axis=1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    keys = np.sort(pairs[:, 0] * n + pairs[:, 1])
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+    return np.stack([keys // n, keys % n], axis=1)
+
+
+def connected_components(num_nodes: int, edges: 'np.ndarray') -> 'np.ndarray':
+    """Rótulo de cada nó = menor nó do componente (propagação do mínimo + pointer jumping)"""
+    labels = np.arange(num_nodes, dtype=np.int64)
+    if not len(edges):
+        return labels
+    left, right = edges[:, 0], edges[:, 1]
+    while True:
+        smallest = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, smallest)
+        np.minimum.at(updated, right, smallest)
+        updated = updated[updated]
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+class DedupResult(NamedTuple):
+    cluster_id: 'np.ndarray'    # int64, índice da primeira linha do cluster
+    cluster_size: 'np.ndarray'  # int64
+    names: int                  # nomes distintos indexados
+    candidates: int             # pares candidatos do LSH
+    matches: int                # pares acima do threshold
+
+
+def cluster_companies(frame, columns: List[str] = DEFAULT_COLUMNS, cnpj_column: Optional[str] = 'cnpj',
+                      scope_column: Optional[str] = None, threshold: float = DEFAULT_THRESHOLD,
+                      num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS,
+                      window: int = DEFAULT_WINDOW, min_length: int = DEFAULT_MIN_LENGTH) -> DedupResult:
+    """cluster_id por linha do DataFrame"""
+    if num_perm % bands:
+        raise ValueError(f"--num-perm ({num_perm}) precisa ser múltiplo de --bands ({bands})")
+    n = len(frame)
+    scope = (frame[scope_column].astype('string').fillna('').to_numpy(dtype=object)
+             if scope_column else np.full(n, '', dtype=object))
+
+    # Documentos: (coluna, escopo, nome normalizado) distintos; nós n.. no grafo
+    row_ids, doc_names, doc_groups = [], [], []
+    for column in columns:
+        if column not in frame.columns:
+            continue
+        names = normalize_company_names(frame[column]).to_numpy()
+        keep = np.flatnonzero(np.char.str_len(names.astype('U')) >= min_length)
+        row_ids.append(keep)
+        doc_names.append(names[keep])
+        doc_groups.append(column + '\x1f' + scope[keep])
+    if row_ids:
+        rows_of_docs = np.concatenate(row_ids)
+        names = np.concatenate(doc_names)
+        # Grupo = coluna + escopo: o LSH só compara nomes do mesmo grupo
+        groups = pd.factorize(np.concatenate(doc_groups))[0]
+        name_codes = pd.factorize(names)[0]
+        codes = pd.factorize(groups.astype(np.int64) * (len(names) + 1) + name_codes)[0]
+    else:
+        rows_of_docs = codes = groups = np.zeros(0, dtype=np.int64)
+        names = np.zeros(0, dtype=object)
+    num_docs = int(codes.max()) + 1 if len(codes) else 0
+    first = np.zeros(num_docs, dtype=np.int64)
+    first[codes[::-1]] = np.arange(len(codes))[::-1]
+    edges = [np.stack([rows_of_docs, n + codes], axis=1)]
+
+    # MinHash/LSH sobre os nomes distintos; só pares do mesmo grupo contam
+    candidates = matches = 0
+    if num_docs:
+        doc_group = groups[first]
+        signatures = minhash_signatures(names[first], num_perm)
+        pairs = candidate_pairs(signatures, bands, window, doc_group)
+        pairs = pairs[doc_group[pairs[:, 0]] == doc_group[pairs[:, 1]]]
+        candidates = len(pairs)
+        if candidates:
+            similarity = np.empty(candidates)
+            for start in range(0, candidates, 1 << 16):
+                part = pairs[start:start + (1 << 16)]
+                similarity[start:start + len(part)] = (signatures[part[:, 0]] == signatures[part[:, 1]]).mean(axis=1)
+            pairs = pairs[similarity >= threshold]
+        matches = len(pairs)
+        edges.append(n + pairs)
+
+    # Mesmo CNPJ válido (e mesmo escopo) = mesma empresa
+    num_cnpjs = 0
+    if cnpj_column and cnpj_column in frame.columns:
+        cnpj = normalize_cnpj_array(frame[cnpj_column].to_numpy(dtype=object))
+        valid = np.flatnonzero(cnpj.valid)
+        if len(valid):
+            # Chave inteira (escopo, CNPJ), como a dos documentos: sem concatenar strings
+            scope_codes = pd.factorize(scope[valid])[0].astype(np.int64)
+            key_codes, key_uniques = pd.factorize(cnpj.keys[valid])
+            cnpj_codes, uniques = pd.factorize(scope_codes * (len(key_uniques) + 1) + key_codes)
+            num_cnpjs = len(uniques)
+            edges.append(np.stack([valid, n + num_docs + cnpj_codes], axis=1))
+
+    labels = connected_components(n + num_docs + num_cnpjs, np.concatenate(edges).astype(np.int64))
+    cluster_id = labels[:n]
+    cluster_size = np.bincount(cluster_id, minlength=n)[cluster_id]
+    return DedupResult(cluster_id, cluster_size, num_docs, candidates, matches)
+
+
+def read_companies(path: str):
+    """CSV (ou '-') ou diretório Parquet/Arrow gravado por cnae_company_columnar.py"""
+    if os.path.isdir(path):
+        from cnae_company_columnar import open_companies
+        return open_companies(path).to_table().to_pandas()
+    return pd.read_csv(sys.stdin if path == '-' else path, dtype=str, keep_default_na=False)
+
+
+def write_clusters(frame, output: Optional[str]):
+    if output and output.lower().endswith('.parquet'):
+        frame.to_parquet(output, index=False, compression='zstd')
+    else:
+        frame.to_csv(output or sys.stdout, index=False)
+
+
+def _synthetic_companies(n: int, seed: int = 42):
+    """Nomes sintéticos com variantes (caixa, natureza jurídica, acento, erro de digitação)"""
+    rng = np.random.default_rng(seed)
+    words = np.array(['transportes', 'logistica', 'comercio', 'industria', 'alimentos', 'metalurgica',
+                      'construtora', 'servicos', 'tecnologia', 'agro', 'distribuidora', 'engenharia'])
+    bases = n // 3 + 1
+    brand = np.char.add(np.array(list('bcdfgjklmnprstvz'))[rng.integers(0, 16, (bases, 6))].astype(object).sum(axis=1)
+                        .astype('U'), rng.integers(0, 10 ** 6, bases).astype('U'))
+    base_names = np.char.add(np.char.add(brand, ' '), words[rng.integers(0, len(words), bases)])
+    pick = rng.integers(0, bases, n)
+    names = base_names[pick].astype(object)
+    suffixes = np.array([' Ltda.', ' LTDA', ' S/A', ' S.A.', ' ME', ' EIRELI', ''])
+    names = names + suffixes[rng.integers(0, len(suffixes), n)].astype(object)
+    upper = rng.random(n) < 0.3
+    names[upper] = [name.upper() for name in names[upper]]
+    typo = np.flatnonzero(rng.random(n) < 0.2)
+    for i in typo:
+        name = names[i]
+        position = int(rng.integers(0, max(len(name) - 1, 1)))
+        names[i] = name[:position] + name[position + 1:]
+    return pd.DataFrame({'razao_social': names, 'base': pick})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deduplicação aproximada de empresas por nome (MinHash/LSH)')
+    parser.add_argument('input_file', nargs='?', help="CSV de empresas ('-' para stdin) ou diretório Parquet/Arrow")
+    parser.add_argument('--output', help='CSV ou .parquet com as colunas de entrada + cluster_id, cluster_size (padrão: stdout)')
+    parser.add_argument('--columns', default=','.join(DEFAULT_COLUMNS),
+                        help=f"Colunas de nome comparadas (padrão: {','.join(DEFAULT_COLUMNS)})")
+    parser.add_argument('--cnpj-column', default='cnpj', help="Coluna de CNPJ (mesmo CNPJ = mesmo cluster; '' desliga)")
+    parser.add_argument('--scope-column', help='Só une linhas com o mesmo valor nesta coluna (ex: tenant_id)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Jaccard mínimo entre trigramas (padrão: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--num-perm', type=int, default=DEFAULT_NUM_PERM,
+                        help=f'Permutações do MinHash (padrão: {DEFAULT_NUM_PERM})')
+    parser.add_argument('--bands', type=int, default=DEFAULT_BANDS, help=f'Faixas do LSH (padrão: {DEFAULT_BANDS})')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW,
+                        help=f'Vizinhos comparados dentro de cada balde (padrão: {DEFAULT_WINDOW})')
+    parser.add_argument('--min-length', type=int, default=DEFAULT_MIN_LENGTH,
+                        help=f'Nomes normalizados mais curtos não são indexados (padrão: {DEFAULT_MIN_LENGTH})')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='Medir com N nomes sintéticos (precisão/recall)')
+
+    args = parser.parse_args()
+    columns = [column.strip() for column in args.columns.split(',') if column.strip()]
+
+    if args.benchmark:
+        frame = _synthetic_companies(args.benchmark)
+        start = time.perf_counter()
+        result = cluster_companies(frame, ['razao_social'], None, None, args.threshold, args.num_perm,
+                                   args.bands, args.window, args.min_length)
+        elapsed = time.perf_counter() - start
+        # Pares de linhas "verdadeiros" (mesma base) x encontrados, contados por cluster
+        truth = frame.groupby('base').size()
+        true_pairs = int((truth * (truth - 1) // 2).sum())
+        joint = pd.DataFrame({'base': frame['base'], 'cluster': result.cluster_id}).groupby(['base', 'cluster']).size()
+        found_pairs = int((joint * (joint - 1) // 2).sum())
+        sizes = pd.Series(result.cluster_id).value_counts()
+        predicted_pairs = int((sizes * (sizes - 1) // 2).sum())
+        print(f"⏱️ {len(frame)} nomes em {elapsed:.2f}s ({len(frame) / elapsed:,.0f} nomes/s), "
+              f"{len(sizes)} clusters para {frame['base'].nunique()} empresas", file=sys.stderr)
+        print(f"   {result.names} nomes distintos, {result.candidates} candidatos, {result.matches} unidos", file=sys.stderr)
+        print(f"   precisão {found_pairs / max(predicted_pairs, 1):.3f} | recall {found_pairs / max(true_pairs, 1):.3f}",
+              file=sys.stderr)
+        return
+
+    if not args.input_file:
+        parser.error('informe o arquivo de entrada ou --benchmark')
+
+    start = time.perf_counter()
+    frame = read_companies(args.input_file)
+    try:
+        result = cluster_companies(frame, columns, args.cnpj_column or None, args.scope_column, args.threshold,
+                                   args.num_perm, args.bands, args.window, args.min_length)
+    except ValueError as e:
+        print(f"❌ Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    frame = frame.assign(cluster_id=result.cluster_id, cluster_size=result.cluster_size)
+    write_clusters(frame, args.output)
+    elapsed = time.perf_counter() - start
+
+    clusters = len(np.unique(result.cluster_id))
+    print(f"✅ {len(frame)} linhas -> {clusters} clusters ({len(frame) - clusters} duplicadas)", file=sys.stderr)
+    print(f"   {result.names} nomes distintos, {result.candidates} pares candidatos, {result.matches} unidos",
+          file=sys.stderr)
+    largest = frame[frame['cluster_size'] > 1].sort_values(['cluster_size', 'cluster_id'], ascending=[False, True])
+    for cluster_id, group in list(largest.groupby('cluster_id', sort=False))[:5]:
+        sample = group[columns[0]].head(3).tolist() if columns[0] in group else []
+        print(f"   🔄 cluster {cluster_id} ({len(group)} linhas): {sample}", file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({len(frame) / elapsed if elapsed > 0 else 0:.0f} linhas/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
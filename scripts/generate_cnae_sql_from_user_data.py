@@ -5,7 +5,9 @@ Processa dados tab-separated e gera arquivo SQL completo
 """
 
 import sys
-import re
+
+from cnae_quarantine import QuarantineSink
+from cnae_stream import parse_cnae_text, read_cnae_file
 
 # Dados fornecidos pelo usuário (cole aqui todos os dados)
 USER_DATA = """CNAE	Setor / Indústria	Categoria
@@ -177,21 +179,9 @@ USER_DATA = """CNAE	Setor / Indústria	Categoria
 0990-4/02	Mineração	Apoio
 0990-4/03	Mineração	Apoio"""
 
-def parse_data(text):
+def parse_data(text, on_reject=None):
     """Parse dados tab-separated"""
-    results = []
-    for line in text.strip().split('\n'):
-        line = line.strip()
-        if not line or line.startswith('CNAE'):
-            continue
-        parts = line.split('\t')
-        if len(parts) >= 3:
-            cnae = parts[0].strip()
-            setor = parts[1].strip()
-            categoria = parts[2].strip()
-            if cnae and setor and categoria:
-                results.append((cnae, setor, categoria))
-    return results
+    return parse_cnae_text(text, on_reject, require_format=False)
 
 def generate_sql(data, output_file):
     """Gera SQL completo"""
@@ -231,14 +221,13 @@ END $$;
     print(f"SQL gerado: {output_file} ({len(data)} registros)")
 
 if __name__ == '__main__':
-    # Ler dados do arquivo se fornecido, senão usar USER_DATA
+    # Ler dados do arquivo (ou '-' para stdin) se fornecido, senão usar USER_DATA
+    # Rejeitados: primeiras linhas e histograma no stderr (ver cnae_quarantine.py)
+    quarantine = QuarantineSink(source=sys.argv[1] if len(sys.argv) > 1 else 'USER_DATA')
     if len(sys.argv) > 1:
-        with open(sys.argv[1], 'r', encoding='utf-8') as f:
-            data_text = f.read()
+        data = quarantine.collect(read_cnae_file(sys.argv[1], on_reject=quarantine, require_format=False))
     else:
-        data_text = USER_DATA
-    
-    data = parse_data(data_text)
+        data = quarantine.collect(parse_data(USER_DATA, on_reject=quarantine))
     output = sys.argv[2] if len(sys.argv) > 2 else 'supabase/migrations/20250226000002_populate_cnae_classifications_COMPLETE.sql'
     generate_sql(data, output)
 
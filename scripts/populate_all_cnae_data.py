@@ -9,51 +9,54 @@ com TODOS os 1000+ registros.
 Uso:
     # Gerar SQL completo
     python scripts/populate_all_cnae_data.py --generate-sql
+
+    # Gerar SQL em blocos de 1000 registros, um por transação (ver cnae_sql_chunks.py)
+    python scripts/populate_all_cnae_data.py --generate-sql --chunk-rows 1000
     
     # Inserir diretamente no Supabase
     python scripts/populate_all_cnae_data.py --insert
+
+    # Inserir com vários lotes em paralelo sobre HTTP/2
+    python scripts/populate_all_cnae_data.py --insert --engine async --concurrency 8
+
+    # Inserir via COPY + merge direto no Postgres (requer DATABASE_URL)
+    python scripts/populate_all_cnae_data.py --insert --engine copy
+
+    # Pular a carga quando nada mudou desde a última execução (ver cnae_sync_cache.py)
+    python scripts/populate_all_cnae_data.py --insert --cache .cnae_cache.sqlite
+
+    # Tempo por etapa em JSON/Prometheus e profile para flamegraph (ver cnae_metrics.py)
+    python scripts/populate_all_cnae_data.py --insert --metrics cnae.prom --profile sample
+
+    # Conferir o conteúdo da tabela com a entrada depois da carga (ver cnae_verify.py)
+    python scripts/populate_all_cnae_data.py --input-file cnae.txt --insert --engine copy --verify
+
+    # Dry-run: o que mudaria, requisições, bytes e duração estimada (ver cnae_plan.py)
+    python scripts/populate_all_cnae_data.py --input-file cnae.txt --insert --engine copy --plan \
+        --snapshot cnae_dump.tsv --throughput cnae_benchmark.json
 """
 
 import os
 import sys
+import time
 import argparse
 from typing import List, Tuple
 
+from cnae_metrics import METRICS, add_metrics_arguments, instrumented_run
+from cnae_plan import add_plan_arguments, plan_from_args
+from cnae_quarantine import add_quarantine_arguments, quarantine_from_args
+from cnae_sql_chunks import add_chunk_arguments, chunking_requested, write_chunked_from_args
+from cnae_stream import parse_cnae_text, read_cnae_file
+from cnae_sync_cache import LoadResult, add_cache_arguments
+from cnae_verify import add_verify_arguments, verify_from_args
+
 # NOTA: Este script espera que os dados completos estejam em um arquivo
 # chamado 'cnae_data_complete.txt' no mesmo diretório
 # Ou você pode passar via --input-file
 
 def parse_cnae_data_from_text(text: str) -> List[Tuple[str, str, str]]:
     """Parse dados CNAE do formato tab-separated"""
-    results = []
-    lines = text.strip().split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        # Tentar diferentes separadores
-        if '\t' in line:
-            parts = line.split('\t')
-        elif '  ' in line:  # Espaços múltiplos
-            parts = [p.strip() for p in line.split('  ') if p.strip()]
-        else:
-            # Tentar split por espaços e pegar primeiros 3 campos
-            parts = line.split()
-            if len(parts) < 3:
-                continue
-        
-        if len(parts) >= 3:
-            cnae = parts[0].strip()
-            setor = parts[1].strip()
-            categoria = parts[2].strip()
-            
-            # Validar formato CNAE (ex: 0111-3/01)
-            if cnae and setor and categoria and ('-' in cnae or '/' in cnae):
-                results.append((cnae, setor, categoria))
-    
-    return results
+    return parse_cnae_text(text)
 
 def generate_sql_complete(data: List[Tuple[str, str, str]], output_file: str):
     """Gera SQL completo com todos os dados"""
@@ -72,22 +75,25 @@ INSERT INTO public.cnae_classifications (cnae_code, setor_industria, categoria)
 """.format(total=len(data)))
         
         values = []
-        for i, (cnae, setor, categoria) in enumerate(data):
-            # Escapar aspas simples
-            setor_escaped = setor.replace("'", "''")
-            categoria_escaped = categoria.replace("'", "''")
-            values.append(f"('{cnae}', '{setor_escaped}', '{categoria_escaped}')")
+        with METRICS.stage('serialize', rows=len(data)):
+            for i, (cnae, setor, categoria) in enumerate(data):
+                # Escapar aspas simples
+                setor_escaped = setor.replace("'", "''")
+                categoria_escaped = categoria.replace("'", "''")
+                values.append(f"('{cnae}', '{setor_escaped}', '{categoria_escaped}')")
+                
+                # Escrever em lotes para não sobrecarregar memória
+                if len(values) >= 500:
+                    with METRICS.stage('write', rows=len(values)):
+                        f.write(',\n'.join(values))
+                        f.write(',\n')
+                    values = []
+                    print(f"  Processados {i+1}/{len(data)} registros...", file=sys.stderr)
             
-            # Escrever em lotes para não sobrecarregar memória
-            if len(values) >= 500:
-                f.write(',\n'.join(values))
-                f.write(',\n')
-                values = []
-                print(f"  Processados {i+1}/{len(data)} registros...", file=sys.stderr)
-        
-        # Escrever restante
-        if values:
-            f.write(',\n'.join(values))
+            # Escrever restante
+            if values:
+                with METRICS.stage('write', rows=len(values)):
+                    f.write(',\n'.join(values))
         
         f.write("""
 ON CONFLICT (cnae_code) DO UPDATE SET
@@ -105,9 +111,10 @@ BEGIN
 END $$;
 """)
     
+    METRICS.add('write', bytes=os.path.getsize(output_file))
     print(f"✅ SQL gerado em: {output_file}", file=sys.stderr)
 
-def insert_directly(data: List[Tuple[str, str, str]]):
+def insert_directly(data: List[Tuple[str, str, str]]) -> LoadResult:
     """Insere dados diretamente no Supabase"""
     try:
         from supabase import create_client, Client
@@ -128,56 +135,71 @@ def insert_directly(data: List[Tuple[str, str, str]]):
     
     batch_size = 100
     total_inserted = 0
+    total_errors = 0
+    start = time.perf_counter()
     
     for i in range(0, len(data), batch_size):
         batch = data[i:i + batch_size]
-        records = [
-            {
-                "cnae_code": cnae,
-                "setor_industria": setor,
-                "categoria": categoria
-            }
-            for cnae, setor, categoria in batch
-        ]
+        with METRICS.stage('serialize', rows=len(batch)):
+            records = [
+                {
+                    "cnae_code": cnae,
+                    "setor_industria": setor,
+                    "categoria": categoria
+                }
+                for cnae, setor, categoria in batch
+            ]
         
         try:
-            result = supabase.table("cnae_classifications").upsert(
-                records,
-                on_conflict="cnae_code"
-            ).execute()
+            with METRICS.stage('network', rows=len(records), batch=True):
+                result = supabase.table("cnae_classifications").upsert(
+                    records,
+                    on_conflict="cnae_code"
+                ).execute()
             
             total_inserted += len(records)
             print(f"✅ Lote {i//batch_size + 1}: {len(records)} registros (Total: {total_inserted})", file=sys.stderr)
         except Exception as e:
+            total_errors += len(records)
             print(f"❌ Erro no lote {i//batch_size + 1}: {e}", file=sys.stderr)
     
+    elapsed = time.perf_counter() - start
     print(f"✅ Concluído! Total inserido: {total_inserted}", file=sys.stderr)
+    print(f"   ⏱️ {elapsed:.2f}s ({len(data) / elapsed if elapsed > 0 else 0:.0f} registros/s)", file=sys.stderr)
+    if total_errors:
+        print(f"   ⚠️ Erros: {total_errors}", file=sys.stderr)
+    return LoadResult(total_inserted, total_errors)
 
-def main():
-    parser = argparse.ArgumentParser(description='Processar TODOS os dados CNAE')
-    parser.add_argument('--generate-sql', action='store_true', help='Gerar arquivo SQL completo')
-    parser.add_argument('--insert', action='store_true', help='Inserir diretamente no Supabase')
-    parser.add_argument('--output', default='supabase/migrations/20250226000002_populate_cnae_classifications_COMPLETE.sql', 
-                       help='Arquivo de saída SQL')
-    parser.add_argument('--input-file', help='Arquivo de entrada com dados CNAE (formato: CNAE\\tSetor\\tCategoria)')
-    
-    args = parser.parse_args()
-    
+def insert_with_engine(data: List[Tuple[str, str, str]], args) -> LoadResult:
+    """Insere com a engine escolhida em --engine"""
+    if args.engine == 'copy':
+        from cnae_copy_loader import copy_merge_classifications, print_copy_summary, resolve_db_url
+        result = copy_merge_classifications(data, resolve_db_url(args.db_url))
+        print_copy_summary(result)
+        return LoadResult(result.inserted + result.updated, result.failed)
+    elif args.engine == 'async':
+        from cnae_async_upsert import insert_async
+        upserter = insert_async(data, args.concurrency)
+        return LoadResult(upserter.total_inserted, upserter.total_errors)
+    else:
+        return insert_directly(data)
+
+def run(args):
+    """Executa o processamento com os argumentos já lidos"""
     # Ler dados
     if args.input_file:
-        if not os.path.exists(args.input_file):
+        if args.input_file != '-' and not os.path.exists(args.input_file):
             print(f"❌ Arquivo não encontrado: {args.input_file}", file=sys.stderr)
             sys.exit(1)
-        with open(args.input_file, 'r', encoding='utf-8') as f:
-            data_text = f.read()
     else:
         print("⚠️  Nenhum arquivo de entrada fornecido.", file=sys.stderr)
         print("   Use --input-file para especificar arquivo com dados CNAE", file=sys.stderr)
         print("   Formato esperado: CNAE\\tSetor\\tCategoria (um por linha)", file=sys.stderr)
         sys.exit(1)
     
-    # Parse dados
-    data = parse_cnae_data_from_text(data_text)
+    # Parse dados (streaming linha a linha)
+    quarantine = quarantine_from_args(args, args.input_file)
+    data = quarantine.collect(read_cnae_file(args.input_file, on_reject=quarantine))
     print(f"📊 Processados {len(data)} registros CNAE", file=sys.stderr)
     
     if not data:
@@ -190,12 +212,47 @@ def main():
     print(f"   Setores únicos: {len(setores)}", file=sys.stderr)
     print(f"   Categorias únicas: {len(categorias)}", file=sys.stderr)
     
-    if args.generate_sql:
+    if args.plan:
+        plan_from_args(data, args, 'sql' if args.generate_sql else args.engine)
+    elif args.generate_sql and chunking_requested(args):
+        write_chunked_from_args(data, args, args.output)
+    elif args.generate_sql:
         generate_sql_complete(data, args.output)
+    elif args.insert and args.cache:
+        from cnae_sync_cache import run_cached_load
+        run_cached_load(args, data, args.engine, lambda: insert_with_engine(data, args))
     elif args.insert:
-        insert_directly(data)
+        insert_with_engine(data, args)
     else:
         print("⚠️  Especifique --generate-sql ou --insert", file=sys.stderr)
+        return
+    
+    if args.verify and args.insert:
+        verify_from_args(data, args)
+
+def main():
+    parser = argparse.ArgumentParser(description='Processar TODOS os dados CNAE')
+    parser.add_argument('--generate-sql', action='store_true', help='Gerar arquivo SQL completo')
+    parser.add_argument('--insert', action='store_true', help='Inserir diretamente no Supabase')
+    parser.add_argument('--engine', choices=['postgrest', 'async', 'copy'], default='postgrest',
+                       help='Engine de inserção: postgrest (upsert em lotes), async (lotes concorrentes via HTTP/2) '
+                            'ou copy (COPY + merge via DATABASE_URL)')
+    parser.add_argument('--db-url', help='Connection string do Postgres para --engine copy e --verify (padrão: DATABASE_URL)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Lotes em voo para --engine async (padrão: 8)')
+    parser.add_argument('--output', default='supabase/migrations/20250226000002_populate_cnae_classifications_COMPLETE.sql', 
+                       help='Arquivo de saída SQL')
+    parser.add_argument('--input-file', help="Arquivo de entrada com dados CNAE (formato: CNAE\\tSetor\\tCategoria; '-' para stdin, aceita .gz)")
+    add_chunk_arguments(parser)
+    add_cache_arguments(parser)
+    add_quarantine_arguments(parser)
+    add_metrics_arguments(parser)
+    add_plan_arguments(parser)
+    add_verify_arguments(parser)
+    parser.add_argument('--snapshot', help='Snapshot da tabela para --plan (JSON de cnae_diff.py ou dump TSV)')
+    
+    args = parser.parse_args()
+    with instrumented_run(args, 'populate_all_cnae_data'):
+        run(args)
 
 if __name__ == '__main__':
     main()
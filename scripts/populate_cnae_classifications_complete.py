@@ -5,14 +5,47 @@ Script COMPLETO para popular tabela cnae_classifications com TODOS os dados forn
 Uso:
     python scripts/populate_cnae_classifications_complete.py
 
+    # Usar arquivo externo (TSV, gzip ou '-' para stdin) no lugar dos dados embutidos
+    python scripts/populate_cnae_classifications_complete.py --input-file cnae_data_complete.txt
+
+    # Lotes concorrentes via HTTP/2 (pip install 'httpx[http2]')
+    python scripts/populate_cnae_classifications_complete.py --engine async --concurrency 8
+
+    # Escrever só o que mudou (snapshot da tabela em cache local)
+    python scripts/populate_cnae_classifications_complete.py --diff --snapshot .cnae_snapshot.json
+
+    # COPY + merge direto no Postgres, sem PostgREST
+    python scripts/populate_cnae_classifications_complete.py --engine copy
+
+    # Sem nenhuma requisição quando nada mudou desde a última execução (ver cnae_sync_cache.py)
+    python scripts/populate_cnae_classifications_complete.py --cache .cnae_cache.sqlite
+
+    # Tempo por etapa, p50/p95/p99 dos lotes e profile (ver cnae_metrics.py)
+    python scripts/populate_cnae_classifications_complete.py --metrics cnae.json --profile cprofile
+
+    # Conferir o conteúdo da tabela com os dados depois da carga (ver cnae_verify.py)
+    python scripts/populate_cnae_classifications_complete.py --engine copy --verify
+
+    # Dry-run contra um snapshot local, sem escrever nada (ver cnae_plan.py)
+    python scripts/populate_cnae_classifications_complete.py --diff --plan --snapshot .cnae_snapshot.json
+
 Requisitos:
     - supabase-py: pip install supabase
     - Variáveis de ambiente: SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY
+    - Para --engine copy e --verify: psycopg2 (pip install psycopg2-binary) e DATABASE_URL
 """
 
 import os
 import sys
-from supabase import create_client, Client
+import time
+import argparse
+import itertools
+
+from cnae_metrics import METRICS, add_metrics_arguments, instrumented_run
+from cnae_plan import add_plan_arguments, plan_from_args
+from cnae_stream import iter_batches, read_cnae_file
+from cnae_sync_cache import LoadResult, add_cache_arguments
+from cnae_verify import add_verify_arguments, verify_from_args
 
 # TODOS OS DADOS FORNECIDOS PELO USUÁRIO
 CNAE_DATA_COMPLETE = [
@@ -193,10 +226,19 @@ CNAE_DATA_COMPLETE = [
     ("0990-4/03", "Mineração", "Apoio"),
 ]
 
-def populate_cnae_classifications():
+def populate_cnae_classifications(data=None, report_total=True):
     """
     Popula a tabela cnae_classifications com TODOS os dados fornecidos
+    
+    `data` é um iterável de tuplas (cnae, setor, categoria), consumido em
+    lotes; por padrão usa CNAE_DATA_COMPLETE. Com `report_total=False` a contagem final fica a
+    cargo de quem chamou (ex: o cache de sincronização). Retorna LoadResult.
     """
+    if data is None:
+        data = CNAE_DATA_COMPLETE
+    
+    from supabase import create_client, Client
+    
     # Configurar Supabase client
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
@@ -208,59 +250,157 @@ def populate_cnae_classifications():
     
     supabase: Client = create_client(supabase_url, supabase_key)
     
-    print(f"📊 Processando {len(CNAE_DATA_COMPLETE)} registros de CNAE...")
+    print("📊 Processando registros de CNAE...")
     
     # Inserir em lotes de 100 para melhor performance
     batch_size = 100
+    total_rows = 0
     total_inserted = 0
     total_errors = 0
+    start = time.perf_counter()
     
-    for i in range(0, len(CNAE_DATA_COMPLETE), batch_size):
-        batch = CNAE_DATA_COMPLETE[i:i + batch_size]
-        records = [
-            {
-                "cnae_code": item[0],
-                "setor_industria": item[1],
-                "categoria": item[2]
-            }
-            for item in batch
-        ]
+    for i, batch in enumerate(iter_batches(data, batch_size)):
+        total_rows += len(batch)
+        with METRICS.stage('serialize', rows=len(batch)):
+            records = [
+                {
+                    "cnae_code": item[0],
+                    "setor_industria": item[1],
+                    "categoria": item[2]
+                }
+                for item in batch
+            ]
         
         try:
-            result = supabase.table("cnae_classifications").upsert(
-                records,
-                on_conflict="cnae_code"
-            ).execute()
+            with METRICS.stage('network', rows=len(records), batch=True):
+                result = supabase.table("cnae_classifications").upsert(
+                    records,
+                    on_conflict="cnae_code"
+                ).execute()
             
             batch_inserted = len(records)
             total_inserted += batch_inserted
-            print(f"✅ Lote {i//batch_size + 1}: {batch_inserted} registros inseridos/atualizados (Total: {total_inserted})")
+            print(f"✅ Lote {i + 1}: {batch_inserted} registros inseridos/atualizados (Total: {total_inserted})")
         except Exception as e:
-            total_errors += len(batch)
-            print(f"❌ Erro ao inserir lote {i//batch_size + 1}: {e}")
+            print(f"❌ Erro ao inserir lote {i + 1}: {e}")
             # Tentar inserir um por um para identificar qual está com problema
             for record in records:
+                METRICS.retry('network')
                 try:
-                    supabase.table("cnae_classifications").upsert(
-                        [record],
-                        on_conflict="cnae_code"
-                    ).execute()
+                    with METRICS.stage('network', rows=1):
+                        supabase.table("cnae_classifications").upsert(
+                            [record],
+                            on_conflict="cnae_code"
+                        ).execute()
                     total_inserted += 1
                 except Exception as e2:
+                    total_errors += 1
                     print(f"   ⚠️ Erro ao inserir {record['cnae_code']}: {e2}")
     
+    elapsed = time.perf_counter() - start
     print(f"\n✅ População concluída!")
-    print(f"   Total inserido/atualizado: {total_inserted}")
+    print(f"   Total inserido/atualizado: {total_inserted} de {total_rows}")
+    print(f"   ⏱️ {elapsed:.2f}s ({total_rows / elapsed if elapsed > 0 else 0:.0f} registros/s)")
     if total_errors > 0:
         print(f"   ⚠️ Erros: {total_errors}")
     
+    if not report_total:
+        return LoadResult(total_inserted, total_errors)
+    
     # Verificar total na tabela
     try:
         result = supabase.table("cnae_classifications").select("cnae_code", count="exact").execute()
         print(f"   📊 Total na tabela: {result.count}")
     except Exception as e:
         print(f"   ⚠️ Não foi possível verificar total: {e}")
+    return LoadResult(total_inserted, total_errors)
 
-if __name__ == "__main__":
-    populate_cnae_classifications()
+def sync_diff(data, snapshot_path=None, include_deletes=False):
+    """
+    Escreve apenas as diferenças entre `data` e a tabela atual
+    """
+    from cnae_diff import apply_diff, diff_records, get_snapshot, get_supabase_client, print_diff_summary, save_snapshot
+    
+    snapshot = get_snapshot(snapshot_path, include_deletes=include_deletes)
+    diff = diff_records(data, snapshot, include_deletes)
+    print_diff_summary(diff)
+    
+    if diff.is_empty():
+        print("✅ Nada para sincronizar")
+        return
+    
+    written = apply_diff(get_supabase_client(), diff)
+    print(f"\n✅ Sincronização concluída! Registros escritos: {written} de {len(data)}")
+    
+    if snapshot_path:
+        save_snapshot(snapshot_path, diff.apply_to(snapshot))
+
+def load_with_engine(data, args, report_total=True):
+    """Carrega `data` com a engine escolhida em --engine; retorna LoadResult"""
+    if args.engine == 'copy':
+        from cnae_copy_loader import copy_merge_classifications, print_copy_summary, resolve_db_url
+        result = copy_merge_classifications(data, resolve_db_url(args.db_url))
+        print_copy_summary(result)
+        return LoadResult(result.inserted + result.updated, result.failed)
+    elif args.engine == 'async':
+        from cnae_async_upsert import insert_async
+        upserter = insert_async(data, args.concurrency)
+        return LoadResult(upserter.total_inserted, upserter.total_errors)
+    else:
+        return populate_cnae_classifications(data, report_total)
 
+def run(args):
+    """Executa a carga com os argumentos já lidos"""
+    data = None
+    if args.input_file:
+        data = read_cnae_file(args.input_file)
+        if args.plan or args.diff or args.cache or args.verify:
+            # Estes modos percorrem os dados mais de uma vez
+            with METRICS.stage('parse') as stats:
+                data = list(data)
+                stats.rows += len(data)
+        else:
+            # Carga simples: os registros vão do arquivo para a engine em lotes,
+            # e o parse entra no tempo das etapas da carga
+            first = next(data, None)
+            data = None if first is None else itertools.chain([first], data)
+        if not data:
+            print("❌ Nenhum dado válido encontrado!")
+            sys.exit(1)
+    
+    if args.plan:
+        plan_from_args(data or CNAE_DATA_COMPLETE, args, args.engine, diff_only=args.diff)
+    elif args.diff:
+        sync_diff(data or CNAE_DATA_COMPLETE, args.snapshot, args.delete)
+    elif args.cache:
+        from cnae_sync_cache import run_cached_load
+        data = data or CNAE_DATA_COMPLETE
+        run_cached_load(args, data, args.engine, lambda: load_with_engine(data, args, report_total=False))
+    else:
+        load_with_engine(data or CNAE_DATA_COMPLETE, args)
+    
+    if args.verify and not args.plan:
+        verify_from_args(data or CNAE_DATA_COMPLETE, args)
+
+def main():
+    parser = argparse.ArgumentParser(description='Popular cnae_classifications com TODOS os dados')
+    parser.add_argument('--input-file', help="Arquivo com dados CNAE (CNAE\\tSetor\\tCategoria; '-' para stdin, aceita .gz)")
+    parser.add_argument('--engine', choices=['postgrest', 'async', 'copy'], default='postgrest',
+                        help='Engine de inserção: postgrest (upsert em lotes), async (lotes concorrentes via HTTP/2) '
+                             'ou copy (COPY + merge via DATABASE_URL)')
+    parser.add_argument('--db-url', help='Connection string do Postgres para --engine copy e --verify (padrão: DATABASE_URL)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Lotes em voo para --engine async (padrão: 8)')
+    parser.add_argument('--diff', action='store_true', help='Escrever apenas registros novos/alterados (upserts direcionados)')
+    parser.add_argument('--snapshot', help='Arquivo de cache do snapshot da tabela (usado com --diff)')
+    parser.add_argument('--delete', action='store_true', help='Com --diff, remover CNAEs ausentes da entrada (sempre baixa o snapshot da tabela)')
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    add_plan_arguments(parser)
+    add_verify_arguments(parser)
+    
+    args = parser.parse_args()
+    with instrumented_run(args, 'populate_cnae_classifications_complete'):
+        run(args)
+
+if __name__ == "__main__":
+    main()
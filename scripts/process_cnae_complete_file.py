@@ -5,48 +5,44 @@ Script para processar arquivo cnae_data_complete.txt e gerar SQL completo
 Uso:
     python scripts/process_cnae_complete_file.py
 
-O script procura o arquivo 'cnae_data_complete.txt' na raiz do projeto
+    # Gerar também a tabela binária para lookups via mmap (jobs batch)
+    python scripts/process_cnae_complete_file.py --binary cnae_classifications.bin
+
+    # SQL em blocos de 1000 registros, um arquivo por bloco (ver cnae_sql_chunks.py)
+    python scripts/process_cnae_complete_file.py --chunk-rows 1000 --split-dir sql_chunks
+
+    # Descartar códigos fora do formato DDDD-D/DD ou com dígito verificador errado
+    python scripts/process_cnae_complete_file.py --strict
+
+    # Outro arquivo de entrada/saída (ex: overrides de um tenant)
+    python scripts/process_cnae_complete_file.py --input-file tenants/acme.tsv --output build/acme.sql
+
+    # Vários tenants de uma vez, em paralelo: ver cnae_tenant_overrides.py
+
+    # Linhas rejeitadas em NDJSON, abortando se mais de 1% for rejeitado (ver cnae_quarantine.py)
+    python scripts/process_cnae_complete_file.py --quarantine rejeitados.ndjson --max-reject-rate 0.01
+
+Por padrão o script procura o arquivo 'cnae_data_complete.txt' na raiz do projeto
 e gera o SQL completo em 'supabase/migrations/20250226000002_populate_cnae_classifications_COMPLETE.sql'
 """
 
 import os
 import sys
+import argparse
 
-def parse_cnae_file(file_path):
-    """Parse arquivo TSV com dados CNAE"""
-    results = []
-    
+from cnae_binary import write_cnae_table
+from cnae_codes import cnae_digits
+from cnae_quarantine import add_quarantine_arguments, quarantine_from_args
+from cnae_sql_chunks import add_chunk_arguments, chunking_requested, write_chunked_from_args
+from cnae_stream import read_cnae_file
+
+def parse_cnae_file(file_path, quarantine, validate=None):
+    """Parse arquivo TSV com dados CNAE (rejeitados vão para a quarentena)"""
     if not os.path.exists(file_path):
         print(f"ERRO: Arquivo nao encontrado: {file_path}")
         sys.exit(1)
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line or line.startswith('CNAE'):
-                continue
-            
-            # Tentar diferentes separadores
-            if '\t' in line:
-                parts = line.split('\t')
-            elif '  ' in line:  # Espaços múltiplos
-                parts = [p.strip() for p in line.split('  ') if p.strip()]
-            else:
-                # Tentar split por espaços
-                parts = line.split()
-            
-            if len(parts) >= 3:
-                cnae = parts[0].strip()
-                setor = parts[1].strip()
-                categoria = parts[2].strip()
-                
-                # Validar CNAE (deve ter - ou /)
-                if cnae and setor and categoria and ('-' in cnae or '/' in cnae):
-                    results.append((cnae, setor, categoria))
-                else:
-                    print(f"AVISO linha {line_num}: Formato invalido - {line[:50]}...")
-    
-    return results
+    return quarantine.collect(read_cnae_file(file_path, on_reject=quarantine), validate)
 
 def generate_sql(data, output_file):
     """Gera SQL completo"""
@@ -102,15 +98,52 @@ END $$;
     print(f"SQL gerado: {output_file}")
     print(f"Total de registros processados: {len(data)}")
 
+def filter_valid_codes(data, quarantine=None):
+    """Mantem apenas codigos no formato DDDD-D/DD com digito verificador correto (ver cnae_vectorized.py)"""
+    from cnae_vectorized import class_check_digit, normalize_cnae_array
+    
+    cols = normalize_cnae_array([cnae for cnae, _, _ in data])
+    for (cnae, setor, categoria), valid in zip(data, cols.valid):
+        if valid:
+            continue
+        digits = cnae_digits(cnae)
+        if len(digits) == 7 and int(digits[4]) != class_check_digit(int(digits[:4])):
+            reason = 'digito_verificador'
+        else:
+            reason = 'formato_subclasse'
+        if quarantine is not None:
+            quarantine.reject(None, f"{cnae}\t{setor}\t{categoria}", reason)
+        else:
+            print(f"AVISO: Codigo CNAE invalido descartado ({reason}) - {cnae}")
+    return [record for record, valid in zip(data, cols.valid) if valid]
+
+def generate_binary(data, output_file):
+    """Gera tabela binária ordenada (ver cnae_binary.py)"""
+    total = write_cnae_table(data, output_file)
+    print(f"Tabela binaria gerada: {output_file}")
+    print(f"Total de registros na tabela binaria: {total}")
+
 if __name__ == '__main__':
-    # Caminho do arquivo na raiz do projeto
+    parser = argparse.ArgumentParser(description='Gerar SQL completo a partir de cnae_data_complete.txt')
+    parser.add_argument('--binary', help='Gerar também a tabela binária (mmap) neste arquivo')
+    parser.add_argument('--strict', action='store_true',
+                        help='Descartar códigos com formato ou dígito verificador inválido (requer numpy)')
+    parser.add_argument('--input-file', help="Arquivo com dados CNAE (padrão: cnae_data_complete.txt na raiz do projeto)")
+    parser.add_argument('--output', help='Arquivo SQL de saída (padrão: migration 20250226000002_..._COMPLETE.sql)')
+    add_chunk_arguments(parser)
+    add_quarantine_arguments(parser)
+    args = parser.parse_args()
+    
+    # Caminhos padrão na raiz do projeto
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    input_file = os.path.join(project_root, 'cnae_data_complete.txt')
-    output_file = os.path.join(project_root, 'supabase', 'migrations', '20250226000002_populate_cnae_classifications_COMPLETE.sql')
+    input_file = args.input_file or os.path.join(project_root, 'cnae_data_complete.txt')
+    output_file = args.output or os.path.join(project_root, 'supabase', 'migrations', '20250226000002_populate_cnae_classifications_COMPLETE.sql')
     
     print(f"Procurando arquivo: {input_file}")
     
-    data = parse_cnae_file(input_file)
+    quarantine = quarantine_from_args(args, input_file)
+    data = parse_cnae_file(input_file, quarantine,
+                           (lambda records: filter_valid_codes(records, quarantine)) if args.strict else None)
     
     if not data:
         print("ERRO: Nenhum dado valido encontrado no arquivo!")
@@ -122,6 +155,11 @@ if __name__ == '__main__':
     print(f"Setores unicos: {len(setores)}")
     print(f"Categorias unicas: {len(categorias)}")
     
-    generate_sql(data, output_file)
+    if chunking_requested(args):
+        write_chunked_from_args(data, args, output_file)
+    else:
+        generate_sql(data, output_file)
+    if args.binary:
+        generate_binary(data, args.binary)
     print("Concluido!")
 
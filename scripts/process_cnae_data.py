@@ -5,16 +5,33 @@ Script para processar dados CNAE fornecidos pelo usuário e gerar SQL ou inserir
 Uso:
     # Gerar SQL
     python scripts/process_cnae_data.py --generate-sql > cnae_data.sql
+
+    # Ler de arquivo, gzip ou stdin
+    python scripts/process_cnae_data.py --input-file cnae.txt.gz --generate-sql
+    cat cnae.txt | python scripts/process_cnae_data.py --input-file - --generate-sql
+
+    # Gerar SQL só com o que mudou em relação à tabela (snapshot em cache)
+    python scripts/process_cnae_data.py --input-file cnae.txt --generate-sql --diff --snapshot .cnae_snapshot.json
     
     # Inserir diretamente no Supabase
     python scripts/process_cnae_data.py --insert
+
+    # Linhas rejeitadas em NDJSON (ver cnae_quarantine.py)
+    python scripts/process_cnae_data.py --input-file cnae.txt --generate-sql --quarantine rejeitados.ndjson
+
+    # Tempo por etapa em JSON/Prometheus e profile (ver cnae_metrics.py)
+    python scripts/process_cnae_data.py --input-file cnae.txt --generate-sql --metrics cnae.json --profile cprofile
 """
 
+import os
 import sys
-import re
 import argparse
 from typing import List, Tuple
 
+from cnae_metrics import METRICS, add_metrics_arguments, instrumented_run
+from cnae_quarantine import add_quarantine_arguments, quarantine_from_args
+from cnae_stream import parse_cnae_text, read_cnae_file
+
 # Dados fornecidos pelo usuário (formato: CNAE\tSetor\tCategoria)
 CNAE_DATA_RAW = """
 0111-3/01	Agricultura	Produtor
@@ -186,21 +203,9 @@ CNAE_DATA_RAW = """
 0990-4/03	Mineração	Apoio
 """
 
-def parse_cnae_data(data: str) -> List[Tuple[str, str, str]]:
-    """Parse dados CNAE do formato tab-separated"""
-    results = []
-    for line in data.strip().split('\n'):
-        line = line.strip()
-        if not line or line.startswith('#'):
-            continue
-        parts = line.split('\t')
-        if len(parts) >= 3:
-            cnae = parts[0].strip()
-            setor = parts[1].strip()
-            categoria = parts[2].strip()
-            if cnae and setor and categoria:
-                results.append((cnae, setor, categoria))
-    return results
+def parse_cnae_data(data: str, on_reject=None) -> List[Tuple[str, str, str]]:
+    """Parse dados CNAE do formato tab-separated (código com ou sem máscara)"""
+    return parse_cnae_text(data, on_reject, require_format=False)
 
 def generate_sql(data: List[Tuple[str, str, str]]) -> str:
     """Gera SQL INSERT para os dados"""
@@ -240,29 +245,30 @@ END $$;
 """
     return sql
 
-def main():
-    parser = argparse.ArgumentParser(description='Processar dados CNAE')
-    parser.add_argument('--generate-sql', action='store_true', help='Gerar arquivo SQL')
-    parser.add_argument('--output', default='cnae_data_complete.sql', help='Arquivo de saída SQL')
-    parser.add_argument('--input-file', help='Arquivo de entrada com dados CNAE (opcional)')
-    
-    args = parser.parse_args()
-    
-    # Ler dados
+def run(args):
+    """Executa o processamento com os argumentos já lidos"""
+    # Ler e processar dados (streaming linha a linha)
+    quarantine = quarantine_from_args(args, args.input_file or 'CNAE_DATA_RAW')
     if args.input_file:
-        with open(args.input_file, 'r', encoding='utf-8') as f:
-            data_raw = f.read()
+        data = quarantine.collect(read_cnae_file(args.input_file, on_reject=quarantine, require_format=False))
     else:
-        data_raw = CNAE_DATA_RAW
-    
-    # Parse dados
-    data = parse_cnae_data(data_raw)
+        data = quarantine.collect(parse_cnae_data(CNAE_DATA_RAW, on_reject=quarantine))
     print(f"📊 Processados {len(data)} registros CNAE", file=sys.stderr)
     
-    if args.generate_sql:
-        sql = generate_sql(data)
+    if args.generate_sql and args.diff:
+        from cnae_diff import diff_records, generate_diff_sql, get_snapshot, print_diff_summary
+        diff = diff_records(data, get_snapshot(args.snapshot, include_deletes=args.delete), args.delete)
+        print_diff_summary(diff)
         with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(sql)
+            f.write(generate_diff_sql(diff))
+        print(f"✅ SQL gerado em: {args.output}", file=sys.stderr)
+    elif args.generate_sql:
+        with METRICS.stage('serialize', rows=len(data)):
+            sql = generate_sql(data)
+        with METRICS.stage('write', rows=len(data)) as stats:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(sql)
+            stats.bytes += os.path.getsize(args.output)
         print(f"✅ SQL gerado em: {args.output}", file=sys.stderr)
         print(f"   Total de registros: {len(data)}", file=sys.stderr)
     else:
@@ -273,6 +279,20 @@ def main():
         print(f"Setores únicos: {len(setores)}")
         print(f"Categorias únicas: {len(categorias)}")
 
+def main():
+    parser = argparse.ArgumentParser(description='Processar dados CNAE')
+    parser.add_argument('--generate-sql', action='store_true', help='Gerar arquivo SQL')
+    parser.add_argument('--output', default='cnae_data_complete.sql', help='Arquivo de saída SQL')
+    parser.add_argument('--input-file', help="Arquivo de entrada com dados CNAE (opcional; '-' para stdin, aceita .gz)")
+    parser.add_argument('--diff', action='store_true', help='Gerar apenas inserts/updates em relação à tabela atual')
+    parser.add_argument('--snapshot', help='Arquivo de cache do snapshot da tabela (usado com --diff)')
+    parser.add_argument('--delete', action='store_true', help='Com --diff, remover CNAEs ausentes da entrada (sempre baixa o snapshot da tabela)')
+    add_quarantine_arguments(parser)
+    add_metrics_arguments(parser)
+    
+    args = parser.parse_args()
+    with instrumented_run(args, 'process_cnae_data'):
+        run(args)
+
 if __name__ == '__main__':
     main()
-
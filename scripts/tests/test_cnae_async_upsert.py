@@ -0,0 +1,103 @@
+"""Testes do upsert assíncrono (cnae_async_upsert.py) contra um PostgREST de mentira"""
+
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('httpx')
+
+from cnae_async_upsert import upsert_async
+
+
+class FakePostgREST(ThreadingHTTPServer):
+    """Responde cada POST depois de `delay` segundos e registra o paralelismo observado"""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, delay: float = 0.0, fail_first: int = 0):
+        super().__init__(('127.0.0.1', 0), FakeHandler)
+        self.delay = delay
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.first_start = None
+        self.last_end = None
+        self.codes = []
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.requests += 1
+            attempt = server.requests
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+            server.first_start = server.first_start or time.perf_counter()
+        try:
+            time.sleep(server.delay)
+            if attempt <= server.fail_first:
+                status = 429
+            else:
+                status = 201
+                with server.lock:
+                    server.codes.extend(row['cnae_code'] for row in body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+                server.last_end = time.perf_counter()
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_server(request):
+    server = FakePostgREST(**getattr(request, 'param', {}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def records(count: int):
+    return [(f'{i:04d}-0/00', 'Setor', 'Categoria') for i in range(count)]
+
+
+@pytest.mark.parametrize('fake_server', [{'delay': 0.2}], indirect=True)
+def test_batches_run_concurrently_over_http1(fake_server):
+    upserter = asyncio.run(upsert_async(iter(records(800)), fake_server.url, 'test', concurrency=8))
+
+    assert (upserter.total_rows, upserter.total_inserted, upserter.total_errors) == (800, 800, 0)
+    assert sorted(fake_server.codes) == [code for code, _, _ in records(800)]
+    # 8 lotes de 100 com 0.2s cada: em série seriam 1.6s no servidor
+    assert fake_server.peak_in_flight > 1
+    assert fake_server.last_end - fake_server.first_start < 1.0
+
+
+@pytest.mark.parametrize('fake_server', [{'fail_first': 2}], indirect=True)
+def test_retries_on_429(fake_server):
+    upserter = asyncio.run(upsert_async(records(50), fake_server.url, 'test', concurrency=1))
+
+    assert (upserter.total_inserted, upserter.total_errors, upserter.retries) == (50, 0, 2)
+    assert len(fake_server.codes) == 50
@@ -0,0 +1,109 @@
+"""Testes da conversão de empresas para Parquet/Arrow (cnae_company_columnar.py) e da leitura de volta"""
+
+import os
+from urllib.parse import unquote
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pa = pytest.importorskip('pyarrow')
+
+from cnae_company_columnar import ClassificationIndex, convert_csv, open_companies
+from company_dedup import read_companies
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test-10-companies.csv')
+DICTIONARY_COLUMNS = ['cnpj_invalido', 'cnae_code', 'categoria', 'uf']
+
+CLASSIFIED = (
+    'cnpj,razao_social,cnae_fiscal,uf\n'
+    '11.222.333/0001-81,Acme Software,6203-1/00,sp\n'
+    '00000000000191,Banco Exemplo,4711301,SC\n'
+    '123,Sem CNPJ,,\n'
+    '00163083000130,Golden Cargo,9999999,XX\n'
+)
+
+
+@pytest.fixture(scope='module')
+def index():
+    return ClassificationIndex()
+
+
+def write_csv(tmp_path, text):
+    path = tmp_path / 'empresas.csv'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def read_back(path):
+    table = open_companies(path).to_table()
+    return table, table.to_pandas().sort_values('razao_social', ignore_index=True)
+
+
+def rows(frame, columns):
+    """Valores como listas, com nulos (NaN/NA) como None"""
+    return frame[columns].astype(object).where(frame[columns].notna(), None).values.tolist()
+
+
+def partitions(path):
+    return sorted(unquote(name) for name in os.listdir(path))
+
+
+def test_unclassified_input_all_null_partition(tmp_path, index):
+    output = str(tmp_path / 'out')
+    stats = convert_csv(SAMPLE, output, index)
+    assert stats.rows == 10 and stats.classified == 0
+    assert partitions(output) == ['setor_industria=__HIVE_DEFAULT_PARTITION__']
+
+    table, frame = read_back(output)
+    assert table.num_rows == 10
+    assert table.schema.field('setor_industria').type == pa.string()
+    assert frame['setor_industria'].isna().all()
+    for column in DICTIONARY_COLUMNS:
+        assert pa.types.is_dictionary(table.schema.field(column).type), column
+    # company_dedup lê o mesmo diretório
+    assert len(read_companies(output)) == 10
+
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_classified_input_round_trip(tmp_path, index, output_format):
+    output = str(tmp_path / 'out')
+    convert_csv(write_csv(tmp_path, CLASSIFIED), output, index, output_format=output_format, batch_size=2)
+    assert partitions(output) == ['setor_industria=Alimentos', 'setor_industria=Tecnologia da Informação',
+                                  'setor_industria=__HIVE_DEFAULT_PARTITION__']
+
+    table, frame = read_back(output)
+    assert table.schema.field('setor_industria').type == pa.string()
+    assert table.schema.field('cnae_code').type == pa.dictionary(pa.int16(), pa.string())
+    assert table.schema.field('uf').type == pa.dictionary(pa.int8(), pa.string())
+    assert table.schema.field('cnpj_invalido').type == pa.dictionary(pa.int8(), pa.string())
+    assert rows(frame, ['razao_social', 'cnpj', 'cnae_code', 'setor_industria', 'categoria', 'uf']) == [
+        ['Acme Software', '11222333000181', '6203-1/00', 'Tecnologia da Informação', 'Serviços', 'SP'],
+        ['Banco Exemplo', '00000000000191', '4711-3/01', 'Alimentos', 'Comércio Varejista', 'SC'],
+        ['Golden Cargo', '00163083000130', None, None, None, None],
+        ['Sem CNPJ', None, None, None, None, None],
+    ]
+    assert rows(frame, ['cnpj_invalido', 'cnpj_original']) == [
+        [None, None], [None, None], [None, None], ['digito_verificador', '123']]
+
+
+def test_partition_by_uf_and_none(tmp_path, index):
+    source = write_csv(tmp_path, CLASSIFIED)
+    by_uf = str(tmp_path / 'uf')
+    convert_csv(source, by_uf, index, output_format='arrow', partition_by='uf')
+    table, frame = read_back(by_uf)
+    assert table.schema.field('uf').type == pa.string()
+    assert pa.types.is_dictionary(table.schema.field('setor_industria').type)
+    assert rows(frame, ['uf']) == [['SP'], ['SC'], [None], [None]]
+
+    flat = str(tmp_path / 'flat')
+    convert_csv(source, flat, index, partition_by='none')
+    assert os.listdir(flat) == ['part-0.parquet']
+    table, _ = read_back(flat)
+    assert table.num_rows == 4
+    for column in DICTIONARY_COLUMNS + ['setor_industria']:
+        assert pa.types.is_dictionary(table.schema.field(column).type), column
+
+
+def test_open_companies_without_data(tmp_path):
+    with pytest.raises(ValueError, match='nenhum arquivo'):
+        open_companies(str(tmp_path))
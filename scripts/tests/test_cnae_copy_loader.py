@@ -0,0 +1,100 @@
+"""Testes do COPY + merge (cnae_copy_loader.py): motivos de rejeição e contagens"""
+
+from conftest import TEST_PREFIX
+
+from cnae_copy_loader import MAX_CNAE_CODE_LEN, MAX_TEXT_LEN, _CopyStream, copy_escape, copy_merge_classifications
+
+
+def table_rows(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT cnae_code, setor_industria, categoria FROM public.cnae_classifications "
+            "WHERE cnae_code LIKE %s ORDER BY cnae_code",
+            (TEST_PREFIX + '%',),
+        )
+        return cur.fetchall()
+
+
+def test_copy_escape():
+    assert copy_escape('a\tb\nc\\d\re') == 'a\\tb\\nc\\\\d\\re'
+
+
+def test_copy_stream_numbers_lines():
+    stream = _CopyStream([('6203-1/00', 'TI', 'Serviços'), ('0111-3/01', 'Agri\tcultura', 'Produtor')])
+    assert stream.read() == '1\t6203-1/00\tTI\tServiços\n2\t0111-3/01\tAgri\\tcultura\tProdutor\n'
+    assert stream.count == 2
+
+
+def test_insert_then_update_counts(db_conn, db_url):
+    first = [(f'{TEST_PREFIX}{i}', 'Setor', 'Categoria') for i in range(3)]
+    result = copy_merge_classifications(first, db_url)
+    assert (result.total, result.inserted, result.updated, result.rejects) == (3, 3, 0, [])
+
+    second = [
+        (f'{TEST_PREFIX}0', 'Setor', 'Categoria'),
+        (f'{TEST_PREFIX}1', 'Setor novo', 'Categoria'),
+        (f'{TEST_PREFIX}3', 'Setor', 'Categoria'),
+    ]
+    result = copy_merge_classifications(iter(second), db_url)
+    # Upsert sem mudança também conta como atualização (ON CONFLICT DO UPDATE)
+    assert (result.total, result.inserted, result.updated) == (3, 1, 2)
+    assert table_rows(db_conn) == [
+        (f'{TEST_PREFIX}0', 'Setor', 'Categoria'),
+        (f'{TEST_PREFIX}1', 'Setor novo', 'Categoria'),
+        (f'{TEST_PREFIX}2', 'Setor', 'Categoria'),
+        (f'{TEST_PREFIX}3', 'Setor', 'Categoria'),
+    ]
+
+
+def test_reject_reasons(db_conn, db_url):
+    long_code = 'X' * (MAX_CNAE_CODE_LEN + 1)
+    long_text = 'x' * (MAX_TEXT_LEN + 1)
+    records = [
+        ('', 'Setor', 'Categoria'),
+        (long_code, 'Setor', 'Categoria'),
+        (f'{TEST_PREFIX}a', '', 'Categoria'),
+        (f'{TEST_PREFIX}b', long_text, 'Categoria'),
+        (f'{TEST_PREFIX}c', 'Setor', ''),
+        (f'{TEST_PREFIX}d', 'Setor', long_text),
+        (f'{TEST_PREFIX}dup', 'Primeira', 'Categoria'),
+        (f'{TEST_PREFIX}ok', 'Setor', 'Categoria'),
+        (f'{TEST_PREFIX}dup', 'Última', 'Categoria'),
+    ]
+    result = copy_merge_classifications(records, db_url)
+
+    assert result.total == len(records)
+    assert result.rejects == [
+        (1, '', 'cnae_code_vazio'),
+        (2, long_code, 'cnae_code_muito_longo'),
+        (3, f'{TEST_PREFIX}a', 'setor_vazio'),
+        (4, f'{TEST_PREFIX}b', 'setor_muito_longo'),
+        (5, f'{TEST_PREFIX}c', 'categoria_vazia'),
+        (6, f'{TEST_PREFIX}d', 'categoria_muito_longa'),
+        (7, f'{TEST_PREFIX}dup', 'cnae_code_duplicado'),
+    ]
+    assert (result.inserted, result.updated) == (2, 0)
+    # Código repetido: vale a última ocorrência
+    assert table_rows(db_conn) == [
+        (f'{TEST_PREFIX}dup', 'Última', 'Categoria'),
+        (f'{TEST_PREFIX}ok', 'Setor', 'Categoria'),
+    ]
+
+
+def test_invalid_last_occurrence_keeps_last_valid(db_conn, db_url):
+    long_text = 'x' * (MAX_TEXT_LEN + 1)
+    records = [
+        (f'{TEST_PREFIX}dup', 'Primeira', 'Categoria'),
+        (f'{TEST_PREFIX}dup', 'Segunda', 'Categoria'),
+        (f'{TEST_PREFIX}dup', 'Setor', long_text),
+        (f'{TEST_PREFIX}dup', '', 'Categoria'),
+    ]
+    result = copy_merge_classifications(records, db_url)
+
+    assert result.rejects == [
+        (1, f'{TEST_PREFIX}dup', 'cnae_code_duplicado'),
+        (3, f'{TEST_PREFIX}dup', 'categoria_muito_longa'),
+        (4, f'{TEST_PREFIX}dup', 'setor_vazio'),
+    ]
+    # Repetido com a última ocorrência inválida: vale a última válida
+    assert result.inserted == 1
+    assert table_rows(db_conn) == [(f'{TEST_PREFIX}dup', 'Segunda', 'Categoria')]
@@ -0,0 +1,40 @@
+"""Testes do diff incremental (cnae_diff.py)"""
+
+import cnae_diff
+from cnae_diff import diff_records, generate_diff_sql, get_snapshot, row_hash, save_snapshot
+
+
+def test_duplicate_codes_last_occurrence_wins():
+    snapshot = {'0111-3/01': row_hash('Agricultura', 'Produtor')}
+    records = [
+        ('6203-1/00', 'TI', 'Serviços'),
+        ('0111-3/01', 'Agricultura', 'Outro'),
+        ('6203-1/00', 'TI', 'Software'),
+        ('0111-3/01', 'Agricultura', 'Produtor'),
+    ]
+    diff = diff_records(records, snapshot)
+
+    assert diff.inserts == [('6203-1/00', 'TI', 'Software')]
+    assert diff.updates == []
+    assert (diff.unchanged, diff.duplicates) == (1, 2)
+    # Um código aparece uma vez só no INSERT ... ON CONFLICT
+    assert generate_diff_sql(diff).count("'6203-1/00'") == 1
+
+
+def test_deletes_are_codes_missing_from_input():
+    snapshot = {code: row_hash('S', 'C') for code in ('A', 'B', 'C')}
+    diff = diff_records([('A', 'S', 'C'), ('A', 'S', 'C')], snapshot, include_deletes=True)
+    assert diff.deletes == ['B', 'C']
+
+
+def test_delete_ignores_cached_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / 'snapshot.json')
+    save_snapshot(path, {'A': row_hash('S', 'C')})
+    table = {'A': row_hash('S', 'C'), 'B': row_hash('S', 'C')}
+    monkeypatch.setattr(cnae_diff, 'get_supabase_client', lambda: None)
+    monkeypatch.setattr(cnae_diff, 'fetch_snapshot', lambda supabase: dict(table))
+
+    assert get_snapshot(path) == {'A': row_hash('S', 'C')}
+    assert get_snapshot(path, include_deletes=True) == table
+    # O snapshot baixado substitui o cache
+    assert get_snapshot(path) == table
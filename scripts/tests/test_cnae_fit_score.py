@@ -0,0 +1,237 @@
+"""
+Testes do fit score vetorizado (cnae_fit_score.py) contra uma porta escalar
+de calculateFitScore (supabase/functions/qualify-prospects-bulk/index.ts)
+
+A porta segue a função linha a linha, com as diferenças que o script assume:
+o setor do prospect vem de cnae_classifications (não do mapa por primeiro
+dígito), cnaes_alvo é comparado pela chave de 7 dígitos e a razão do website
+fit não entra (o offline não tem os produtos encontrados no website).
+"""
+
+import re
+import json
+from decimal import ROUND_HALF_UP, Decimal
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from cnae_fit_score import DEFAULT_CLASSIFICATIONS, ClassificationIndex, load_icp, score_batch
+from cnae_stream import read_cnae_file
+
+ICP = {
+    'setores_alvo': ['Tecnologia', 'Indústria'],
+    'cnaes_alvo': ['4751-2/01', 4711301, '01.11-3/01'],
+    'estados_alvo': ['SP', 'SC'],
+    'capital_min': 100000,
+    'capital_max': 5000000,
+}
+
+
+def to_fixed(value: float, digits: int = 2) -> float:
+    """parseFloat(value.toFixed(digits)) do JavaScript (valor binário exato, meio para cima)"""
+    return float(Decimal(value).quantize(Decimal(1).scaleb(-digits), ROUND_HALF_UP))
+
+
+def scalar_cnae_key(value) -> int:
+    """Chave de 7 dígitos: numérico (zero à esquerda implícito) ou máscara DDDD-D/DD com ou sem pontos"""
+    text = str(value).strip()
+    if re.fullmatch(r'\d{1,7}', text):
+        return int(text)
+    if re.fullmatch(r'\d{2}\.?\d{2}-\d/\d{2}', text):
+        return int(re.sub(r'\D', '', text))
+    return -1
+
+
+def parse_float(value: str) -> float:
+    """parseFloat(x || '0')"""
+    return float(value or '0')
+
+
+def calculate_fit_score(prospect: dict, icp, website_fit_score: float = 0):
+    """Porta escalar de calculateFitScore e das funções de sub-score"""
+    if not icp:
+        return {
+            'fit_score': 50 + website_fit_score, 'grade': 'C',
+            'product': 50, 'sector': 50, 'capital': 50, 'geo': 50, 'maturity': 50,
+            'reasons': ['ICP não configurado - score padrão aplicado'],
+        }
+
+    # calculateProductSimilarity (pela quantidade)
+    count = prospect['produtos_count']
+    if count == 0:
+        product = 30
+    elif count < 5:
+        product = 50
+    elif count < 20:
+        product = 70
+    else:
+        product = 85
+
+    # calculateSectorFit
+    key = scalar_cnae_key(prospect['cnae'])
+    target_keys = [k for k in map(scalar_cnae_key, icp.get('cnaes_alvo') or []) if k >= 0]
+    if prospect['setor'] in (icp.get('setores_alvo') or []):
+        sector = 90
+    elif key >= 0 and key in target_keys:
+        sector = 95
+    else:
+        sector = 50
+
+    # calculateCapitalFit (|| 0 e || Infinity)
+    capital = prospect['capital_social']
+    min_capital = icp.get('capital_min') or 0
+    max_capital = icp.get('capital_max') or float('inf')
+    if min_capital <= capital <= max_capital:
+        capital_fit = 95
+    elif min_capital * 0.5 <= capital <= max_capital * 1.5:
+        capital_fit = 70
+    else:
+        capital_fit = 40
+
+    # calculateGeoFit
+    geo = 90 if prospect['estado'] in (icp.get('estados_alvo') or []) else 60
+    maturity = 70
+
+    base = product * 0.30 + sector * 0.25 + capital_fit * 0.20 + geo * 0.15 + maturity * 0.10
+    final = min(100, base + website_fit_score)
+    if final >= 95:
+        grade = 'A+'
+    elif final >= 85:
+        grade = 'A'
+    elif final >= 70:
+        grade = 'B'
+    elif final >= 60:
+        grade = 'C'
+    else:
+        grade = 'D'
+
+    reasons = []
+    if product > 80:
+        reasons.append(f'Produtos altamente compatíveis ({product:.0f}%)')
+    if sector > 80:
+        reasons.append(f'Setor ideal ({sector:.0f}%)')
+    if capital_fit > 80:
+        reasons.append(f'Capital social adequado ({capital_fit:.0f}%)')
+    if geo > 80:
+        reasons.append(f'Região estratégica ({geo:.0f}%)')
+
+    return {
+        'fit_score': to_fixed(final), 'grade': grade,
+        'product': product, 'sector': sector, 'capital': capital_fit, 'geo': geo, 'maturity': maturity,
+        'reasons': reasons,
+    }
+
+
+@pytest.fixture(scope='module')
+def index():
+    return ClassificationIndex()
+
+
+@pytest.fixture(scope='module')
+def setor_by_key():
+    return {scalar_cnae_key(cnae): setor for cnae, setor, _ in read_cnae_file(DEFAULT_CLASSIFICATIONS)}
+
+
+def masked(key: int) -> str:
+    digits = f'{key:07d}'
+    return f'{digits[:4]}-{digits[4]}/{digits[5:]}'
+
+
+def synthetic_prospects(index, n: int = 5000, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    keys = index.keys[rng.integers(0, len(index.keys), n)]
+    style = rng.integers(0, 4, n)
+    cnaes = np.array([str(k) if s == 0 else masked(k) if s == 1 else masked(k)[:2] + '.' + masked(k)[2:]
+                      if s == 2 else rng.choice(['', '0000000', '4751201', '01.11-3/01'])
+                      for k, s in zip(keys, style)], dtype=object)
+    capital = np.round(rng.lognormal(12, 2.5, n), 2)
+    capital[rng.random(n) < 0.1] = 0
+    return pd.DataFrame({
+        'cnpj': [f'{i:014d}' for i in range(n)],
+        'razao_social': '',
+        'nome_fantasia': '',
+        'cnae': cnaes,
+        'estado': np.array(['SP', 'RJ', 'MG', 'SC', ''], dtype=object)[rng.integers(0, 5, n)],
+        'cidade': '',
+        'capital_social': np.where(capital == 0, '', capital.astype(str)),
+        'produtos_count': np.where(rng.random(n) < 0.1, '', rng.integers(0, 40, n).astype(str)),
+        'website_fit_score': np.where(rng.random(n) < 0.3, (rng.integers(0, 2001, n) / 100).astype(str), '0'),
+    })
+
+
+def scalar_rows(batch, icp, setor_by_key):
+    for row in batch.itertuples(index=False):
+        prospect = {
+            'cnae': row.cnae,
+            'setor': setor_by_key.get(scalar_cnae_key(row.cnae), ''),
+            'estado': row.estado,
+            'capital_social': parse_float(row.capital_social),
+            'produtos_count': int(parse_float(row.produtos_count)),
+        }
+        yield calculate_fit_score(prospect, icp, parse_float(row.website_fit_score))
+
+
+def vector_rows(scored):
+    for row in scored.itertuples(index=False):
+        yield {
+            'fit_score': row.fit_score, 'grade': row.grade,
+            'product': row.product_similarity_score, 'sector': row.sector_fit_score,
+            'capital': row.capital_fit_score, 'geo': row.geo_fit_score, 'maturity': row.maturity_score,
+            'reasons': json.loads(row.fit_reasons),
+        }
+
+
+def write_icp(tmp_path, icp):
+    path = tmp_path / 'icp.json'
+    path.write_text(json.dumps(icp, ensure_ascii=False), encoding='utf-8')
+    return load_icp(str(path))
+
+
+@pytest.mark.parametrize('icp', [
+    ICP,
+    {**ICP, 'capital_max': None},  # capital_max ausente: || Infinity
+    {'setores_alvo': [], 'cnaes_alvo': [], 'estados_alvo': []},
+])
+def test_score_batch_matches_scalar_port(index, setor_by_key, tmp_path, icp):
+    batch = synthetic_prospects(index)
+    scored = score_batch(batch, index, write_icp(tmp_path, icp))
+
+    expected = list(scalar_rows(batch, icp, setor_by_key))
+    actual = list(vector_rows(scored))
+    mismatches = [(i, e, a) for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+    assert not mismatches, mismatches[:3]
+    # O lote cobre todas as faixas dos sub-scores
+    assert set(scored['sector_fit_score']) == ({90.0, 95.0, 50.0} if icp['setores_alvo'] else {50.0})
+    assert {'A+', 'A', 'B', 'C', 'D'} >= set(scored['grade']) and len(set(scored['grade'])) >= 3
+
+
+def test_no_icp_is_neutral(index, setor_by_key):
+    batch = synthetic_prospects(index, n=500)
+    scored = score_batch(batch, index, None)
+    expected = list(scalar_rows(batch, None, setor_by_key))
+    # Aqui a função não arredonda; o valor gravado em fit_score numeric(5,2) é o arredondado
+    for row in expected:
+        row['fit_score'] = to_fixed(row['fit_score'])
+    assert list(vector_rows(scored)) == expected
+    assert set(scored['grade']) == {'C'}
+
+
+def test_capital_max_absent_is_unbounded(index, tmp_path):
+    icp = write_icp(tmp_path, {'capital_min': 1000000})
+    assert icp.capital_max == float('inf')
+    batch = pd.DataFrame({column: [''] * 3 for column in
+                          ['cnpj', 'razao_social', 'nome_fantasia', 'cnae', 'estado', 'cidade',
+                           'produtos_count', 'website_fit_score']})
+    batch['capital_social'] = ['2000000000', '600000', '100000']
+    assert score_batch(batch, index, icp)['capital_fit_score'].tolist() == [95.0, 70.0, 40.0]
+
+
+def test_numeric_and_masked_cnaes_alvo_are_the_same_code(index, tmp_path):
+    icp = write_icp(tmp_path, {'cnaes_alvo': [6203100, '0111-3/01']})
+    batch = pd.DataFrame({column: [''] * 5 for column in
+                          ['cnpj', 'razao_social', 'nome_fantasia', 'estado', 'cidade', 'capital_social',
+                           'produtos_count', 'website_fit_score']})
+    batch['cnae'] = ['6203-1/00', '62.03-1/00', '6203100', '111301', '6204-0/00']
+    assert score_batch(batch, index, icp)['sector_fit_score'].tolist() == [95.0, 95.0, 95.0, 95.0, 50.0]
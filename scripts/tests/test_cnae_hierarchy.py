@@ -0,0 +1,28 @@
+"""Testes do índice hierárquico CNAE (cnae_hierarchy.py)"""
+
+from cnae_hierarchy import CnaeHierarchy, build_hierarchy
+
+RECORDS = [
+    ('6201-5/01', 'TI', 'Software'),
+    ('6203-1/00', 'TI', 'Serviços'),
+    ('0111-3/01', 'Agricultura', 'Produtor'),
+    ('0411-1/00', 'Sem seção', 'Outro'),  # divisão 04 não existe na CNAE 2.0
+    ('abc', 'Inválido', 'Outro'),
+]
+
+
+def test_division_outside_sections_is_skipped(capsys):
+    artifact = build_hierarchy(RECORDS)
+
+    assert artifact['total'] == 3
+    assert 'Sem seção' not in artifact['setores']
+    assert artifact['levels']['section']['codes'] == ['A', 'J']
+    assert 'divisão fora das seções da CNAE 2.0: 04' in capsys.readouterr().err
+
+
+def test_query_by_node_and_category():
+    hierarchy = CnaeHierarchy(build_hierarchy(RECORDS))
+
+    assert [match.cnae_code for match in hierarchy.select('62')] == ['6201-5/01', '6203-1/00']
+    assert [match.cnae_code for match in hierarchy.select('J', categoria='Serviços')] == ['6203-1/00']
+    assert hierarchy.rollup('section', setor='TI') == [('J', 2)]
@@ -0,0 +1,63 @@
+"""Testes da quarentena de linhas rejeitadas (cnae_quarantine.py)"""
+
+import json
+
+import pytest
+
+from cnae_quarantine import QuarantineSink, RejectRateExceeded
+from cnae_stream import read_cnae_file
+
+VALID = '6203-1/00\tTI\tSoftware\n'
+BAD_CHECK_DIGIT = '6203-2/00\tTI\tSoftware\n'  # DV da classe 6203 é 1
+
+
+def read_cnae_file_lines(tmp_path, lines, quarantine):
+    path = tmp_path / 'cnae.txt'
+    path.write_text(''.join(lines), encoding='utf-8')
+    return read_cnae_file(str(path), on_reject=quarantine)
+
+
+def test_histogram_and_ndjson(tmp_path):
+    path = tmp_path / 'rejeitados.ndjson'
+    quarantine = QuarantineSink(str(path), source='cnae.txt')
+    text = [VALID, 'malformada\n', '6203-1/00\t\tSoftware\n', '6203100\tTI\tSoftware\n']
+    data = quarantine.collect(read_cnae_file_lines(tmp_path, text, quarantine))
+
+    assert len(data) == 1
+    assert quarantine.reasons == {'campos_insuficientes': 1, 'campo_vazio': 1, 'formato_cnae': 1}
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [(line['source'], line['line'], line['reason']) for line in lines] == [
+        ('cnae.txt', 2, 'campos_insuficientes'), ('cnae.txt', 3, 'campo_vazio'), ('cnae.txt', 4, 'formato_cnae')]
+
+
+def test_rejects_after_parse_use_total_lines(tmp_path):
+    """Rejeições sem linha (--strict, depois do parse) não usam a linha da última rejeição como total"""
+    pytest.importorskip('numpy')
+    from process_cnae_complete_file import filter_valid_codes
+
+    # 100.031 linhas: uma malformada na linha 1002 e 30 DVs errados no fim (0,03%)
+    lines = [VALID] * 1001 + ['malformada\n'] + [VALID] * 98999 + [BAD_CHECK_DIGIT] * 30
+    quarantine = QuarantineSink(max_reject_rate=0.01)
+    records = read_cnae_file_lines(tmp_path, lines, quarantine)
+    data = quarantine.collect(records, lambda data: filter_valid_codes(data, quarantine))
+
+    assert len(data) == 100000
+    assert quarantine.rejected == 31
+    assert quarantine.reasons == {'campos_insuficientes': 1, 'digito_verificador': 30}
+
+
+def test_final_check_counts_rejects_after_parse():
+    quarantine = QuarantineSink(max_reject_rate=0.01)
+    for _ in range(30):
+        quarantine.reject(None, BAD_CHECK_DIGIT, 'digito_verificador')
+    with pytest.raises(RejectRateExceeded, match='30 de 1030 linhas'):
+        quarantine.finish(1000)
+
+
+def test_aborts_mid_stream_after_min_lines(tmp_path):
+    lines = [VALID] * 999 + ['malformada\n'] * 20 + [VALID] * 5000
+    quarantine = QuarantineSink(max_reject_rate=0.01, min_lines=1000)
+    with pytest.raises(SystemExit):
+        quarantine.collect(read_cnae_file_lines(tmp_path, lines, quarantine))
+    # Interrompe na linha 1010 (11 de 1010), sem ler o resto
+    assert (quarantine.rejected, quarantine.lines) == (11, 1010)
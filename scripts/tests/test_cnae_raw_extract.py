@@ -0,0 +1,118 @@
+"""Testes do extrator de raw_data (cnae_raw_extract.py / cnae_raw_data.py): paridade com o SQL e saída CSV"""
+
+import io
+import json
+from decimal import Decimal
+
+import pytest
+
+from cnae_raw_data import extract_cnae_from_raw_data, extract_secondary_cnaes, parse_raw_data_line
+from cnae_raw_extract import PARITY_CASES, CsvSink, _python_principal, check_parity, extract_line, pg_array_literal
+
+# Resultado esperado de extract_cnae_from_raw_data() para cada caso de PARITY_CASES
+PARITY_EXPECTED = {
+    '{"receita_federal": {"atividade_principal": [{"code": "62.03-1-00"}]}, "cnae_fiscal": 4711301}': '6203-1-00',
+    '{"receita_federal": {"atividade_principal": [{"code": ""}]}, "receita": {"atividade_principal": [{"code": "47.11-3-01"}]}}': '4711-3-01',
+    '{"receita_federal": {"atividade_principal": []}, "atividade_principal": [{"code": " 01.11-3/01 "}]}': '0111-3/01',
+    '{"receita_federal": "texto", "receita": null, "atividade_principal": {"code": "x"}, "cnae_fiscal": ""}': None,
+    '{"atividade_principal": [{"code": null}], "cnae_fiscal": 6203100}': '6203100',
+    '{"cnae_fiscal": 6203100.0}': '62031000',
+    '{"cnae_fiscal": 1.50}': '150',
+    '{"cnae_fiscal": 1e3}': '1000',
+    '{"cnae_fiscal": true}': 'TRUE',
+    '{"cnae_fiscal": "", "cnae_principal": "62.03 - 1 / 00"}': '6203-1/00',
+    '{"cnae_principal": {"b": 1, "aa": [1, "x"], "a": null}}': '{"A":NULL,"B":1,"AA":[1,"X"]}',
+    '{"cnae_principal": ["62.03-1-00"]}': '["6203-1-00"]',
+    '{"atividade_principal": [{"code": "ab.cd-x/y"}]}': 'ABCD-X/Y',
+    '{"atividade_principal": [{"code": "\\t6203 100\\n"}]}': '\t6203100\n',
+    '{"nome": "SEM CNAE"}': None,
+    '[{"cnae_fiscal": 1}]': None,
+    '"cnae_fiscal"': None,
+    'null': None,
+}
+
+# Valores que quebram um literal de array sem aspas
+TRICKY = ['6201-5/01', '62,01-5/01', 'null', 'NULL', 'a"b', 'c\\d', '{x}', ' espaço ', '']
+
+
+def test_every_parity_case_has_an_expected_value():
+    assert set(PARITY_EXPECTED) == set(PARITY_CASES)
+
+
+@pytest.mark.parametrize('case', PARITY_CASES)
+def test_parity_cases(case):
+    expected = PARITY_EXPECTED[case]
+    assert extract_cnae_from_raw_data(json.loads(case, parse_float=Decimal)) == expected
+    assert _python_principal(case) == expected
+
+
+@pytest.mark.parametrize('raw_data,expected', [
+    ({'receita_federal': {'atividades_secundarias': [
+        {'code': '62.01-5-01'}, {'code': '62.01-5-01'}, 'x', {'codigo': '6204-0/00'}, {'code': ''}]}},
+     ['6201-5-01', '6204-0/00']),
+    # Vale a primeira lista presente, mesmo vazia
+    ({'receita_federal': {'atividades_secundarias': []}, 'cnaes_secundarios': [{'codigo': 1}]}, []),
+    ({'atividades_secundarias': [{'code': '00.00-0-00', 'text': 'Não informada'}]}, []),
+    ({'cnaes_secundarios': [{'codigo': 6201501, 'descricao': 'Desenvolvimento de software'}]}, ['6201501']),
+    ({'cnaes_secundarios': {'codigo': 6201501}}, []),
+    (None, []),
+])
+def test_extract_secondary_cnaes(raw_data, expected):
+    assert extract_secondary_cnaes(raw_data) == expected
+
+
+def test_extract_line_unwraps_table_rows():
+    embedded = json.dumps({'cnae_fiscal': 6203100, 'cnaes_secundarios': [{'codigo': 4751201}]})
+    assert extract_line(json.dumps({'id': 7, 'cnpj': '1', 'raw_data': embedded})) == ('7', '1', '6203100', ['4751201'])
+
+    no_cnae = json.dumps({'id': 7, 'raw_data': {'nome': 'x', 'cnpj': '2'}})
+    assert parse_raw_data_line('{"nome": "x"}') is None
+    assert extract_line(no_cnae) is None
+    assert extract_line(no_cnae, keep_empty=True) == ('7', '2', None, [])
+
+
+def test_check_parity_against_sql_function(db_conn):
+    checks = [(case, _python_principal(case)) for case in PARITY_CASES]
+    assert check_parity(db_conn, checks) == []
+    # Divergência é devolvida como (linha, python, sql)
+    assert check_parity(db_conn, [('{"cnae_fiscal": "62.03-1/00"}', 'errado')]) == [
+        ('{"cnae_fiscal": "62.03-1/00"}', 'errado', '6203-1/00')]
+
+
+def csv_output(rows):
+    output = io.StringIO()
+    sink = CsvSink(output)
+    sink.write(rows)
+    sink.close()
+    return output.getvalue()
+
+
+def test_pg_array_literal_quotes_every_element():
+    assert pg_array_literal([]) == '{}'
+    assert pg_array_literal(['6201-5/01', '6204-0/00']) == '{"6201-5/01","6204-0/00"}'
+    assert pg_array_literal(['62,01-5/01', 'null', None]) == '{"62,01-5/01","null",NULL}'
+    assert pg_array_literal(['a"b', 'c\\d']) == '{"a\\"b","c\\\\d"}'
+
+
+def test_csv_sink_row():
+    assert csv_output([('1', '11222333000181', '6203-1/00', ['6201-5/01', '62,01-5/01'])]).splitlines() == [
+        'id,cnpj,cnae_principal,cnaes_secundarios',
+        '1,11222333000181,6203-1/00,"{""6201-5/01"",""62,01-5/01""}"',
+    ]
+
+
+def test_copy_round_trip(db_url):
+    import psycopg2
+
+    rows = [('1', '11222333000181', '6203-1/00', TRICKY), ('2', '', None, [])]
+    conn = psycopg2.connect(db_url)
+    conn.set_client_encoding('UTF8')
+    try:
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE raw_extract_test (id text, cnpj text, cnae_principal text, cnaes_secundarios text[])")
+            cur.copy_expert("COPY raw_extract_test FROM STDIN WITH (FORMAT csv, HEADER true)", io.StringIO(csv_output(rows)))
+            cur.execute("SELECT id, cnaes_secundarios FROM raw_extract_test ORDER BY id")
+            assert cur.fetchall() == [('1', TRICKY), ('2', [])]
+    finally:
+        conn.rollback()
+        conn.close()
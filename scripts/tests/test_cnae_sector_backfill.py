@@ -0,0 +1,307 @@
+"""
+Testes de checkpoint/retomada do backfill de setor (cnae_sector_backfill.py)
+
+A tabela é simulada em memória (next_boundary/run_chunk substituídos): o que
+se testa é o escalonamento dos blocos, o checkpoint e os totais na retomada.
+Com DATABASE_URL, o backfill também roda de ponta a ponta (SQL gerado e
+paginação por chave) em um banco temporário criado só para o teste.
+"""
+
+import json
+import time
+import uuid
+import threading
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+from cnae_sector_backfill import TABLES, SectorBackfill
+
+TABLE = TABLES['companies']
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    closed = False
+
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTable:
+    """Linhas id -> (pendente, tem classificação); ids ordenáveis como texto"""
+
+    def __init__(self, size: int = 100):
+        self.rows = {f'{i:03d}': [True, i % 3 != 0] for i in range(1, size + 1)}
+        self.lock = threading.Lock()
+
+    def ids(self):
+        return sorted(self.rows)
+
+    def update(self, lo, hi):
+        with self.lock:
+            pending = updated = 0
+            for row_id in self.ids():
+                if (lo is None or row_id > lo) and row_id <= hi and self.rows[row_id][0]:
+                    pending += 1
+                    if self.rows[row_id][1]:
+                        self.rows[row_id][0] = False
+                        updated += 1
+            return pending, updated
+
+
+class FakeBackfill(SectorBackfill):
+    def __init__(self, table: FakeTable, checkpoint_path: str, fail_first: bool = False, **kwargs):
+        super().__init__('postgresql://fake', checkpoint_path=checkpoint_path, **kwargs)
+        self.table = table
+        self.fail_first = fail_first
+        self.finished = []
+
+    def connect(self):
+        return FakeConnection()
+
+    def next_boundary(self, cur, table, lo):
+        ids = [row_id for row_id in self.table.ids() if lo is None or row_id > lo]
+        if not ids:
+            return None
+        return ids[min(self.chunk_size, len(ids)) - 1]
+
+    def run_chunk(self, table, lo, hi):
+        if self.fail_first and lo is None:
+            # Interromper o primeiro bloco depois que os seguintes terminaram
+            deadline = time.monotonic() + 5
+            while len(self.finished) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.2)
+            raise RuntimeError('conexão perdida')
+        result = self.table.update(lo, hi)
+        self.finished.append(lo)
+        return result
+
+
+def read_state(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['tables'][TABLE.name]
+
+
+def test_full_run_counts(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    table = FakeTable()
+    state = FakeBackfill(table, path, workers=3, chunk_size=10).run([TABLE.name])[TABLE.name]
+
+    assert (state['pending'], state['updated'], state['last_id'], state['done']) == (100, 67, '100', True)
+    assert 'ahead' not in read_state(path)
+    assert not any(pending and classified for pending, classified in table.rows.values())
+
+
+def test_resume_after_out_of_order_chunks_keeps_exact_totals(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    table = FakeTable()
+
+    with pytest.raises(RuntimeError):
+        FakeBackfill(table, path, fail_first=True, workers=3, chunk_size=10).run([TABLE.name])
+
+    interrupted = read_state(path)
+    # O primeiro bloco falhou: o checkpoint não avança, mas os blocos seguintes
+    # concluídos ficam registrados com o que somaram aos totais
+    assert interrupted['last_id'] is None and not interrupted['done']
+    assert interrupted['ahead']
+    assert interrupted['updated'] == sum(updated for _, _, updated in interrupted['ahead'].values())
+
+    # Outro tamanho de bloco na retomada: os totais não dependem das faixas
+    state = FakeBackfill(table, path, workers=3, chunk_size=7).run([TABLE.name])[TABLE.name]
+    assert (state['pending'], state['updated'], state['done']) == (100, 67, True)
+
+
+def test_completed_table_is_skipped(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    FakeBackfill(FakeTable(), path, workers=2, chunk_size=25).run([TABLE.name])
+
+    table = FakeTable()
+    state = FakeBackfill(table, path, workers=2, chunk_size=25).run([TABLE.name])[TABLE.name]
+    assert (state['pending'], state['updated']) == (100, 67)
+    assert all(pending for pending, _ in table.rows.values())
+
+
+# Tabelas mínimas (só as colunas que o backfill usa) para o banco temporário
+SCRATCH_SCHEMA = """
+CREATE TABLE public.cnae_classifications (
+  cnae_code VARCHAR(20) PRIMARY KEY,
+  setor_industria VARCHAR(100) NOT NULL,
+  categoria VARCHAR(100) NOT NULL
+);
+CREATE TABLE public.companies (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(), cnpj TEXT, sector_name TEXT, raw_data JSONB
+);
+CREATE TABLE public.icp_analysis_results (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(), cnpj TEXT, cnae_principal TEXT, setor TEXT, raw_data JSONB
+);
+CREATE TABLE public.qualified_prospects (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(), cnpj TEXT, cnae_principal TEXT, setor TEXT, enrichment_data JSONB
+);
+CREATE TABLE public.prospecting_candidates (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(), cnpj TEXT, sector TEXT
+);
+"""
+
+
+@pytest.fixture
+def scratch_db_url(db_url):
+    """
+    Banco criado e removido pelo teste, com as funções de CNAE copiadas do banco
+    de DATABASE_URL (migrations aplicadas): o backfill percorre tabelas inteiras
+    """
+    import psycopg2
+    from psycopg2.extensions import make_dsn, parse_dsn
+
+    source = psycopg2.connect(db_url)
+    source.set_client_encoding('UTF8')
+    source.autocommit = True
+    name = f'pytest_backfill_{uuid.uuid4().hex[:12]}'
+    try:
+        with source.cursor() as cur:
+            cur.execute("""
+                SELECT pg_get_functiondef(p.oid)
+                FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace
+                WHERE n.nspname = 'public' AND p.proname IN ('normalize_cnae_code', 'extract_cnae_from_raw_data')
+                ORDER BY p.proname DESC
+            """)
+            functions = [row[0] for row in cur.fetchall()]
+        if len(functions) != 2:
+            pytest.skip('funções de CNAE das migrations não encontradas em DATABASE_URL')
+        try:
+            with source.cursor() as cur:
+                cur.execute(f'CREATE DATABASE {name}')
+        except psycopg2.Error as e:
+            pytest.skip(f'sem permissão para criar o banco temporário: {e}')
+
+        url = make_dsn(**{**parse_dsn(db_url), 'dbname': name})
+        try:
+            conn = psycopg2.connect(url)
+            conn.set_client_encoding('UTF8')
+            try:
+                with conn, conn.cursor() as cur:
+                    cur.execute(SCRATCH_SCHEMA)
+                    for definition in functions:
+                        cur.execute(definition)
+            finally:
+                conn.close()
+            yield url
+        finally:
+            with source.cursor() as cur:
+                cur.execute(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)')
+    finally:
+        source.close()
+
+
+def seed_scratch(url):
+    import psycopg2
+    from psycopg2.extras import Json
+
+    software = {'atividade_principal': [{'code': '62.03-1/00'}]}
+    varejo = {'receita_federal': {'atividade_principal': [{'code': '4751-2/01'}]}}
+    sem_classificacao = {'cnae_fiscal': '9999-9/99'}
+
+    companies = []
+    for i in range(30):
+        raw = (sem_classificacao, software, varejo)[i % 3]
+        sector = {1: 'Tecnologia - Software', 2: 'Varejo'}.get(i)  # 1 já preenchido; 2 sem categoria
+        companies.append((f'{i:014d}', sector, Json(raw)))
+    companies.append(('99999999999999', None, None))
+
+    conn = psycopg2.connect(url)
+    conn.set_client_encoding('UTF8')
+    try:
+        with conn, conn.cursor() as cur:
+            cur.executemany("INSERT INTO public.cnae_classifications VALUES (%s, %s, %s)", [
+                ('6203-1/00', 'Tecnologia', 'Software'),
+                ('4751-2/01', 'Varejo', 'Informática'),
+            ])
+            cur.executemany("INSERT INTO public.companies (cnpj, sector_name, raw_data) VALUES (%s, %s, %s)",
+                            companies)
+            cur.executemany(
+                "INSERT INTO public.icp_analysis_results (cnpj, cnae_principal, setor, raw_data) VALUES (%s, %s, %s, %s)",
+                [('A', '6203100', None, None),  # 7 dígitos -> 6203-1/00
+                 ('B', None, None, Json({'cnae_fiscal': '4751-2/01'})),
+                 ('C', '', '', None)])
+            cur.executemany(
+                "INSERT INTO public.qualified_prospects (cnpj, cnae_principal, enrichment_data) VALUES (%s, %s, %s)",
+                [('A', None, None),  # CNAE do ICP pelo CNPJ
+                 (f'{4:014d}', None, None),  # CNAE de companies pelo CNPJ
+                 ('X', '4751201', None),
+                 ('Y', None, None)])
+            cur.executemany("INSERT INTO public.prospecting_candidates (cnpj) VALUES (%s)",
+                            [('A',), (f'{5:014d}',), ('',), (None,), ('C',)])
+    finally:
+        conn.close()
+
+
+def fetch_all(url, sql):
+    import psycopg2
+
+    conn = psycopg2.connect(url)
+    conn.set_client_encoding('UTF8')
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def test_backfill_against_postgres(scratch_db_url, tmp_path):
+    seed_scratch(scratch_db_url)
+    path = str(tmp_path / 'checkpoint.json')
+    results = SectorBackfill(scratch_db_url, workers=3, chunk_size=4, checkpoint_path=path).run(list(TABLES))
+
+    totals = {name: (state['pending'], state['updated'], state['done']) for name, state in results.items()}
+    assert totals == {
+        'companies': (30, 19, True),
+        'qualified_prospects': (4, 3, True),
+        'prospecting_candidates': (3, 2, True),
+        'icp_analysis_results': (3, 2, True),
+    }
+
+    sectors = dict(fetch_all(scratch_db_url, "SELECT cnpj, sector_name FROM public.companies"))
+    for i in range(30):
+        expected = {0: None, 1: 'Tecnologia - Software', 2: 'Varejo - Informática'}[i % 3]
+        assert sectors[f'{i:014d}'] == expected, i
+    assert sectors['99999999999999'] is None
+
+    assert fetch_all(scratch_db_url, "SELECT cnpj, cnae_principal, setor FROM public.qualified_prospects ORDER BY cnpj") == [
+        (f'{4:014d}', '62.03-1/00', 'Tecnologia - Software'),
+        ('A', '62.03-1/00', 'Tecnologia - Software'),
+        ('X', '4751201', 'Varejo - Informática'),
+        ('Y', None, None),
+    ]
+    assert fetch_all(scratch_db_url, "SELECT cnpj, sector FROM public.prospecting_candidates ORDER BY cnpj NULLS LAST") == [
+        ('', None),
+        (f'{5:014d}', 'Varejo - Informática'),
+        ('A', 'Tecnologia - Software'),
+        ('C', None),
+        (None, None),
+    ]
+    assert fetch_all(scratch_db_url, "SELECT cnpj, setor FROM public.icp_analysis_results ORDER BY cnpj") == [
+        ('A', 'Tecnologia - Software'),
+        ('B', 'Varejo - Informática'),
+        ('C', ''),
+    ]
+
+    # Nova execução do zero: só as linhas sem classificação continuam pendentes
+    rerun = SectorBackfill(scratch_db_url, workers=2, chunk_size=7,
+                           checkpoint_path=str(tmp_path / 'rerun.json')).run(['companies'])
+    assert (rerun['companies']['pending'], rerun['companies']['updated']) == (11, 0)
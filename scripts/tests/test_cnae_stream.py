@@ -0,0 +1,34 @@
+"""Testes da leitura de registros CNAE (cnae_stream.py) e dos scripts legados que a usam"""
+
+import generate_cnae_sql_from_user_data
+import process_cnae_data
+from cnae_stream import iter_batches, parse_cnae_text, read_cnae_file
+
+TEXT = 'CNAE\tSetor\tCategoria\n6203100\tTI\tServicos\n6203-1/00\tTI\tServicos\n# comentario\n\n9999\tsó dois\n'
+
+
+def test_require_format_drops_bare_digit_codes():
+    rejects = []
+    records = parse_cnae_text(TEXT, lambda line_num, line: rejects.append(line_num))
+    assert records == [('6203-1/00', 'TI', 'Servicos')]
+    assert rejects == [2, 6]
+
+
+def test_without_format_keeps_bare_digit_codes():
+    assert parse_cnae_text(TEXT, require_format=False) == [('6203100', 'TI', 'Servicos'), ('6203-1/00', 'TI', 'Servicos')]
+
+
+def test_legacy_parsers_accept_bare_digit_codes(tmp_path):
+    text = '6203100\tTI\tServicos\n6203-1/00\tTI\tServicos\n'
+    expected = [('6203100', 'TI', 'Servicos'), ('6203-1/00', 'TI', 'Servicos')]
+    assert generate_cnae_sql_from_user_data.parse_data(text) == expected
+    assert process_cnae_data.parse_cnae_data(text) == expected
+
+    path = tmp_path / 'cnae.txt'
+    path.write_text(text, encoding='utf-8')
+    assert list(read_cnae_file(str(path), require_format=False)) == expected
+
+
+def test_iter_batches():
+    assert list(iter_batches(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_batches([], 2)) == []
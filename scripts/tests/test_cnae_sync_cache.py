@@ -0,0 +1,64 @@
+"""Testes do cache de sincronização (cnae_sync_cache.py)"""
+
+import pytest
+
+from cnae_sync_cache import LoadResult, RemoteState, SyncCache, sync_with_cache
+
+KEY = 'postgresql://postgres@localhost/postgres#cnae_classifications'
+DATA = [('6201-5/01', 'TI', 'Software'), ('6203-1/00', 'TI', 'Serviços'), ('6203-1/00', 'TI', 'Serviços')]
+
+
+class FakeServer:
+    """Conta as cargas e muda o validador a cada escrita"""
+
+    def __init__(self, result: LoadResult):
+        self.result = result
+        self.loads = 0
+
+    def state(self) -> RemoteState:
+        return RemoteState(2, f'2026-01-01T00:00:0{self.loads}')
+
+    def load(self) -> LoadResult:
+        self.loads += 1
+        return self.result
+
+
+@pytest.fixture
+def cache(tmp_path):
+    # TTL zero: toda execução revalida no servidor
+    with SyncCache(str(tmp_path / 'cache.sqlite'), ttl=0) as cache:
+        yield cache
+
+
+def test_complete_load_is_cached(cache):
+    server = FakeServer(LoadResult(written=2, failed=0))
+    assert sync_with_cache(cache, KEY, DATA, server.state, server.load)
+    assert cache.get(KEY).etag == server.state().etag
+
+    assert not sync_with_cache(cache, KEY, DATA, server.state, server.load)
+    assert server.loads == 1
+
+
+@pytest.mark.parametrize('result', [LoadResult(written=1, failed=1), LoadResult(written=1, failed=0)])
+def test_partial_load_is_not_cached(cache, result):
+    server = FakeServer(result)
+    assert sync_with_cache(cache, KEY, DATA, server.state, server.load)
+    assert cache.get(KEY) is None
+
+    # O servidor "não mudou" desde a carga parcial, mas ela é repetida
+    assert sync_with_cache(cache, KEY, DATA, server.state, server.load)
+    assert server.loads == 2
+
+
+def test_partial_reload_keeps_old_entry_stale(cache):
+    server = FakeServer(LoadResult(written=2, failed=0))
+    sync_with_cache(cache, KEY, DATA, server.state, server.load)
+
+    # Tabela alterada por fora; a nova carga falha em parte
+    server.loads += 1
+    server.result = LoadResult(written=0, failed=2)
+    assert sync_with_cache(cache, KEY, DATA, server.state, server.load)
+    # O validador antigo não bate com o servidor: a próxima execução carrega de novo
+    server.result = LoadResult(written=2, failed=0)
+    assert sync_with_cache(cache, KEY, DATA, server.state, server.load)
+    assert server.loads == 4
@@ -0,0 +1,37 @@
+"""Testes da normalização vetorizada de CNAE (cnae_vectorized.py)"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from cnae_codes import normalize_cnae_code
+from cnae_vectorized import normalize_cnae_array
+
+VALID = ['62.03-1/00', '6203100', '6203-1/00', ' 62.03-1-00 ', '6203-1/00  ', '0111-3/01']
+INVALID = [
+    '-/6203100//', '62031 00', '62 03-1/00', '6203-1/ 00', '6203-100', '62031/00', '62.03100',
+    '6203--1/00', '62.03.-1/00', '6203-1/00x', '6203-1/001', '6203-2/00', 'abc', '', None,
+]
+
+
+@pytest.mark.parametrize('code', VALID + INVALID)
+def test_single_code_batch(code):
+    # Lote de um código: a transposta da matriz (1, w) não pode ser a view somente leitura
+    cols = normalize_cnae_array([code])
+    assert cols.valid[0] == (code in VALID)
+    assert cols.normalized[0] == (normalize_cnae_code(code) or '').encode('ascii')
+
+
+def test_layout_and_check_digit():
+    cols = normalize_cnae_array(VALID + INVALID)
+    assert cols.valid.tolist() == [True] * len(VALID) + [False] * len(INVALID)
+    assert cols.keys.tolist() == [6203100] * 5 + [111301] + [-1] * len(INVALID)
+    assert cols.canonical[:len(VALID)].tolist() == [b'6203-1/00'] * 5 + [b'0111-3/01']
+
+
+def test_bytes_input_matches_objects():
+    codes = ['62.03-1/00', '6203100', 'invalido', '0111-3/01']
+    from_bytes = normalize_cnae_array(np.array(codes, dtype='S'))
+    from_objects = normalize_cnae_array(codes)
+    assert from_bytes.keys.tolist() == from_objects.keys.tolist()
+    assert from_bytes.normalized.tolist() == from_objects.normalized.tolist()
@@ -0,0 +1,156 @@
+"""Testes da verificação por hashes de faixa (cnae_verify.py)"""
+
+import random
+
+import pytest
+
+from cnae_verify import FULL_RANGE, KeyRange, SourceIndex, TableSide, split_range, verify_against_table
+from conftest import TEST_PREFIX
+
+
+class FakeTableSide:
+    """Lado da tabela em memória, com a mesma interface de TableSide (sem banco)"""
+
+    def __init__(self, records):
+        self.index = SourceIndex(records)
+        self.queries = 0
+        self.rows_fetched = 0
+        self.split_calls = 0
+
+    def range_hashes(self, ranges):
+        self.queries += 1
+        return [self.index.range_hash(r) for r in ranges]
+
+    def split_points(self, ranges, parts):
+        self.queries += 1
+        self.split_calls += 1
+        return [self.index.split_points(r, parts) for r in ranges]
+
+    def rows(self, ranges):
+        self.queries += 1
+        found = [self.index.rows(r) for r in ranges]
+        self.rows_fetched += sum(len(rows) for rows in found)
+        return found
+
+
+def make_records(count, prefix=''):
+    return [(f"{prefix}{i:04d}-{i % 10}/0{i % 3}", f"Setor {i % 7}", f"Categoria {i}") for i in range(count)]
+
+
+def brute_force(source_records, table_records):
+    source = {cnae: (setor, categoria) for cnae, setor, categoria in source_records}
+    table = {cnae: (setor, categoria) for cnae, setor, categoria in table_records}
+    missing = sorted((c, *v) for c, v in source.items() if c not in table)
+    extra = sorted((c, *v) for c, v in table.items() if c not in source)
+    changed = sorted((c, v, table[c]) for c, v in source.items() if c in table and table[c] != v)
+    return missing, extra, changed
+
+
+def test_identical_content_stops_at_first_level():
+    records = make_records(500)
+    table = FakeTableSide(records)
+    result = verify_against_table(SourceIndex(records), table, fanout=4, leaf_size=8)
+
+    assert result.ok()
+    assert (result.source_rows, result.table_rows) == (500, 500)
+    assert (result.levels, result.queries, result.rows_fetched) == (1, 1, 0)
+
+
+def test_finds_scattered_differences_fetching_only_small_ranges():
+    records = make_records(2000)
+    table_records = list(records)
+    changed_at, missing_at = [17, 1033, 1999], [0, 640]
+    for i in changed_at:
+        cnae, setor, _ = table_records[i]
+        table_records[i] = (cnae, setor, 'Outra categoria')
+    for i in sorted(missing_at, reverse=True):
+        del table_records[i]
+    table_records.append(('0500-5/99', 'Setor X', 'Só na tabela'))
+
+    table = FakeTableSide(table_records)
+    result = verify_against_table(SourceIndex(records), table, fanout=4, leaf_size=8)
+
+    # A ordem segue as folhas visitadas; o conteúdo deve bater com a comparação linha a linha
+    assert tuple(map(sorted, (result.missing, result.extra, result.changed))) == brute_force(records, table_records)
+    assert [cnae for cnae, _, _ in result.changed] == [records[i][0] for i in changed_at]
+    assert len(result.missing) == 2 and len(result.extra) == 1
+    # Bisecção: só as folhas divergentes são baixadas, não a tabela inteira
+    assert result.rows_fetched <= 6 * 8
+    assert result.levels > 1
+
+
+def test_splits_by_table_side_when_it_has_more_rows():
+    records = make_records(100)
+    extra = make_records(400, prefix='9')
+    table = FakeTableSide(records + extra)
+    result = verify_against_table(SourceIndex(records), table, fanout=4, leaf_size=8)
+
+    assert table.split_calls > 0
+    assert sorted(result.extra) == sorted(extra)
+    assert not result.missing and not result.changed
+    assert result.ok(allow_extra=True) and not result.ok()
+
+
+@pytest.mark.parametrize('source_count,table_count', [(300, 0), (0, 300)])
+def test_one_empty_side_is_fetched_without_splitting(source_count, table_count):
+    source, table_records = make_records(source_count), make_records(table_count)
+    table = FakeTableSide(table_records)
+    result = verify_against_table(SourceIndex(source), table, fanout=4, leaf_size=8)
+
+    assert len(result.missing) == source_count and len(result.extra) == table_count
+    assert result.levels == 1
+
+
+def test_source_duplicates_last_occurrence_wins():
+    records = make_records(50)
+    source = records + [(records[3][0], 'Setor 0', 'Antiga'), records[3]]
+    result = verify_against_table(SourceIndex(source), FakeTableSide(records), fanout=4, leaf_size=4)
+    assert result.ok() and result.source_rows == 50
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_random_mutations_match_brute_force(seed):
+    rng = random.Random(seed)
+    records = make_records(rng.randint(50, 1500))
+    table_records = []
+    for cnae, setor, categoria in records:
+        roll = rng.random()
+        if roll < 0.01:
+            continue
+        if roll < 0.02:
+            categoria += ' *'
+        table_records.append((cnae, setor, categoria))
+        if roll > 0.99:
+            table_records.append((cnae + 'X', setor, categoria))
+
+    fanout, leaf_size = rng.choice([2, 4, 16]), rng.choice([1, 8, 64])
+    result = verify_against_table(SourceIndex(records), FakeTableSide(table_records), fanout, leaf_size)
+    # A ordem segue as folhas visitadas; o conteúdo deve bater com a comparação linha a linha
+    assert tuple(map(sorted, (result.missing, result.extra, result.changed))) == brute_force(records, table_records)
+
+
+def test_fanout_must_split():
+    with pytest.raises(ValueError):
+        verify_against_table(SourceIndex([]), FakeTableSide([]), fanout=1)
+
+
+def test_split_range_ignores_points_outside_and_on_edges():
+    key_range = KeyRange(b'b', b'f')
+    assert split_range(key_range, [b'a', b'b', b'd', b'd', b'f', b'z']) == [KeyRange(b'b', b'd'), KeyRange(b'd', b'f')]
+    assert split_range(FULL_RANGE, [b'm']) == [KeyRange(b'', b'm'), KeyRange(b'm', None)]
+
+
+def test_table_hashes_match_source_hashes(db_conn):
+    """Os hashes de faixa do Postgres batem com os calculados em Python"""
+    records = make_records(40, prefix=TEST_PREFIX) + [(TEST_PREFIX + 'ação', 'Construção', 'Serviços "gerais"')]
+    with db_conn.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO public.cnae_classifications (cnae_code, setor_industria, categoria) VALUES (%s, %s, %s)",
+            records,
+        )
+    source, table = SourceIndex(records), TableSide(db_conn)
+    test_range = KeyRange(TEST_PREFIX.encode('utf-8'), TEST_PREFIX[:-1].encode('utf-8') + b'.')
+    ranges = split_range(test_range, source.split_points(test_range, 4))
+
+    assert table.range_hashes(ranges) == [source.range_hash(r) for r in ranges]
+    assert [table.rows([r])[0] for r in ranges] == [source.rows(r) for r in ranges]
@@ -0,0 +1,198 @@
+"""Testes do store de respostas por CNPJ (cnpj_store.py) contra uma BrasilAPI de mentira"""
+
+import io
+import csv
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from cnpj_store import DAY, CnpjStore, StalenessPolicy, export_responses, normalize_cnpj, prefetch
+
+
+def with_check_digits(base: str) -> str:
+    """CNPJ com os DVs calculados para os 12 primeiros dígitos"""
+    digits = [int(c) for c in base]
+    for weights in ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]):
+        remainder = sum(d * w for d, w in zip(digits, weights)) % 11
+        digits.append(0 if remainder < 2 else 11 - remainder)
+    return ''.join(map(str, digits))
+
+
+CNPJS = [with_check_digits(f'{i:08d}0001') for i in range(1, 7)]
+
+
+class FakeBrasilAPI(ThreadingHTTPServer):
+    """GET /api/cnpj/v1/{cnpj}: 404 para `not_found`, 429 na primeira vez para `flaky`, 400 para `broken`"""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeBrasilAPIHandler)
+        self.lock = threading.Lock()
+        self.not_found = set()
+        self.flaky = set()
+        self.broken = set()
+        self.requests = []
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/api/cnpj/v1'
+
+
+class FakeBrasilAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        cnpj = self.path.rsplit('/', 1)[-1]
+        with server.lock:
+            server.requests.append(cnpj)
+            first_try = server.requests.count(cnpj) == 1
+        headers = {}
+        if not self.path.startswith('/api/cnpj/v1/') or cnpj in server.not_found:
+            status, body = 404, {'message': 'CNPJ não encontrado'}
+        elif cnpj in server.flaky and first_try:
+            status, body, headers = 429, {'message': 'limite'}, {'Retry-After': '0'}
+        elif cnpj in server.broken:
+            status, body = 400, {'message': 'CNPJ inválido'}  # não repetível
+        else:
+            status, body = 200, {'cnpj': cnpj, 'razao_social': f'Empresa {cnpj[:8]}',
+                                 'cnae_fiscal': 6201501, 'uf': 'SP', 'municipio': 'SAO PAULO'}
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    pytest.importorskip('httpx')
+    server = FakeBrasilAPI()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    with CnpjStore(str(tmp_path / 'store.sqlite')) as store:
+        yield store
+
+
+@pytest.fixture
+def companies_csv(tmp_path):
+    path = tmp_path / 'empresas.csv'
+    formatted = f'{CNPJS[0][:2]}.{CNPJS[0][2:5]}.{CNPJS[0][5:8]}/{CNPJS[0][8:12]}-{CNPJS[0][12:]}'
+    rows = [formatted, *CNPJS, CNPJS[1], '11111111111111', '123']
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['razao_social', 'cnpj'])
+        writer.writerows([f'Empresa {i}', cnpj] for i, cnpj in enumerate(rows))
+    return str(path)
+
+
+def fetch(store, path, api, **kwargs):
+    return prefetch(store, path, fetch=True, base_url=api.base_url, rate=0, **kwargs)
+
+
+def test_prefetch_lists_misses_without_fetching(store, companies_csv, tmp_path):
+    store.put(CNPJS[2], {'cnpj': CNPJS[2]})
+    misses_file = tmp_path / 'faltando.txt'
+    result = prefetch(store, companies_csv, misses_file=str(misses_file))
+
+    # Formatado, repetido e puro contam uma vez; DV errado e curto demais são inválidos
+    assert result == {'unique': 6, 'invalid': 2, 'hits': 1, 'misses': 5}
+    assert misses_file.read_text().split() == [c for c in CNPJS if c != CNPJS[2]]
+
+
+def test_prefetch_fetches_only_misses_and_caches_404(store, companies_csv, api):
+    api.not_found.add(CNPJS[3])
+    api.flaky.add(CNPJS[4])
+    store.put(CNPJS[0], {'cnpj': CNPJS[0], 'razao_social': 'Já no store'})
+
+    result = fetch(store, companies_csv, api)
+    assert (result['ok'], result['not_found'], result['failed']) == (4, 1, 0)
+    # Inválidos e o CNPJ já guardado não viram requisição; o 429 é repetido
+    assert sorted(api.requests) == sorted(CNPJS[1:] + [CNPJS[4]])
+
+    found = store.get_many(CNPJS)
+    assert found[CNPJS[0]].payload['razao_social'] == 'Já no store'
+    assert found[CNPJS[1]].payload['cnae_fiscal'] == 6201501
+    assert (found[CNPJS[3]].status, found[CNPJS[3]].payload) == (404, None)
+
+    # Segunda execução: tudo no store (404 inclusive), nenhuma requisição nova
+    api.requests.clear()
+    assert fetch(store, companies_csv, api)['misses'] == 0
+    assert api.requests == []
+
+
+def test_failed_fetch_is_not_stored(store, companies_csv, api):
+    api.broken.add(CNPJS[5])
+    result = fetch(store, companies_csv, api)
+
+    assert (result['ok'], result['failed']) == (5, 1)
+    assert store.misses(CNPJS) == [CNPJS[5]]
+
+
+def test_stale_entries_count_as_misses(tmp_path):
+    policy = StalenessPolicy(max_age=30 * DAY, negative_max_age=DAY)
+    with CnpjStore(str(tmp_path / 'store.sqlite'), policy) as store:
+        old = time.time() - 2 * DAY
+        store.put_many([(CNPJS[0], 200, {'cnpj': CNPJS[0]}), (CNPJS[1], 404, None)], fetched_at=old)
+
+        assert store.misses(CNPJS[:2]) == [CNPJS[1]]
+        assert store.get(CNPJS[1]) is None and store.get(CNPJS[1], include_stale=True).status == 404
+        assert store.gc(purge_stale=True) == (1, 0)
+
+
+def test_identical_payloads_share_one_blob(store):
+    payload = {'cnae_fiscal': 6201501, 'uf': 'SP'}
+    assert store.put_many([(CNPJS[0], 200, payload), (CNPJS[1], 200, dict(reversed(payload.items())))]) == 1
+    assert store.put_many([(CNPJS[2], 200, payload)]) == 0
+    stats = store.stats()
+    assert (stats['cnpjs'], stats['blobs']) == (3, 1)
+
+    store.put(CNPJS[0], {'cnae_fiscal': 4751201})
+    store.put(CNPJS[1], {'cnae_fiscal': 4751201})
+    store.put(CNPJS[2], None, status=404)
+    assert store.gc() == (0, 1)
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_export_writes_stored_responses_in_file_order(store, companies_csv, api, fmt):
+    api.not_found.add(CNPJS[3])
+    fetch(store, companies_csv, api)
+
+    output = io.StringIO()
+    written, missing = export_responses(store, companies_csv, output, fmt=fmt)
+    assert (written, missing) == (5, 0)
+
+    expected = [c for c in CNPJS if c != CNPJS[3]]
+    if fmt == 'csv':
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        assert [row['cnpj'] for row in rows] == expected
+        assert {row['cnae_fiscal'] for row in rows} == {'6201501'}
+    else:
+        assert [json.loads(line)['cnpj'] for line in output.getvalue().splitlines()] == expected
+
+
+def test_normalize_cnpj_restores_leading_zeros():
+    assert normalize_cnpj('191') == '00000000000191'
+    assert normalize_cnpj('00.000.000/0001-91') == '00000000000191'
+    assert normalize_cnpj('123456789012345') is None
+    assert normalize_cnpj('12ABC34501DE') is None
@@ -0,0 +1,137 @@
+"""Testes da normalização, validação e dedup vetorizada de CNPJs (cnpj_vectorized.py)"""
+
+import re
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from cnpj_vectorized import (REASON_CODES, REJECT_REASONS, _synthetic_cnpjs, check_digits, first_occurrence,
+                             normalize_cnpj_array, split_csv)
+
+VALID = '11.222.333/0001-81'
+ALPHANUMERIC = '12.ABC.345/01DE-35'  # exemplo da Receita: DVs numéricos sobre raiz alfanumérica
+
+
+def reasons(values):
+    return [REASON_CODES[code] for code in normalize_cnpj_array(values).reason]
+
+
+@pytest.mark.parametrize('value, reason', [
+    ('', 'vazio'),
+    ('  ./-', 'vazio'),
+    (None, 'vazio'),
+    ('11.222.333/0001_81', 'caractere_invalido'),
+    ('11222333000181ç', 'caractere_invalido'),
+    ('112223330001810', 'tamanho'),
+    ('12ABC34501DE3', 'tamanho'),
+    ('00000000000000', 'sequencia_repetida'),
+    ('0', 'sequencia_repetida'),
+    ('11.222.333/0001-82', 'digito_verificador'),
+    ('1122233300018X', 'digito_verificador'),
+])
+def test_each_reject_reason(value, reason):
+    cols = normalize_cnpj_array([value, VALID])
+    assert [REASON_CODES[code] for code in cols.reason] == [reason, '']
+    assert cols.valid.tolist() == [False, True]
+    assert cols.keys[0] == -1
+
+
+def test_reject_reasons_are_all_covered():
+    assert REASON_CODES == ['', *REJECT_REASONS]
+    assert set(REJECT_REASONS) == {'vazio', 'caractere_invalido', 'tamanho', 'sequencia_repetida',
+                                   'digito_verificador'}
+
+
+def test_short_numeric_input_is_zero_padded():
+    cols = normalize_cnpj_array(['00.163.083/0001-30', '163083000130', '191', ' 0001-91'])
+    assert cols.normalized.tolist() == [b'00163083000130', b'00163083000130', b'00000000000191', b'00000000000191']
+    assert cols.valid.all()
+    assert cols.keys[0] == cols.keys[1] and cols.keys[2] == cols.keys[3] == 1
+
+
+def test_alphanumeric_cnpj():
+    assert check_digits('12ABC34501DE') == '35'
+    cols = normalize_cnpj_array([ALPHANUMERIC, '12abc34501de35', '12ABC34501DE36', '12ABC34501DE3A'])
+    assert cols.normalized.tolist()[:2] == [b'12ABC34501DE35', b'12ABC34501DE35']
+    assert cols.valid.tolist() == [True, True, False, False]
+    assert reasons(['12ABC34501DE36', '12ABC34501DE3A']) == ['digito_verificador', 'digito_verificador']
+    # Raiz em base 36: chave distinta de qualquer CNPJ numérico, igual entre as grafias
+    assert cols.keys[0] == cols.keys[1] == int('12ABC34501DE', 36)
+
+
+def scalar_valid(value: bytes) -> bool:
+    text = re.sub(r'[./\- ]', '', value.decode('ascii')).upper()
+    if text.isdigit():
+        text = text.zfill(14)
+    if not re.fullmatch(r'[0-9A-Z]{12}\d{2}', text) or len(set(text)) == 1:
+        return False
+    return check_digits(text[:12]) == text[12:]
+
+
+def test_matches_scalar_check_digits():
+    values = _synthetic_cnpjs(20000)
+    cols = normalize_cnpj_array(values)
+    assert cols.valid.tolist() == [scalar_valid(value) for value in values]
+    assert 0 < cols.valid.sum() < len(values)
+
+
+def test_first_occurrence_across_batches_matches_single_pass():
+    cols = normalize_cnpj_array(_synthetic_cnpjs(20000, seed=3))
+    duplicate, first, _ = first_occurrence(cols.keys, cols.valid)
+    assert duplicate.sum() > 0
+
+    seen = None
+    batches = []
+    for start in range(0, len(cols.keys), 3001):
+        part = slice(start, start + 3001)
+        batch_duplicate, batch_first, seen = first_occurrence(cols.keys[part], cols.valid[part], seen,
+                                                              offset=start)
+        batches.append((batch_duplicate, batch_first))
+    assert np.array_equal(np.concatenate([d for d, _ in batches]), duplicate)
+    assert np.array_equal(np.concatenate([f for _, f in batches]), first)
+    # Primeira ocorrência: posição da primeira chave igual; -1 nos inválidos
+    assert (first[~cols.valid] == -1).all()
+    rows = np.flatnonzero(cols.valid)
+    assert np.array_equal(cols.keys[first[rows]], cols.keys[rows])
+    assert (first[rows] <= rows).all()
+
+
+def test_split_csv_writes_three_outputs(tmp_path):
+    pd = pytest.importorskip('pandas')
+    source = tmp_path / 'empresas.csv'
+    source.write_text(
+        'nome,cnpj\n'
+        'A,11.222.333/0001-81\n'        # linha 2: limpo
+        'B,123\n'                       # linha 3: digito_verificador
+        'C,163083000130\n'              # linha 4: limpo (zeros à esquerda)
+        'D,11222333000181\n'            # linha 5: duplicado da linha 2
+        'E,\n'                          # linha 6: vazio
+        'F,00.163.083/0001-30\n'        # linha 7: duplicado da linha 4
+        'G,12.ABC.345/01DE-35\n'        # linha 8: limpo
+        'H,11.222.333/0001-81\n',       # linha 9: duplicado da linha 2
+        encoding='utf-8')
+    paths = {name: tmp_path / f'{name}.csv' for name in ('limpo', 'rejeitados', 'duplicados')}
+    result = split_csv(str(source), 'cnpj', str(paths['limpo']), str(paths['rejeitados']),
+                       str(paths['duplicados']), batch_size=3)
+
+    assert result[:4] == (8, 3, 2, 3)
+    assert {name: count for name, count in result.reasons.items() if count} == {'vazio': 1,
+                                                                                 'digito_verificador': 1}
+    read = {name: pd.read_csv(path, dtype=str, keep_default_na=False) for name, path in paths.items()}
+    assert read['limpo'].to_dict('list') == {
+        'nome': ['A', 'C', 'G'], 'cnpj': ['11222333000181', '00163083000130', '12ABC34501DE35']}
+    assert read['rejeitados'].to_dict('list') == {
+        'nome': ['B', 'E'], 'cnpj': ['00000000000123', ''], 'linha': ['3', '6'],
+        'motivo': ['digito_verificador', 'vazio']}
+    assert read['duplicados'].to_dict('list') == {
+        'nome': ['D', 'F', 'H'], 'cnpj': ['11222333000181', '00163083000130', '11222333000181'],
+        'linha': ['5', '7', '9'], 'primeira_linha': ['2', '4', '2']}
+
+
+def test_split_csv_missing_column(tmp_path):
+    pytest.importorskip('pandas')
+    source = tmp_path / 'empresas.csv'
+    source.write_text('nome\nA\n', encoding='utf-8')
+    with pytest.raises(ValueError, match="coluna 'cnpj'"):
+        split_csv(str(source))
@@ -0,0 +1,52 @@
+"""Testes da deduplicação de empresas (company_dedup.py)"""
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from company_dedup import cluster_companies, normalize_company_names
+
+CNPJ_A = '11.222.333/0001-81'
+CNPJ_B = '00000000000191'
+
+
+def frame(**columns):
+    return pd.DataFrame(columns).astype(str)
+
+
+def test_no_valid_cnpj_keeps_rows_apart():
+    companies = frame(razao_social=['Acme Ltda', 'Beta SA'], cnpj=['123', ''])
+    result = cluster_companies(companies)
+    assert result.cluster_id.tolist() == [0, 1]
+    assert result.cluster_size.tolist() == [1, 1]
+
+
+def test_same_valid_cnpj_joins_different_names():
+    companies = frame(razao_social=['Acme Comércio', 'Zeta Transportes', 'Omega Alimentos'],
+                      cnpj=[CNPJ_A, CNPJ_A.replace('.', '').replace('/', '').replace('-', ''), CNPJ_B])
+    result = cluster_companies(companies)
+    assert result.cluster_id.tolist() == [0, 0, 2]
+
+
+def test_scope_separates_same_cnpj_and_name():
+    companies = frame(razao_social=['Acme Comércio Ltda'] * 3, cnpj=[CNPJ_A] * 3, tenant_id=['t1', 't2', 't1'])
+    result = cluster_companies(companies, scope_column='tenant_id')
+    assert result.cluster_id.tolist() == [0, 1, 0]
+    assert result.cluster_size.tolist() == [2, 1, 2]
+
+
+def test_name_variants_cluster_together():
+    companies = frame(razao_social=['Transjoi Transportes Ltda.', 'TRANSJOI TRANSPORTES LTDA',
+                                    'Transjoi Transporte S/A', 'Metalúrgica Vale Azul'])
+    result = cluster_companies(companies, cnpj_column=None)
+    assert result.cluster_id.tolist() == [0, 0, 0, 3]
+
+
+def test_empty_frame():
+    result = cluster_companies(frame(razao_social=[], cnpj=[]))
+    assert len(result.cluster_id) == 0 and result.names == 0
+
+
+def test_normalize_strips_legal_terms_and_accents():
+    names = normalize_company_names(pd.Series(['Ind. de Alimentos Ação S/A', 'INDUSTRIA ALIMENTOS ACAO LTDA']))
+    assert names[0] == names[1] == 'industria alimentos acao'